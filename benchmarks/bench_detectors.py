@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import glob
+import numpy as np
+
+# Compares person detector backends on the bundled snapshots: latency per image
+# and box parity against the torch backend (greedy IoU >= 0.5 matching).
+#
+#   python benchmarks/bench_detectors.py [backend ...]   (default: torch onnx onnx-int8)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.attendance import load_group_photo
+from src.detectors import get_detector
+
+REFERENCE = 'torch'
+MATCH_IOU = 0.5
+
+
+def iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def parity(reference, boxes):
+    # (matched, mean IoU of matched pairs)
+    unused = list(boxes)
+    ious = []
+    for ref in reference:
+        if not unused:
+            break
+        scores = [iou(ref, b) for b in unused]
+        best = int(np.argmax(scores))
+        if scores[best] >= MATCH_IOU:
+            ious.append(scores[best])
+            unused.pop(best)
+    return len(ious), (float(np.mean(ious)) if ious else 0.0)
+
+
+def time_backend(detector, images, repeats=3):
+    detector.detect(images[0]) # warm-up
+    per_image = []
+    boxes = []
+    for img in images:
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = detector.detect(img)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        per_image.append(best)
+        boxes.append(result)
+    return per_image, boxes
+
+
+def main():
+    backends = sys.argv[1:] or ['torch', 'onnx', 'onnx-int8']
+    if REFERENCE not in backends:
+        backends.insert(0, REFERENCE)
+    paths = sorted(glob.glob('snapshot_*.jpg'))
+    images = [img for img in (load_group_photo(p) for p in paths) if img is not None]
+    print(f"{len(images)} images")
+    if not images:
+        return
+
+    results = {}
+    for backend in backends:
+        try:
+            results[backend] = time_backend(get_detector(backend), images)
+        except Exception as e:
+            print(f"{backend:<10} unavailable: {e}")
+
+    if not results:
+        print("No detector backend could be loaded.")
+        return
+    # Parity is measured against REFERENCE, or the first backend that ran if it failed
+    reference = REFERENCE if REFERENCE in results else next(iter(results))
+    if reference != REFERENCE:
+        print(f"{REFERENCE} unavailable, comparing against {reference}.")
+    ref_boxes = results[reference][1]
+    total_ref = sum(len(b) for b in ref_boxes)
+    print(f"{'backend':<10} {'mean ms':>8} {'p95 ms':>8} {'boxes':>6} {'recall':>7} {'precision':>9} {'mean IoU':>8}")
+    for backend, (times, boxes) in results.items():
+        matched, ious = 0, []
+        for ref, got in zip(ref_boxes, boxes):
+            m, mean_iou = parity(ref, got)
+            matched += m
+            if m:
+                ious.append(mean_iou)
+        total = sum(len(b) for b in boxes)
+        recall = matched / total_ref if total_ref else 1.0
+        precision = matched / total if total else 1.0
+        print(f"{backend:<10} {np.mean(times) * 1000:8.1f} {np.percentile(times, 95) * 1000:8.1f} {total:6d} "
+              f"{recall:7.3f} {precision:9.3f} {np.mean(ious) if ious else 0.0:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import glob
+import cv2
+import numpy as np
+
+# Measures the per-person detect + encode stage of process_group_photo with
+# different worker pool sizes on the bundled snapshots (CPU only).
+#
+#   python benchmarks/bench_face_workers.py [--whole-frames] [image ...]
+#
+# --whole-frames skips YOLO and sends every photo as one crop (also the fallback
+# when the person detector cannot be loaded, e.g. no weights offline).
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.attendance import load_group_photo, detect_persons, encode_person_crops
+
+
+def person_crops(image_path, pad=20, whole_frame=False):
+    img = load_group_photo(image_path)
+    if img is None:
+        return []
+    rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    if whole_frame:
+        return [rgb_img]
+    h, w, _ = img.shape
+
+    crops = []
+    for (x1, y1, x2, y2) in detect_persons(img):
+        x1, y1 = max(0, x1 - pad), max(0, y1 - pad)
+        x2, y2 = min(w, x2 + pad), min(h, y2 + pad)
+        crop = np.ascontiguousarray(rgb_img[y1:y2, x1:x2])
+        if crop.size > 0:
+            crops.append(crop)
+    return crops
+
+
+def main():
+    args = sys.argv[1:]
+    whole_frames = '--whole-frames' in args
+    images = [a for a in args if a != '--whole-frames'] or sorted(glob.glob('snapshot_*.jpg'))
+    crops = []
+    for path in images:
+        try:
+            crops.extend(person_crops(path, whole_frame=whole_frames))
+        except Exception as e:
+            print(f"Person detector unavailable ({e}), using whole frames.")
+            whole_frames = True
+            crops.extend(person_crops(path, whole_frame=True))
+    kind = "whole-frame" if whole_frames else "person"
+    print(f"{len(crops)} {kind} crops from {len(images)} images, {os.cpu_count()} CPUs")
+    if not crops:
+        return
+
+    baseline = None
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        # Warm-up run so pool start-up is not counted
+        encode_person_crops(crops[:workers * 2], workers=workers)
+        start = time.perf_counter()
+        results = encode_person_crops(crops, workers=workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        found = sum(1 for enc, _, _ in results if enc is not None)
+        print(f"workers={workers:<3} {elapsed:7.2f}s  {len(crops) / elapsed:6.1f} crops/s  "
+              f"speed-up x{baseline / elapsed:4.2f}  faces={found}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import subprocess
+
+# Cold-start benchmark. Every measurement runs in a fresh interpreter so module
+# caches do not hide import cost.
+#
+#   python benchmarks/bench_startup.py [repeats]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    # (label, code timed inside the child)
+    ("import GUI module", "import src.gui"),
+    ("import CLI modules", "import src.registration, src.attendance, src.database"),
+    ("delete path (DB only)", "from src.database import load_db; load_db()"),
+    ("load models", "from src.models import get_yolo_model, get_face_recognition; get_face_recognition(); get_yolo_model()"),
+    ("load + warm up models", "from src.models import warm_up; warm_up()"),
+]
+
+CHILD = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def run_case(code):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD.format(root=ROOT, code=code)],
+                         cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr else "failed")
+    return float(out.stdout.strip().splitlines()[-1]), wall
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"{'case':<24} {'in-process (s)':>15} {'process wall (s)':>17}")
+    for label, code in CASES:
+        try:
+            runs = [run_case(code) for _ in range(repeats)]
+        except RuntimeError as e:
+            print(f"{label:<24} failed: {e}")
+            continue
+        inner = min(r[0] for r in runs)
+        wall = min(r[1] for r in runs)
+        print(f"{label:<24} {inner:>15.3f} {wall:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+import cv2
+import numpy as np
+
+# End-to-end benchmark of the group-photo and webcam-replay pipelines over a
+# fixed image set (the bundled snapshots by default).
+#
+# The gallery is the registered students plus a seeded synthetic population,
+# so runs are repeatable at any gallery size. Reports and events go to a
+# scratch directory, the real attendance log is never touched.
+#
+#   python benchmarks/run_benchmark.py --gallery-size 5000 --labels labels.csv --output results.json
+#
+# labels: CSV with columns image,roll_nos (roll numbers separated by ';') or a
+# JSON object {image: [roll_no, ...]}; images are matched by file name.
+# The JSON results can be diffed between runs to catch regressions.
+#
+# --video replays a recorded classroom video through the headless live pipeline
+# (attendance.replay_video) to measure live throughput and frame drops without a camera.
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database import load_gallery
+from src.matcher import GalleryMatcher
+from src.events import EventStore, set_event_store
+from src.encoding_cache import EncodingCache, set_encoding_cache
+from src.tracking import IoUTracker
+from src import attendance, instrumentation
+
+# Stage timings come from the pipeline's instrumentation spans (src/instrumentation.py)
+PHOTO_STAGES = ['decode', 'resize', 'detect_persons', 'gallery_load', 'face_detect', 'face_detect_encode', 'match',
+                'annotate', 'report_write']
+WEBCAM_STAGES = ['decode', 'resize', 'detect_persons', 'track', 'recognize', 'face_detect_encode', 'match']
+
+# Synthetic identities are spread around the mean registered face at this radius,
+# which keeps their distances to real faces in a realistic range (~0.6 - 0.9)
+SYNTHETIC_RADIUS = 0.6
+
+
+def synthetic_gallery(size, seed):
+    # (roll_nos, names, matrix): the registered students + `size` seeded synthetic ones
+    roll_nos, names, matrix = load_gallery()
+    roll_nos, names = list(roll_nos), list(names)
+    matrix = np.asarray(matrix, dtype=np.float32).reshape(-1, 128)
+    extra = max(0, size - len(set(roll_nos)))
+    if extra:
+        rng = np.random.default_rng(seed)
+        centre = matrix.mean(axis=0) if len(matrix) else np.zeros(128, dtype=np.float32)
+        offsets = rng.standard_normal((extra, 128)).astype(np.float32)
+        offsets *= SYNTHETIC_RADIUS / np.linalg.norm(offsets, axis=1, keepdims=True)
+        matrix = np.concatenate([matrix, centre + offsets])
+        roll_nos += [f"SYN{i:06d}" for i in range(extra)]
+        names += [f"Synthetic {i}" for i in range(extra)]
+    return roll_nos, names, np.ascontiguousarray(matrix)
+
+
+def load_labels(path):
+    # {image file name: set of roll numbers (as str)}
+    if not path:
+        return {}
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {os.path.basename(k): {str(r) for r in v} for k, v in data.items()}
+    labels = {}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            rolls = row.get('roll_nos') or ''
+            labels[os.path.basename(row['image'])] = {r.strip() for r in rolls.split(';') if r.strip()}
+    return labels
+
+
+def score(predicted, expected):
+    # (true positives, false positives, false negatives) of one image
+    predicted = {str(r) for r in predicted}
+    return len(predicted & expected), len(predicted - expected), len(expected - predicted)
+
+
+def accuracy(counts):
+    tp, fp, fn = (sum(c[i] for c in counts) for i in range(3))
+    precision = tp / (tp + fp) if tp + fp else None
+    recall = tp / (tp + fn) if tp + fn else None
+    # Same as 2PR / (P + R), but also defined (0.0) when nothing was matched
+    f1 = 2 * tp / (2 * tp + fp + fn) if tp + fp + fn else None
+    return {'tp': tp, 'fp': fp, 'fn': fn, 'precision': precision, 'recall': recall, 'f1': f1}
+
+
+def stage_summary(per_item, stages):
+    summary = {}
+    for stage in stages:
+        values = np.array([t.get(stage, 0.0) for t in per_item], dtype=np.float64)
+        if not len(values) or not values.any():
+            continue
+        summary[stage] = {
+            'total_s': float(values.sum()),
+            'mean_ms': float(values.mean() * 1000),
+            'p50_ms': float(np.percentile(values, 50) * 1000),
+            'p95_ms': float(np.percentile(values, 95) * 1000),
+        }
+    return summary
+
+
+def peak_rss_mb():
+    # Peak resident memory of this process and of finished child processes (face pool workers)
+    try:
+        import resource
+    except ImportError:
+        return None, None # Windows
+    unit = 1 if sys.platform == 'darwin' else 1024 # ru_maxrss: bytes on macOS, KiB elsewhere
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return round(own / 2**20, 1), round(children / 2**20, 1)
+
+
+def run_photos(images, matcher, labels, scratch):
+    store = attendance.get_event_store()
+    per_image, counts = [], []
+    start_all = time.perf_counter()
+    for path in images:
+        name = os.path.basename(path)
+        stem = os.path.splitext(name)[0]
+        with instrumentation.run('bench_photo', image=name) as record:
+            success, msg, _ = attendance.process_group_photo(
+                path, matcher=matcher, session_id=f"bench/{stem}",
+                report_path=os.path.join(scratch, f"Attendance_{stem}.txt"),
+                debug_image_path=os.path.join(scratch, f"{stem}_debug.jpg"))
+
+        present = sorted(str(r) for r in store.first_seen(f"bench/{stem}"))
+        row = {'image': name, 'success': success, 'total_ms': record.duration * 1000, 'present': present,
+               'stages_ms': {k: v * 1000 for k, v in record.stages.items()}, 'counters': record.counters}
+        if name in labels:
+            row['tp'], row['fp'], row['fn'] = score(present, labels[name])
+            counts.append((row['tp'], row['fp'], row['fn']))
+        per_image.append((row, record.stages))
+    elapsed = time.perf_counter() - start_all
+
+    return {
+        'images': len(images),
+        'wall_s': elapsed,
+        'images_per_s': len(images) / elapsed if elapsed else None,
+        'stages': stage_summary([t for _, t in per_image], PHOTO_STAGES),
+        'accuracy': accuracy(counts) if counts else None,
+        'per_image': [row for row, _ in per_image],
+    }
+
+
+def run_webcam_replay(images, matcher, labels, scale=0.5):
+    # The images replayed as consecutive frames through the live inference path of process_webcam
+    tracker = IoUTracker()
+    per_frame, counts = [], []
+    encoded_total = 0
+    start_all = time.perf_counter()
+    for path in images:
+        with instrumentation.run('bench_frame') as record:
+            with instrumentation.span('decode'):
+                frame = attendance.load_group_photo(path)
+            if frame is not None:
+                tracks, encoded = attendance.infer_live_frame(frame, tracker, matcher, scale=scale)
+                encoded_total += encoded
+        if frame is None:
+            continue
+
+        name = os.path.basename(path)
+        present = sorted({str(t.roll_no) for t in tracks if t.recognized})
+        if name in labels:
+            counts.append(score(present, labels[name]))
+        per_frame.append(record.stages)
+    elapsed = time.perf_counter() - start_all
+
+    return {
+        'frames': len(per_frame),
+        'wall_s': elapsed,
+        'fps': len(per_frame) / elapsed if elapsed else None,
+        'faces_encoded_per_frame': encoded_total / len(per_frame) if per_frame else None,
+        'stages': stage_summary(per_frame, WEBCAM_STAGES),
+        'accuracy': accuracy(counts) if counts else None,
+    }
+
+
+def environment():
+    env = {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+           'numpy': np.__version__, 'opencv': cv2.__version__,
+           'face_workers': attendance.FACE_WORKERS, 'detection_mode': attendance.DETECTION_MODE}
+    from src.detectors import DETECTOR_BACKEND
+    env['detector'] = DETECTOR_BACKEND
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end attendance pipeline benchmark")
+    parser.add_argument('images', nargs='*', help="images to run (default: snapshot_*.jpg)")
+    parser.add_argument('--mode', choices=['photo', 'webcam', 'both'], default='both')
+    parser.add_argument('--gallery-size', type=int, default=1000, help="students in the gallery (registered + synthetic)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--labels', help="CSV / JSON with the students present in each image")
+    parser.add_argument('--exact', action='store_true', help="never use the ANN index")
+    parser.add_argument('--video', help="also replay this video through the live pipeline")
+    parser.add_argument('--pace', choices=attendance.REPLAY_PACES, default='realtime', help="video replay pacing")
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    images = args.images or sorted(glob.glob('snapshot_*.jpg'))
+    if not images and not args.video:
+        print("No images found.")
+        return
+    labels = load_labels(args.labels)
+
+    start = time.perf_counter()
+    roll_nos, names, matrix = synthetic_gallery(args.gallery_size, args.seed)
+    # The ANN index is only used when one was built for exactly this gallery
+    matcher = GalleryMatcher(roll_nos, names, matrix, use_index=not args.exact)
+    gallery_s = time.perf_counter() - start
+    print(f"Gallery: {len(matcher)} students ({len(matrix)} encodings), built in {gallery_s:.2f}s")
+
+    # Stage spans are always collected here, on top of any sinks set via ATTENDANCE_INSTRUMENT
+    stats = instrumentation.get_sink(instrumentation.StatsSink)
+    if stats is None:
+        stats = instrumentation.add_sink(instrumentation.StatsSink())
+
+    scratch = tempfile.mkdtemp(prefix='attendance_bench_')
+    set_event_store(EventStore(os.path.join(scratch, 'events.db')))
+    # A fresh encoding cache: every run starts cold and the real cache is left alone
+    set_encoding_cache(EncodingCache(os.path.join(scratch, 'encoding_cache.db')))
+    results = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'config': {'images': len(images), 'mode': args.mode, 'gallery_size': len(matcher),
+                   'seed': args.seed, 'labels': args.labels, 'exact': args.exact,
+                   'video': args.video, 'pace': args.pace},
+        'environment': environment(),
+        'gallery_build_s': gallery_s,
+    }
+    try:
+        if images and args.mode in ('photo', 'both'):
+            results['photo'] = run_photos(images, matcher, labels, scratch)
+            print(f"Photo: {results['photo']['images_per_s']:.2f} images/s")
+        if images and args.mode in ('webcam', 'both'):
+            results['webcam'] = run_webcam_replay(images, matcher, labels)
+            print(f"Webcam replay: {results['webcam']['fps']:.2f} fps")
+        if args.video:
+            _, _, results['video'] = attendance.replay_video(args.video, pace=args.pace, output_dir=scratch,
+                                                             matcher=matcher)
+            if results['video']:
+                # The frame CSV and the report are written to the scratch dir, which is removed below
+                results['video'].pop('frames_csv', None)
+                results['video'].pop('report', None)
+    finally:
+        # Stop the face pool so its workers' memory shows up in the children's peak RSS
+        if attendance._face_pool is not None:
+            attendance._face_pool.shutdown()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    # Face / match counters and the latency and match-distance histograms of the whole run
+    results['instrumentation'] = stats.snapshot()
+    results['peak_rss_mb'], results['peak_rss_children_mb'] = peak_rss_mb()
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, default=str)
+
+    for mode in ('photo', 'webcam'):
+        if mode in results:
+            print(f"\n{mode} stages (mean / p95 ms):")
+            for stage, s in results[mode]['stages'].items():
+                print(f"  {stage:<20} {s['mean_ms']:9.1f} {s['p95_ms']:9.1f}")
+            if results[mode]['accuracy']:
+                acc = results[mode]['accuracy']
+                print(f"  accuracy: precision={acc['precision']} recall={acc['recall']} f1={acc['f1']}")
+    print(f"\nPeak RSS: {results['peak_rss_mb']} MB (children {results['peak_rss_children_mb']} MB)")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
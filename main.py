@@ -1,8 +1,10 @@
 import sys
 import os
-from src.registration import register_student
-from src.attendance import process_group_photo, process_webcam
-from src.database import delete_student_by_roll
+from datetime import datetime
+from src.registration import register_student, register_students_batch
+from src.attendance import process_group_photo, process_webcam, process_photo_folder, replay_video
+from src.database import delete_students_by_roll, load_gallery, EXCEL_PATH
+from src.events import get_event_store
 
 def main():
     print("====================================")
@@ -15,9 +17,14 @@ def main():
         print("2. Mark Attendance (Process Group Photo)")
         print("3. Real-Time Webcam Attendance")
         print("4. Delete Student")
-        print("5. Exit")
+        print("5. Bulk Register Students (Folder / CSV)")
+        print("6. Process Photo Folder (Batch)")
+        print("7. Export Attendance to Excel")
+        print("8. Attendance Analytics Report (Monthly / Semester)")
+        print("9. Replay Recorded Video (Headless)")
+        print("10. Exit")
         
-        choice = input("Enter simple choice (1-5): ").strip()
+        choice = input("Enter simple choice (1-10): ").strip()
         
         if choice == '1':
             print("\n--- Register Student ---")
@@ -27,15 +34,17 @@ def main():
                 print("Error: Name and Roll No are required.")
                 continue
                 
-            image_path = input("Enter path to student's photo: ").strip()
-            image_path = image_path.replace('"', '').replace("'", "")
+            # Several photos of the same student can be given, separated by ';'
+            raw_paths = input("Enter path to student's photo(s) (separate multiple with ';'): ").strip()
+            image_paths = [p.strip().replace('"', '').replace("'", "") for p in raw_paths.split(';') if p.strip()]
             
-            if not os.path.exists(image_path):
+            missing = [p for p in image_paths if not os.path.exists(p)]
+            if not image_paths or missing:
                 print("Error: File not found.")
                 continue
                 
             try:
-                register_student(name, roll_no, image_path)
+                register_student(name, roll_no, image_paths)
             except Exception as e:
                 print(f"An error occurred: {e}")
                 
@@ -69,17 +78,89 @@ def main():
 
         elif choice == '4':
             print("\n--- Delete Student ---")
-            roll_no = input("Enter Roll No to delete: ").strip()
-            if not roll_no:
+            # Several roll numbers (e.g. a graduating batch) can be deleted in one go
+            raw = input("Enter Roll No(s) to delete (comma separated, or path to a .txt list): ").strip()
+            raw = raw.replace('"', '').replace("'", "")
+            if not raw:
                 print("Error: Roll No is required.")
                 continue
+            if os.path.isfile(raw):
+                with open(raw, 'r', encoding='utf-8') as f:
+                    raw = f.read()
+            roll_nos = [r.strip() for r in raw.replace('\n', ',').split(',') if r.strip()]
             
             try:
-                delete_student_by_roll(roll_no)
+                delete_students_by_roll(roll_nos)
             except Exception as e:
                 print(f"An error occurred: {e}")
                 
         elif choice == '5':
+            print("\n--- Bulk Register Students ---")
+            print("Folder images must be named <RollNo>_<Name>.jpg; CSV needs roll_no,name,image_path columns.")
+            source = input("Enter path to folder or CSV manifest: ").strip()
+            source = source.replace('"', '').replace("'", "")
+            
+            if not os.path.exists(source):
+                print("Error: Path not found.")
+                continue
+                
+            try:
+                register_students_batch(source)
+            except Exception as e:
+                print(f"An error occurred: {e}")
+                
+        elif choice == '6':
+            print("\n--- Process Photo Folder ---")
+            folder = input("Enter path to folder of group photos (Press Enter for current folder): ").strip()
+            folder = folder.replace('"', '').replace("'", "") or "."
+            
+            if not os.path.isdir(folder):
+                print("Error: Folder not found.")
+                continue
+                
+            try:
+                process_photo_folder(folder)
+            except Exception as e:
+                print(f"An error occurred: {e}")
+                
+        elif choice == '7':
+            print("\n--- Export Attendance ---")
+            since = input("From date YYYY-MM-DD (Press Enter for all sessions): ").strip() or None
+            try:
+                # Students deleted since are left out, like deleting them from the sheet would
+                path = get_event_store().export_excel(EXCEL_PATH, since=since, roll_nos=set(load_gallery()[0]))
+                print(f"Attendance exported to {os.path.abspath(path)}")
+            except Exception as e:
+                print(f"An error occurred: {e}")
+                
+        elif choice == '8':
+            print("\n--- Attendance Analytics Report ---")
+            since = input("From date YYYY-MM-DD (Press Enter for all sessions): ").strip() or None
+            until = input("Until date YYYY-MM-DD, exclusive (Press Enter for today): ").strip() or None
+            fmt = input("Format csv / xlsx / parquet (Press Enter for xlsx): ").strip().lower() or 'xlsx'
+            try:
+                from src.reporting import build_reports # pandas is only needed here
+                build_reports(f"Attendance_Analytics_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}",
+                              fmt=fmt, since=since, until=until)
+            except Exception as e:
+                print(f"An error occurred: {e}")
+                
+        elif choice == '9':
+            print("\n--- Replay Recorded Video ---")
+            video_path = input("Enter path to video file: ").strip()
+            video_path = video_path.replace('"', '').replace("'", "")
+            
+            if not os.path.isfile(video_path):
+                print("Error: File not found.")
+                continue
+            pace = input("Pacing realtime / fast (Press Enter for realtime): ").strip().lower() or 'realtime'
+                
+            try:
+                replay_video(video_path, pace=pace)
+            except Exception as e:
+                print(f"An error occurred: {e}")
+                
+        elif choice == '10':
             print("Exiting...")
             break
         else:
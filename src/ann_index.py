@@ -0,0 +1,194 @@
+import os
+import hashlib
+import numpy as np
+from src.database import load_gallery
+
+# Approximate nearest-neighbour (IVF) index over the 128-d face encodings.
+# The gallery is partitioned with k-means; a query only scans the students in
+# the `nprobe` partitions closest to it instead of the whole gallery.
+
+ANN_INDEX_PATH = 'data/ann_index.npz'
+
+# Below this gallery size the exact scan is fast enough, no index is kept
+ANN_MIN_GALLERY = 2000
+
+# Recall / speed trade-off: how many partitions are scanned per query.
+# Higher = closer to the exact result, lower = faster.
+ANN_NPROBE = 8
+
+KMEANS_ITERATIONS = 15
+KMEANS_MAX_TRAIN_PER_LIST = 256
+
+
+def gallery_fingerprint(encodings):
+    return hashlib.sha1(np.ascontiguousarray(encodings, dtype=np.float32).tobytes()).hexdigest()
+
+
+def _sq_dists(a, b, b_sq=None):
+    # Squared euclidean distances between every row of a and every row of b
+    a_sq = np.einsum('ij,ij->i', a, a)
+    if b_sq is None:
+        b_sq = np.einsum('ij,ij->i', b, b)
+    d2 = a_sq[:, None] + b_sq[None, :] - 2.0 * (a @ b.T)
+    np.maximum(d2, 0.0, out=d2)
+    return d2
+
+
+def _assign(encodings, centroids, chunk=8192):
+    # Nearest centroid for every encoding (chunked to bound memory)
+    c_sq = np.einsum('ij,ij->i', centroids, centroids)
+    out = np.empty(len(encodings), dtype=np.int32)
+    for start in range(0, len(encodings), chunk):
+        block = encodings[start:start + chunk]
+        out[start:start + chunk] = np.argmin(_sq_dists(block, centroids, c_sq), axis=1)
+    return out
+
+
+def train_kmeans(encodings, n_lists, n_iter=KMEANS_ITERATIONS, seed=0):
+    rng = np.random.default_rng(seed)
+
+    # Train on a sub-sample, k-means does not need every student to find the partitions
+    max_train = n_lists * KMEANS_MAX_TRAIN_PER_LIST
+    if len(encodings) > max_train:
+        train = encodings[rng.choice(len(encodings), max_train, replace=False)]
+    else:
+        train = encodings
+
+    centroids = train[rng.choice(len(train), n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _assign(train, centroids)
+        counts = np.bincount(labels, minlength=n_lists)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, train)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty partitions with random points
+        if empty.any():
+            centroids[empty] = train[rng.choice(len(train), int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, centroids, assignments, fingerprint, trained_size):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.fingerprint = fingerprint
+        self.trained_size = int(trained_size)
+        self.centroid_sq = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+        # Inverted lists in CSR layout: ids of list l are list_ids[offsets[l]:offsets[l+1]]
+        self.list_ids = np.argsort(self.assignments, kind='stable').astype(np.int64)
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self):
+        return len(self.assignments)
+
+    @classmethod
+    def build(cls, encodings, n_lists=None, seed=0):
+        encodings = np.ascontiguousarray(encodings, dtype=np.float32)
+        if n_lists is None:
+            # Common IVF rule of thumb: ~sqrt(N) partitions
+            n_lists = max(1, int(np.sqrt(len(encodings))))
+        n_lists = min(n_lists, len(encodings))
+        centroids = train_kmeans(encodings, n_lists, seed=seed)
+        return cls(centroids, _assign(encodings, centroids), gallery_fingerprint(encodings), len(encodings))
+
+    def extend(self, encodings):
+        # Assign rows appended after the last build without re-training
+        encodings = np.ascontiguousarray(encodings, dtype=np.float32)
+        new_rows = encodings[len(self.assignments):]
+        assignments = np.concatenate([self.assignments, _assign(new_rows, self.centroids)])
+        return IVFIndex(self.centroids, assignments, gallery_fingerprint(encodings), self.trained_size)
+
+    def search(self, gallery, gallery_sq, probes, nprobe=ANN_NPROBE):
+        # Best gallery index and distance per probe, scanning only `nprobe` lists
+        probes = np.asarray(probes, dtype=np.float32).reshape(-1, gallery.shape[1])
+        best_idx = np.full(len(probes), -1, dtype=np.intp)
+        best_dist = np.full(len(probes), np.inf, dtype=np.float32)
+        if len(probes) == 0:
+            return best_idx, best_dist
+
+        n_lists = len(self.centroids)
+        nprobe = max(1, min(nprobe, n_lists))
+        coarse = _sq_dists(probes, self.centroids, self.centroid_sq)
+        if nprobe < n_lists:
+            probe_lists = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probe_lists = np.broadcast_to(np.arange(n_lists), (len(probes), n_lists))
+
+        probe_sq = np.einsum('ij,ij->i', probes, probes)
+        for m, lists in enumerate(probe_lists):
+            candidates = np.concatenate([self.list_ids[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+            if candidates.size == 0:
+                continue
+            d2 = probe_sq[m] + gallery_sq[candidates] - 2.0 * (gallery[candidates] @ probes[m])
+            j = int(np.argmin(d2))
+            best_idx[m] = candidates[j]
+            best_dist[m] = np.sqrt(max(float(d2[j]), 0.0))
+        return best_idx, best_dist
+
+    def save(self, path=ANN_INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, centroids=self.centroids, assignments=self.assignments,
+                 fingerprint=np.array(self.fingerprint), trained_size=np.array(self.trained_size))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=ANN_INDEX_PATH):
+        with np.load(path) as data:
+            return cls(data['centroids'], data['assignments'], str(data['fingerprint']), int(data['trained_size']))
+
+
+def index_version(path=ANN_INDEX_PATH):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def load_index_for(encodings, path=ANN_INDEX_PATH):
+    # Returns the persisted index if it matches this exact gallery, else None (exact scan)
+    if len(encodings) < ANN_MIN_GALLERY or not os.path.exists(path):
+        return None
+    try:
+        index = IVFIndex.load(path)
+    except Exception as e:
+        print(f"Warning: Could not load ANN index ({e}). Using exact search.")
+        return None
+    if len(index) != len(encodings) or index.fingerprint != gallery_fingerprint(encodings):
+        print("Warning: ANN index is out of date. Using exact search.")
+        return None
+    return index
+
+
+def refresh_index(encodings=None, path=ANN_INDEX_PATH):
+    # Keep the persisted index in sync with the gallery. Called after registration / deletion.
+    if encodings is None:
+        encodings = load_gallery()[2]
+
+    if len(encodings) < ANN_MIN_GALLERY:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+
+    index = None
+    if os.path.exists(path):
+        try:
+            old = IVFIndex.load(path)
+            # Only new rows were appended and the partitions are still representative
+            if (len(old) <= len(encodings) and len(encodings) <= 2 * old.trained_size
+                    and gallery_fingerprint(encodings[:len(old)]) == old.fingerprint):
+                index = old.extend(encodings)
+        except Exception as e:
+            print(f"Warning: Rebuilding ANN index ({e}).")
+
+    if index is None:
+        print(f"Building ANN index over {len(encodings)} encodings...")
+        index = IVFIndex.build(encodings)
+
+    index.save(path)
+    return index
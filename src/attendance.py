@@ -1,225 +1,674 @@
-from ultralytics import YOLO
-import face_recognition
 import cv2
 import numpy as np
-import pandas as pd
 from datetime import datetime
 import os
-from src.database import load_db
-import traceback
+import copy
+import time
+import threading
+from src.matcher import get_matcher, DEFAULT_TOLERANCE
+from src.events import get_event_store
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.face_worker import (detect_and_encode_safe, upsample_for_size, detect_faces_tiled, face_chip,
+                             encode_face_job, FACE_FIRST_TILE, FACE_FIRST_OVERLAP, FACE_FIRST_UPSAMPLE,
+                             CROP_SETTINGS, FACE_FIRST_SETTINGS)
+from src.encoding_cache import get_encoding_cache, frame_digest, make_key, cache_lookup, cache_store
+from src.models import get_face_recognition
+from src.detectors import (get_detector, detect_tiled, DETECTOR_BACKEND, CONF_THRESHOLD, YOLO_INPUT_SIZE,
+                           TILE_SETTINGS)
+from src.live_pipeline import LivePipeline, PacedCapture, format_stats
+from src.tracking import IoUTracker
+from src.instrumentation import span, count, observe, run as pipeline_run
 
-# Load YOLO model (standard COCO model, we will use class 0: person)
-# It will auto-download on first run
-yolo_model = YOLO('yolov8n.pt')
+# Models (YOLO, dlib) are loaded on first use, see src/models.py
 
+# Worker processes for per-person face detection + encoding (1 = run serially).
+# dlib only partially releases the GIL, so processes should scale where threads don't
+# (not measured on a multi-core machine yet, see README "Face Workers").
+FACE_WORKERS = int(os.environ.get('ATTENDANCE_FACE_WORKERS', os.cpu_count() or 1))
 
-def process_group_photo(image_path, output_csv='attendance.csv'):
-    print(f"Processing group photo: {image_path}")
-    
-    # 1. Load Image
+_face_pool = None
+_face_pool_size = 0
+
+
+def _get_face_pool(workers):
+    # The pool is kept alive between photos: spawning workers costs more than a small photo
+    global _face_pool, _face_pool_size
+    if _face_pool is None or _face_pool_size != workers:
+        if _face_pool is not None:
+            _face_pool.shutdown(wait=False)
+        _face_pool = ProcessPoolExecutor(max_workers=workers)
+        _face_pool_size = workers
+    return _face_pool
+
+
+def pool_map(fn, items, workers=None):
+    # map() over the face pool, results in input order. Small jobs run serially.
+    global _face_pool
+    items = list(items)
+    if workers is None:
+        workers = FACE_WORKERS
+    if workers <= 1 or len(items) < 2:
+        return [fn(item) for item in items]
+
+    try:
+        pool = _get_face_pool(workers)
+        chunksize = max(1, len(items) // (workers * 4))
+        return list(pool.map(fn, items, chunksize=chunksize))
+    except BrokenProcessPool as e:
+        print(f"Face worker pool failed ({e}). Falling back to serial processing.")
+        _face_pool = None
+        return [fn(item) for item in items]
+
+
+def encode_person_crops(person_crops, workers=None):
+    # Detect + encode the face in every crop. Results come back in input order:
+    # a list of (encoding or None, error message or None, detection path).
+    return pool_map(detect_and_encode_safe, person_crops, workers)
+
+
+# How faces are found in group photos:
+#   'person' - YOLO person boxes, then a face detector inside every crop (default)
+#   'face'   - face-first: one tiled multi-scale face detector pass over the whole frame (no YOLO)
+#   'auto'   - pick whichever of the two is cheaper for the crowd. The choice is made from
+#              the previous photo's YOLO boxes: after a crowded photo the next ones go
+#              face-first without YOLO, which only runs again every AUTO_RECHECK_EVERY photos.
+DETECTION_MODE = os.environ.get('ATTENDANCE_DETECTION_MODE', 'person')
+
+# 'auto' never switches to face-first for fewer persons than this
+FACE_FIRST_MIN_PERSONS = 8
+
+# 'auto' in face-first mode re-checks the crowd with YOLO on every n-th photo
+AUTO_RECHECK_EVERY = 10
+
+_auto_lock = threading.Lock()
+_auto_mode = 'person' # last choice of the cost model
+_auto_face_first_runs = 0 # photos processed face-first since YOLO last ran
+
+
+def initial_detection_mode():
+    # Mode a photo starts in, before any detector ran: 'face' skips YOLO.
+    # In 'auto' this follows the previous photo's choice (see choose_detection_mode).
+    global _auto_face_first_runs
+    if DETECTION_MODE != 'auto':
+        return DETECTION_MODE
+    with _auto_lock:
+        if _auto_mode == 'face' and _auto_face_first_runs < AUTO_RECHECK_EVERY:
+            _auto_face_first_runs += 1
+            return 'face'
+        return 'person'
+
+
+def choose_detection_mode(img, detected_persons, pad=20):
+    # Mode for a photo YOLO has run on; in 'auto' it is remembered for the next photos
+    global _auto_mode, _auto_face_first_runs
+    if DETECTION_MODE != 'auto':
+        return DETECTION_MODE
+    mode = _cheaper_detection_mode(img, detected_persons, pad)
+    with _auto_lock:
+        _auto_mode = mode
+        _auto_face_first_runs = 0
+    return mode
+
+
+def _cheaper_detection_mode(img, detected_persons, pad=20):
+    # Cost model for 'auto': the HOG detector's work grows with the pixels it scans
+    # (x4 per upsample). Crowded rows of seated students give large, heavily
+    # overlapping person crops, so re-scanning every crop costs more than one
+    # tiled pass over the frame; sparse / standing groups are cheaper per crop.
+    if len(detected_persons) < FACE_FIRST_MIN_PERSONS:
+        return 'person'
+
+    h, w = img.shape[:2]
+    crop_cost = 0
+    for (x1, y1, x2, y2) in detected_persons:
+        ch = min(h, y2 + pad) - max(0, y1 - pad)
+        cw = min(w, x2 + pad) - max(0, x1 - pad)
+        crop_cost += ch * cw * 4 ** upsample_for_size(ch, cw)
+
+    overlap = (1 + FACE_FIRST_OVERLAP / FACE_FIRST_TILE) ** 2
+    face_first_cost = h * w * overlap * 4 ** FACE_FIRST_UPSAMPLE
+    return 'face' if face_first_cost < crop_cost else 'person'
+
+
+# Seconds between the live pipeline's latency / queue reports
+LIVE_STATS_INTERVAL = 10
+
+# How long the webcam window waits for a key when there is no new frame or result to draw
+LIVE_IDLE_WAIT_MS = 10
+
+# Group photos wider than this are either
+#   'tiled'     - kept at full resolution: YOLO runs on overlapping tiles (see detectors.detect_tiled)
+#                 and faces are found in full-resolution crops, so back rows stay detectable
+#   'downscale' - resized to MAX_PHOTO_WIDTH first (fastest, small faces may be lost)
+MAX_PHOTO_WIDTH = 1920
+LARGE_PHOTO_MODE = os.environ.get('ATTENDANCE_LARGE_PHOTO_MODE', 'tiled')
+
+# Person crops cut and sent to the face pool per round (bounds memory on very large photos)
+ENCODE_CHUNK = 32
+
+# How many images go through the person detector in one call
+YOLO_BATCH_SIZE = 8
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+# Snapshots are processed straight from memory; keeping a copy on disk is optional
+SAVE_SNAPSHOTS = os.environ.get('ATTENDANCE_SAVE_SNAPSHOTS', '0') == '1'
+SNAPSHOT_DIR = 'snapshots'
+
+# Annotated copy of a processed group photo (frames / snapshots only write one when asked to)
+DEBUG_IMAGE_PATH = 'attendance_debug.jpg'
+
+_image_writer = None
+
+
+def load_group_photo(image_path):
     img = cv2.imread(image_path)
     if img is None:
-        msg = "Error: Could not load image."
-        print(msg)
-        return False, msg, None
-     # Resize for faster processing if too large? 
-    if img.shape[1] > 1920:
-         scale = 1920 / img.shape[1]
+        return None
+    return prepare_group_frame(img)
+
+
+def prepare_group_frame(img):
+    # Resize for faster processing if too large (unless large photos are processed tiled)
+    if img.shape[1] > MAX_PHOTO_WIDTH and LARGE_PHOTO_MODE != 'tiled':
+         scale = MAX_PHOTO_WIDTH / img.shape[1]
          img = cv2.resize(img, (0,0), fx=scale, fy=scale)
+    return img
 
-    rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    
-    # 2. Detect Persons using YOLO
-    try:
-        results = yolo_model(img, classes=[0], verbose=False) # class 0 is person
-    except Exception as e:
-        msg = f"YOLO Crashed: {e}"
-        print(msg)
-        return False, msg, None
-    
-    detected_persons = []
-    
-    # Extract bounding boxes
-    for r in results:
-        boxes = r.boxes
-        for box in boxes:
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-            detected_persons.append((x1, y1, x2, y2))
-            
-    print(f"YOLO detected {len(detected_persons)} people.")
-    
-    # 3. Load Registered Students
+
+def save_image_async(path, img):
+    # Writes a copy of img on a background thread (the caller may keep drawing on img).
+    # Returns a Future that resolves to the path (or raises if the write failed).
+    global _image_writer
+    if _image_writer is None:
+        _image_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-writer')
+    frame = img.copy()
+
+    def write():
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not cv2.imwrite(path, frame):
+            raise IOError(f"Could not write {path}")
+        return path
+
+    return _image_writer.submit(write)
+
+
+def snapshot_path():
+    return os.path.join(SNAPSHOT_DIR, f"snapshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg")
+
+
+def detect_persons_batch(images, backend=None):
+    # Runs the person detector once over a list of BGR images. Returns, per image,
+    # a list of (x1, y1, x2, y2) boxes in that image's own pixel coordinates.
+    # The backend (torch / onnx / onnx-int8) comes from DETECTOR_BACKEND by default.
+    # Photos larger than MAX_PHOTO_WIDTH (LARGE_PHOTO_MODE 'tiled') are detected tile by tile.
+    detector = get_detector(backend)
+    results = [None] * len(images)
+    regular = [i for i, img in enumerate(images) if not needs_tiling(img)]
+    for i, boxes in zip(regular, detector.detect_batch([images[i] for i in regular])):
+        results[i] = boxes
+    for i in range(len(images)):
+        if results[i] is None:
+            with span('detect_persons_tiled'):
+                results[i] = detect_tiled(images[i], detector)
+    return results
+
+
+def needs_tiling(img):
+    return LARGE_PHOTO_MODE == 'tiled' and img.shape[1] > MAX_PHOTO_WIDTH
+
+
+def detect_persons(img):
+    return detect_persons_batch([img])[0]
+
+
+def detect_persons_cached(img, digest=None):
+    # detect_persons() with the boxes kept in the encoding cache, keyed by the frame content
+    # (digest, see encoding_cache.frame_digest) and the detector settings
+    if digest is None:
+        return detect_persons(img)
+    key = make_key(digest, 'persons', DETECTOR_BACKEND, YOLO_INPUT_SIZE, CONF_THRESHOLD,
+                   TILE_SETTINGS if needs_tiling(img) else '')
+    cached = cache_lookup([key])
+    if key in cached:
+        return cached[key]
+    boxes = [tuple(int(v) for v in box[:4]) for box in detect_persons(img)]
+    cache_store([(key, boxes)])
+    return boxes
+
+
+def process_group_photo(image_path, output_csv='attendance.csv', debug_image_path=DEBUG_IMAGE_PATH, **options):
+    # options are passed on to recognize_group_photo.
+    # Stages are timed as instrumentation spans (decode, resize, detect_persons, gallery_load,
+    # face_detect_encode, match, annotate, report_write), see src/instrumentation.py.
+    print(f"Processing group photo: {image_path}")
+
+    with pipeline_run('group_photo', image=os.path.basename(image_path)):
+        # 1. Load Image
+        with span('decode'):
+            img = cv2.imread(image_path)
+        if img is None:
+            msg = "Error: Could not load image."
+            print(msg)
+            return False, msg, None
+
+        return process_group_frame(img, debug_image_path=debug_image_path, **options)
+
+
+def process_group_frame(img, save_image_path=None, **options):
+    # Same as process_group_photo for a BGR frame already in memory (webcam snapshots),
+    # without the JPEG encode / decode round-trip. img is annotated in place.
+    # save_image_path: optionally keep a copy of the raw frame (full size), written in the background.
+    # The annotated debug image is only written when options has a debug_image_path.
+    # Returns (success, msg, debug_image_path).
+    with pipeline_run('group_frame'):
+        if save_image_path:
+            save_image_async(save_image_path, img)
+        with span('resize'):
+            img = prepare_group_frame(img)
+        # Content hash of the frame: reprocessing the same photo is served from the encoding cache
+        digest = frame_digest(img) if get_encoding_cache() is not None else None
+
+        # 2. Detect Persons using YOLO (skipped in face-first mode)
+        detected_persons = None
+        if initial_detection_mode() != 'face':
+            try:
+                with span('detect_persons'):
+                    detected_persons = detect_persons_cached(img, digest)
+            except Exception as e:
+                msg = f"YOLO Crashed: {e}"
+                print(msg)
+                return False, msg, None
+
+            print(f"YOLO detected {len(detected_persons)} people.")
+            count('persons.detected', len(detected_persons))
+            if choose_detection_mode(img, detected_persons) == 'face':
+                print("Crowded frame: switching to face-first detection.")
+                count('mode.face_first')
+                detected_persons = None
+
+        return recognize_group_photo(img, detected_persons, digest=digest, **options)
+
+
+def encode_group_faces(img, detected_persons, pad=20, digest=None, job=None):
+    # Step 4 of recognize_group_photo: find and encode every face, in parallel (see FACE_WORKERS).
+    # detected_persons=None runs face-first detection over the whole frame.
+    # digest: content hash of img; face locations and encodings are then looked up in / added
+    # to the encoding cache, and only the misses go through dlib.
+    # Crops are cut (and converted to RGB) ENCODE_CHUNK at a time, so memory follows the
+    # chunk, not the photo. Returns (boxes (i, x1, y1, x2, y2) of the encoded faces, their encodings).
+    # job: a GUI job (src/jobs.py); progress is reported and cancellation honoured between chunks.
+    crop_boxes = [] # (i, x1, y1, x2, y2)
+    cache_keys = [] # per crop, None without a digest
+    if detected_persons is None:
+        # Face-first: one tiled pass over the whole frame, then straight to encoding
+        rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        locations_key = make_key(digest, FACE_FIRST_SETTINGS, 'locations') if digest else None
+        face_locations = cache_lookup([locations_key]).get(locations_key)
+        if face_locations is None:
+            with span('face_detect'):
+                face_locations = detect_faces_tiled(rgb_img, map_fn=pool_map)
+            cache_store([(locations_key, face_locations)])
+        print(f"Face-first detection found {len(face_locations)} faces.")
+        for i, location in enumerate(face_locations):
+            top, right, bottom, left = location
+            crop_boxes.append((i, left, top, right, bottom))
+            cache_keys.append(make_key(digest, FACE_FIRST_SETTINGS, location) if digest else None)
+
+        def make_job(j):
+            return face_chip(rgb_img, face_locations[crop_boxes[j][0]])
+        encode_fn = encode_face_job
+    else:
+        h, w, _ = img.shape
+        for i, (x1, y1, x2, y2) in enumerate(detected_persons):
+            # Add padding
+            x1 = max(0, x1 - pad)
+            y1 = max(0, y1 - pad)
+            x2 = min(w, x2 + pad)
+            y2 = min(h, y2 + pad)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            crop_boxes.append((i, x1, y1, x2, y2))
+            cache_keys.append(make_key(digest, CROP_SETTINGS, x1, y1, x2, y2) if digest else None)
+
+        def make_job(j):
+            # RGB copy of just this crop (contiguous, as dlib needs)
+            _, x1, y1, x2, y2 = crop_boxes[j]
+            return cv2.cvtColor(img[y1:y2, x1:x2], cv2.COLOR_BGR2RGB)
+        encode_fn = detect_and_encode_safe
+
+    # Cached crops skip dlib; only the misses go to the face pool
+    cached = cache_lookup(cache_keys)
+    results = [None] * len(crop_boxes)
+    todo = []
+    for j, key in enumerate(cache_keys):
+        if key in cached:
+            encoding, path = cached[key]
+            results[j] = (encoding, None, path)
+        else:
+            todo.append(j)
+    if cached:
+        print(f"Encoding cache: {len(crop_boxes) - len(todo)} of {len(crop_boxes)} faces cached.")
+    chunk_size = max(ENCODE_CHUNK, FACE_WORKERS * 4)
+    for start in range(0, len(todo), chunk_size):
+        if job is not None:
+            job.check_cancelled()
+            job.report(start, len(todo), "Encoding faces")
+        chunk = todo[start:start + chunk_size]
+        with span('face_detect_encode'):
+            fresh = pool_map(encode_fn, [make_job(j) for j in chunk])
+        for j, result in zip(chunk, fresh):
+            results[j] = result
+        # Errors are not cached, everything else (including 'no face here') is
+        cache_store([(cache_keys[j], (result[0], result[2])) for j, result in zip(chunk, fresh) if result[1] is None])
+
+    encoded_persons = [] # (i, x1, y1, x2, y2)
+    probe_encodings = []
+    path_counts = {} # which detection path each crop took (see face_worker.detect_and_encode)
+    # Face locations found: one per crop face-first, in person mode every crop
+    # where dlib found a face (':noenc' ones included, ':none' and errors not)
+    faces_found = 0
+    for box, (encoding, error, path) in zip(crop_boxes, results):
+        path_counts[path] = path_counts.get(path, 0) + 1
+        if detected_persons is None or not (error or path.endswith(':none')):
+            faces_found += 1
+        if error:
+            print(f"Error processing person {box[0]}: {error}")
+            count('faces.errors')
+        elif encoding is not None:
+            encoded_persons.append(box)
+            probe_encodings.append(encoding)
+
+    if path_counts:
+        print("Face detection paths: " + ", ".join(f"{p}={n}" for p, n in sorted(path_counts.items())))
+        # Upsample levels tried per crop: where the dlib time goes
+        for path, n in path_counts.items():
+            count(f"face_path.{path}", n)
+    count('faces.detected', faces_found)
+    count('faces.encoded', len(probe_encodings))
+    return encoded_persons, probe_encodings
+
+
+def recognize_group_photo(img, detected_persons, report_path=None, debug_image_path=None, session_id=None,
+                          matcher=None, digest=None, job=None):
+    # Steps 3-6 of process_group_photo: identify the detected persons, annotate img
+    # and write the report. Returns (success, msg, debug_image_path).
+    # debug_image_path: also save the annotated image there (None: don't).
+    # detected_persons=None runs face-first detection over the whole frame instead.
+    # matcher: match against this gallery instead of the registered students (benchmarks).
+    # digest: content hash of img for the encoding cache (computed here when not given).
+    # job: the GUI job running this; it can be cancelled until the faces are encoded (JobCancelled).
+    with pipeline_run('recognize_group'):
+        return _recognize_group_photo(img, detected_persons, report_path, debug_image_path, session_id, matcher, digest, job)
+
+
+def _recognize_group_photo(img, detected_persons, report_path, debug_image_path, session_id, matcher, digest, job):
+    if digest is None and get_encoding_cache() is not None:
+        digest = frame_digest(img) # before img is annotated
+    # 3. Load Registered Students (cached matrix, rebuilt only when the DB changes)
     try:
-        db = load_db()
+        with span('gallery_load'):
+            if matcher is None:
+                matcher = get_matcher()
     except Exception as e:
         msg = f"Failed to load DB: {e}"
         print(msg)
         return False, msg, None
         
-    if not db:
+    if len(matcher) == 0:
         msg = "No registered students found. Please register students first."
         print(msg)
         return False, msg, None
 
-    known_encodings = [data['encoding'] for data in db.values()]
-    known_roll_nos = list(db.keys())
-    known_names = [data['name'] for data in db.values()]
+    known_roll_nos = matcher.roll_nos
+    known_names = matcher.names
     
     present_roll_nos = []
+    attendance_events = [] # (roll_no, session, timestamp, distance, source)
+    started_at = datetime.now()
+    if session_id is None:
+        session_id = started_at.strftime('%Y-%m-%d_%H-%M-%S')
     
-    # 4. For each person, detect face and recognize
-    for i, (x1, y1, x2, y2) in enumerate(detected_persons):
-        try:
-            # Add padding
-            h, w, _ = img.shape
-            pad = 20
-            x1 = max(0, x1 - pad)
-            y1 = max(0, y1 - pad)
-            x2 = min(w, x2 + pad)
-            y2 = min(h, y2 + pad)
-            
-            # Ensure contiguous memory layout for dlib
-            person_crop = np.ascontiguousarray(rgb_img[y1:y2, x1:x2])
-            
-            if person_crop.size == 0:
-                continue
-            
-            # Detect face specifically in this crop
-            # Try to find face locations first with upsampling (helps with small faces)
-            # number_of_times_to_upsample=2 makes it slower but finds smaller faces
-            face_locs = face_recognition.face_locations(person_crop, number_of_times_to_upsample=2)
-            
-            if not face_locs:
-                # print(f"DEBUG: Person {i} - No face detected in crop {person_crop.shape}")
-                # Fallback: Maybe YOLO crop is just the face? Or body?
-                # If YOLO detected a person, but dlib can't find a face, it might be a back view or occlusion.
-                pass
-                
-            # Even if face_locs is empty, we can try encoding the whole crop? 
-            # No, 'face_encodings' without locations will run the detector again (default upsample=1).
-            # If we pass face_locs, it uses them.
-            
-            if face_locs:
-                face_encodings = face_recognition.face_encodings(person_crop, face_locs)
-            else:
-                # Last ditch effort: try detecting with default settings
-                face_encodings = face_recognition.face_encodings(person_crop)
+    # 4. For each person, crop and detect + encode the face
+    encoded_persons, probe_encodings = encode_group_faces(img, detected_persons, digest=digest, job=job)
+    if job is not None:
+        job.check_cancelled() # last safe point: nothing has been written yet
 
-            if not face_encodings:
-                # print(f"DEBUG: Person {i} - No encoding generated.")
-                continue
-                
-            encoding = face_encodings[0]
-            
-            # Match
-            # Increased tolerance to 0.55 to improve detection rates (was 0.45)
-            tolerance = 0.55
-            matches = face_recognition.compare_faces(known_encodings, encoding, tolerance=tolerance)
-            face_distances = face_recognition.face_distance(known_encodings, encoding)
-            
+    # 5. Match every encoded face against the gallery in one batched operation
+    # Increased tolerance to 0.55 to improve detection rates (was 0.45)
+    tolerance = DEFAULT_TOLERANCE
+    with span('match'):
+        best_indices, best_distances = matcher.match(probe_encodings)
+
+    with span('annotate'):
+        for (i, x1, y1, x2, y2), best_match_index, best_distance in zip(encoded_persons, best_indices, best_distances):
             name = "Unknown"
             roll_no = "N/A"
             confidence_str = ""
             color = (0, 0, 255) # Red for unknown
 
-            # Debug: Print the best match distance to see what's happening
-            if len(face_distances) > 0:
-                best_match_index = np.argmin(face_distances)
-                best_distance = face_distances[best_match_index]
-                
-                # print(f"DEBUG: Person {i} Best Dist: {best_distance:.3f} (Tol: {tolerance})")
-                
-                if best_distance < tolerance:
-                    roll_no = known_roll_nos[best_match_index]
-                    name = known_names[best_match_index]
-                    confidence = round((1 - best_distance) * 100, 2)
-                    confidence_str = f"{confidence}%"
-                    color = (0, 255, 0) # Green for match
-                    
-                    if roll_no not in present_roll_nos:
-                        present_roll_nos.append(roll_no)
-                        print(f"MATCH: {name} ({roll_no}) | Dist: {round(best_distance, 3)} (Conf: {confidence}%)")
-                else:
-                     # Optional: Print near misses for debugging
-                     if best_distance < 0.65:
-                         candidate = known_names[best_match_index]
-                         print(f"IGNORED: {candidate} (Dist: {round(best_distance, 3)} > {tolerance}) - Too unsure")
+            best_distance = float(best_distance)
+            observe('match.distance', best_distance)
+
+            if best_distance < tolerance:
+                roll_no = known_roll_nos[best_match_index]
+                name = known_names[best_match_index]
+                confidence = round((1 - best_distance) * 100, 2)
+                confidence_str = f"{confidence}%"
+                color = (0, 255, 0) # Green for match
+                count('faces.matched')
+
+                if roll_no not in present_roll_nos:
+                    present_roll_nos.append(roll_no)
+                    attendance_events.append((roll_no, session_id, datetime.now().isoformat(timespec='seconds'), best_distance, 'photo'))
+                    print(f"MATCH: {name} ({roll_no}) | Dist: {round(best_distance, 3)} (Conf: {confidence}%)")
             else:
-                 pass
-                 # print(f"DEBUG: Person {i} - No known faces to compare against.")
-            
+                 count('faces.unknown')
+                 # Optional: Print near misses for debugging
+                 if best_distance < 0.65:
+                     candidate = known_names[best_match_index]
+                     print(f"IGNORED: {candidate} (Dist: {round(best_distance, 3)} > {tolerance}) - Too unsure")
+
             # Draw on image
             # Note: YOLO coords are for the whole image
             cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
             label = f"{name} {confidence_str}"
             cv2.putText(img, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
 
-        except Exception as e:
-            print(f"Error processing person {i}: {e}")
-            continue
-    
-    # Save Debug Image
-    debug_image_path = "attendance_debug.jpg"
-    cv2.imwrite(debug_image_path, img)
-    print(f"Debug image saved to: {os.path.abspath(debug_image_path)}")
+        # Save Debug Image (in the background, while the report is written)
+        debug_write = save_image_async(debug_image_path, img) if debug_image_path else None
 
-    # 5. Save Report (Text File Only)
+    # 6. Record the events and generate the report from them
     if present_roll_nos:
-        # --- TEXT REPORT GENERATION ---
+        # Filename: Attendance_YYYY-MM-DD_HH-MM-SS.txt
+        txt_filename = report_path or f"Attendance_{started_at.strftime('%Y-%m-%d_%H-%M-%S')}.txt"
+        with span('report_write'):
+            written = write_session_report(session_id, 'photo', started_at, known_roll_nos, known_names, attendance_events, txt_filename)
+        if written:
+            success, msg = True, f"Success! Report generated.\nFile: {txt_filename}"
+        else:
+            success, msg = False, "Failed to save text report."
+    else:
+        success, msg = False, "No registered students identified in the photo."
+        print(msg)
+
+    # Callers display the debug image, so it must be on disk before returning
+    if debug_write is not None:
         try:
-            # Filename: Attendance_YYYY-MM-DD_HH-MM-SS.txt
-            timestamp_str = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-            txt_filename = f"Attendance_{timestamp_str}.txt"
-            
-            # Formatted time for the table
-            time_display = datetime.now().strftime('%H:%M:%S')
-
-            with open(txt_filename, 'w') as f:
-                # Header
-                f.write(f"Attendance Report\n")
-                f.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("="*45 + "\n")
-                f.write(f"{'Roll No':<15} | {'Name':<20} | {'Status':<10}\n")
-                f.write("-" * 45 + "\n")
-                
-                # Rows - Iterate ALL registered students
-                for r_no in known_roll_nos:
-                    # Get Name
-                    if str(r_no) in db:
-                        s_name = db[str(r_no)]['name']
-                    else:
-                        try: s_name = db[int(r_no)]['name']
-                        except: s_name = "Unknown"
-                    
-                    # Check Status
-                    # We store present rolls as they appear in DB (usually string or int). 
-                    # present_roll_nos comes from known_roll_nos so types should match.
-                    if r_no in present_roll_nos:
-                         status = time_display
-                    else:
-                         status = "Absent"
-                        
-                    f.write(f"{str(r_no):<15} | {s_name:<20} | {status:<10}\n")
-                    
-                f.write("="*45 + "\n")
-                f.write(f"Total Registered: {len(known_roll_nos)}\n")
-                f.write(f"Present: {len(present_roll_nos)}\n")
-                f.write(f"Absent: {len(known_roll_nos) - len(present_roll_nos)}\n")
-                
-            print(f"Text report saved: {txt_filename}")
-            msg = f"Success! Report generated.\nFile: {txt_filename}"
-            return True, msg, debug_image_path
-            
+            debug_write.result()
+            print(f"Debug image saved to: {os.path.abspath(debug_image_path)}")
         except Exception as e:
-            msg = f"Failed to save text report: {e}"
-            print(msg)
-            return False, msg, debug_image_path
-            # -------------------------------
-            
-    else:
-        msg = "No registered students identified in the photo."
+            print(f"Warning: Could not save the debug image ({e}).")
+            debug_image_path = None
+    return success, msg, debug_image_path
+
+
+def write_session_report(session_id, kind, started_at, roll_nos, names, attendance_events, txt_filename):
+    # Appends the session (roster + events) to the event log (src/events.py), then renders
+    # the text report from it. roll_nos / names may have one entry per template row.
+    # Returns the report path, or None if it could not be written.
+    try:
+        roster = list(dict(zip(roll_nos, names)).items())
+        store = get_event_store()
+        store.record_session(session_id, kind, started_at.isoformat(timespec='seconds'), roster, attendance_events)
+        store.write_text_report(session_id, txt_filename)
+        print(f"Text report saved: {txt_filename}")
+        return txt_filename
+    except Exception as e:
+        print(f"Failed to save text report: {e}")
+        return None
+
+
+def process_photo_folder(folder, batch_size=YOLO_BATCH_SIZE, output_dir=None, job=None):
+    # Processes every photo in a folder (e.g. the snapshot backlog), running YOLO on
+    # batch_size images per call. Writes one report + annotated image per photo and
+    # a summary.csv into output_dir. Returns (success, msg, summary rows).
+    # job: a GUI job; progress is reported per photo and a cancel stops before the next one.
+    image_paths = sorted(os.path.join(folder, f) for f in os.listdir(folder)
+                         if f.lower().endswith(PHOTO_EXTENSIONS))
+    if not image_paths:
+        msg = "No photos found in folder."
         print(msg)
-        return False, msg, debug_image_path
+        return False, msg, []
+    
+    if output_dir is None:
+        output_dir = f"Attendance_Batch_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Processing {len(image_paths)} photos from {folder} (batch size {batch_size})...")
+    
+    summary = [] # (image, persons detected, success, message)
+    queue = list(image_paths)
+    while queue:
+        if job is not None:
+            job.check_cancelled()
+            job.report(len(summary), len(image_paths), "Photos processed")
+        loaded = []
+        while queue and len(loaded) < batch_size:
+            path = queue.pop(0)
+            img = load_group_photo(path)
+            if img is None:
+                summary.append((path, 0, False, "Could not load image."))
+                continue
+            loaded.append((path, img))
+            if needs_tiling(img):
+                break # full-resolution photos are not batched, only one is held in memory at a time
+        if not loaded:
+            continue
+        
+        # YOLO runs (batched) only on the photos that don't start face-first
+        modes = [initial_detection_mode() for _ in loaded]
+        yolo_indices = [i for i, mode in enumerate(modes) if mode != 'face']
+        persons_per_image = [None] * len(loaded)
+        try:
+            if yolo_indices:
+                for i, boxes in zip(yolo_indices, detect_persons_batch([loaded[i][1] for i in yolo_indices])):
+                    persons_per_image[i] = boxes
+        except Exception as e:
+            for path, _ in loaded:
+                summary.append((path, 0, False, f"YOLO Crashed: {e}"))
+            continue
+        
+        for (path, img), detected_persons in zip(loaded, persons_per_image):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            if detected_persons is not None:
+                print(f"\n[{stem}] YOLO detected {len(detected_persons)} people.")
+                if choose_detection_mode(img, detected_persons) == 'face':
+                    print(f"[{stem}] Crowded photo: switching to face-first detection.")
+                    detected_persons = None
+            else:
+                print(f"\n[{stem}] Face-first detection.")
+            success, msg, _ = recognize_group_photo(
+                img, detected_persons,
+                report_path=os.path.join(output_dir, f"Attendance_{stem}.txt"),
+                debug_image_path=os.path.join(output_dir, f"{stem}_debug.jpg"),
+                session_id=f"{os.path.basename(output_dir)}/{stem}", job=job)
+            persons = len(detected_persons) if detected_persons is not None else None
+            summary.append((path, persons, success, msg.split('\n')[0]))
+    
+    import pandas as pd # only needed here, kept out of the import-time path
+    summary_path = os.path.join(output_dir, "summary.csv")
+    pd.DataFrame(summary, columns=['Image', 'Persons Detected', 'Success', 'Message']).to_csv(summary_path, index=False)
+    
+    ok = sum(1 for row in summary if row[2])
+    msg = f"Processed {len(image_paths)} photos, {ok} with attendance marked.\nReports: {os.path.abspath(output_dir)}"
+    print(msg)
+    return ok > 0, msg, summary
+
+
+def recognize_tracks(rgb_frame, tracks, matcher, scale=1.0, pad=5):
+    # Identify new tracks and re-verify cached identities that are due (see src/tracking.py),
+    # instead of encoding every person on every frame. Track boxes are in full-frame
+    # coordinates, rgb_frame may be downscaled by `scale`. Returns the number of faces encoded.
+    now = time.perf_counter()
+    h, w, _ = rgb_frame.shape
+    pending = []
+    probe_encodings = []
+    for track in tracks:
+        if not track.needs_recognition(now):
+            continue
+        x1, y1, x2, y2 = (int(v * scale) for v in track.box)
+        crop = np.ascontiguousarray(rgb_frame[max(0, y1-pad):min(h, y2+pad), max(0, x1-pad):min(w, x2+pad)])
+        if crop.size == 0:
+            continue
+        if track.recognized:
+            # If there is no face this time (turned away), the identity is kept and checked
+            # again next interval instead of on every frame
+            track.mark_checked(now)
+        else:
+            track.attempts += 1
+        with span('face_detect_encode'):
+            encodings = get_face_recognition().face_encodings(crop)
+        if encodings:
+            pending.append(track)
+            probe_encodings.append(encodings[0])
+    count('faces.encoded', len(probe_encodings))
+
+    with span('match'):
+        best_indices, best_distances = matcher.match(probe_encodings)
+    for track, best_idx, distance in zip(pending, best_indices, best_distances):
+        observe('match.distance', float(distance))
+        if best_idx >= 0 and distance < DEFAULT_TOLERANCE:
+            count('faces.matched')
+            if track.recognized and matcher.roll_nos[best_idx] != track.roll_no:
+                print(f"[LIVE] Track {track.id} re-identified: {track.name} -> {matcher.names[best_idx]}")
+            track.set_identity(matcher.roll_nos[best_idx], matcher.names[best_idx], float(distance), now)
+        elif track.recognized:
+            print(f"[LIVE] Track {track.id} no longer matches {track.name}")
+            track.clear_identity()
+    return len(probe_encodings)
+
+
+def infer_live_frame(frame, tracker, matcher, scale=0.5):
+    # One inference tick of the live pipeline: detect persons on a downscaled frame, update the
+    # tracker and recognize the tracks that need it. Returns (tracks, faces encoded).
+    with pipeline_run('live_frame'):
+        with span('resize'):
+            small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        with span('detect_persons'):
+            boxes = [tuple(int(v / scale) for v in box) for box in detect_persons(small_frame)]
+        count('persons.detected', len(boxes))
+        with span('track'):
+            tracks = tracker.update(boxes)
+
+        encoded = 0
+        if any(t.needs_recognition() for t in tracks):
+            # Crop from the small frame (faster)
+            with span('recognize'):
+                rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+                encoded = recognize_tracks(rgb_small_frame, tracks, matcher, scale=scale)
+        return tracks, encoded
+
+
+def mark_recognized_tracks(tracks, present_roll_nos, attendance_events, session_id, source='live'):
+    # Adds an event for every recognized track whose student was not seen yet this session
+    for track in tracks:
+        if track.recognized and track.roll_no not in present_roll_nos:
+            present_roll_nos.add(track.roll_no)
+            attendance_events.append((track.roll_no, session_id, datetime.now().isoformat(timespec='seconds'), track.distance, source))
+            print(f"[LIVE] MATCH: {track.name}")
 
 
 def process_webcam(source=0):
@@ -233,194 +682,265 @@ def process_webcam(source=0):
         print(f"Error: Could not open video source {source}.")
         return
 
-    # Load DB once
+    # Load DB once (as a pre-built encoding matrix)
     try:
-        db = load_db()
+        matcher = get_matcher()
     except Exception as e:
         print(f"Failed to load DB: {e}")
         return
         
-    if not db:
+    if len(matcher) == 0:
         print("Warning: No registered students found.")
         
-    known_encodings = [data['encoding'] for data in db.values()]
-    known_roll_nos = list(db.keys())
-    known_names = [data['name'] for data in db.values()]
+    known_roll_nos = matcher.roll_nos
+    known_names = matcher.names
 
-    # To avoid spamming logs/excel, we can track attendance for this session in a set
     # To avoid spamming logs/excel, we can track attendance for this session in a set
     session_present_roll_nos = set()
+    attendance_events = []
+    session_started = datetime.now()
+    session_id = f"Live_{session_started.strftime('%Y-%m-%d_%H-%M-%S')}"
     
-    frame_count = 0
-    skip_frames = 5
+    # Persistent track ids across inference frames; each track's identity is cached
+    # and only re-verified now and then (see src/tracking.py)
+    tracker = IoUTracker()
+    encode_stats = {'ticks': 0, 'faces': 0} # faces encoded vs. inference ticks
+
+    def infer(frame):
+        # Runs on the inference thread: returns copies of the current tracks
+        # Process at 50% scale for speed (or lower if needed)
+        tracks, encoded = infer_live_frame(frame, tracker, matcher, scale=0.5)
+        encode_stats['ticks'] += 1
+        encode_stats['faces'] += encoded
+        return [copy.copy(t) for t in tracks]
+
+    # Capture and inference run on their own threads; this loop only draws and reads keys
+    pipeline = LivePipeline(cap, infer, release_capture=True).start()
+    window = 'Real-Time Attendance (Press s: Snapshot, q: Quit)'
     last_detections = [] # Stores (x1, y1, x2, y2, color, label)
-    
+    last_result_seq = 0
+    last_rendered = None # (frame seq, result seq, snapshot busy) on screen
+    snapshot_thread = None
+    next_stats = time.perf_counter() + LIVE_STATS_INTERVAL
+
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("Failed to grab frame.")
+        seq, frame = pipeline.latest()
+        if frame is None:
+            if pipeline.source_ended:
+                print("Failed to grab frame.")
+                break
+            if cv2.waitKey(10) & 0xFF == ord('q'):
+                break
+            continue
+        if pipeline.finished:
+            print("Video source ended.")
             break
-            
-        frame_count += 1
-        vis_frame = frame.copy()
-        
-        # --- UI & INPUT SECTION (Run FIRST to ensure responsiveness) ---
-        # Draw stale detections on the new frame to keep UI drawing something
-        for (x1, y1, x2, y2, color, label) in last_detections:
-            cv2.rectangle(vis_frame, (x1, y1), (x2, y2), color, 2)
-            if label:
-                cv2.putText(vis_frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-        cv2.putText(vis_frame, "Commands: 's' (Snapshot) | 'q' (Quit)", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        cv2.imshow('Real-Time Attendance (Press s: Snapshot, q: Quit)', vis_frame)
-        
-        # Check input - Increased waitKey slightly for better event capture
-        key = cv2.waitKey(1) & 0xFF
+
+        # Pick up a new inference result (if any) and update the session
+        result_seq, tracks = pipeline.result()
+        if result_seq != last_result_seq and tracks is not None:
+            last_result_seq = result_seq
+            mark_recognized_tracks(tracks, session_present_roll_nos, attendance_events, session_id)
+            new_detections = []
+            for track in tracks:
+                x1, y1, x2, y2 = track.box
+                color = (255, 0, 0)
+                label = ""
+                if track.recognized:
+                    conf = round((1 - track.distance) * 100, 1)
+                    label = f"{track.name} {conf}%"
+                    color = (0, 255, 0)
+                new_detections.append((x1, y1, x2, y2, color, label))
+            last_detections = new_detections
+
+        # Only redraw when something on screen changed; otherwise just wait for keys
+        snapshot_busy = snapshot_thread is not None and snapshot_thread.is_alive()
+        state = (seq, last_result_seq, snapshot_busy)
+        if state != last_rendered:
+            last_rendered = state
+            render_start = time.perf_counter()
+            vis_frame = frame.copy()
+
+            # Draw the latest detections (they may lag the frame by the inference time)
+            for (x1, y1, x2, y2, color, label) in last_detections:
+                cv2.rectangle(vis_frame, (x1, y1), (x2, y2), color, 2)
+                if label:
+                    cv2.putText(vis_frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+            cv2.putText(vis_frame, "Commands: 's' (Snapshot) | 'q' (Quit)", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            if snapshot_busy:
+                cv2.putText(vis_frame, "Processing snapshot...", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+            cv2.imshow(window, vis_frame)
+            pipeline.render_timer.add(time.perf_counter() - render_start)
+            wait_ms = 1
+        else:
+            wait_ms = LIVE_IDLE_WAIT_MS
+
+        key = cv2.waitKey(wait_ms) & 0xFF
         if key == ord('q'):
             print("Quitting webcam...")
             break
         elif key == ord('s'):
-            # Visual Feedback
-            cv2.putText(vis_frame, "SAVING snapshot...", (50, 150), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 255), 3)
-            cv2.imshow('Real-Time Attendance (Press s: Snapshot, q: Quit)', vis_frame)
-            cv2.waitKey(10)
-            
+            if snapshot_busy:
+                print("Still processing the previous snapshot.")
+                continue
+
             print("\n--- Capturing Snapshot ---")
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            s_name = f"snapshot_{timestamp}.jpg"
-            cv2.imwrite(s_name, frame) # Save raw full-res frame
-            
-            print(f"Processing {s_name}...")
-            # We wrap this in try-except to not crash the webcam loop if file issue
-            try:
-                process_group_photo(s_name)
-            except Exception as e:
-                print(f"Snapshot processing invalid: {e}")
-            print("--- Done ---\n")
-            continue # Skip normal inference this frame
+            s_name = snapshot_path() if SAVE_SNAPSHOTS else None
 
-        # --- INFERENCE SECTION (Heavy Work) ---
-        if frame_count % skip_frames == 0:
-            scale = 0.5 # Process at 50% scale for speed (or lower if needed)
-            small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            
-            new_detections = []
-            try:
-                results = yolo_model(small_frame, classes=[0], verbose=False)
-                
-                for r in results:
-                    for box in r.boxes:
-                        # Get coords in small frame
-                        sx1, sy1, sx2, sy2 = box.xyxy[0].cpu().numpy().astype(int)
-                        
-                        # Scale back up
-                        x1 = int(sx1 / scale)
-                        y1 = int(sy1 / scale)
-                        x2 = int(sx2 / scale)
-                        y2 = int(sy2 / scale)
-                        
-                        # Recognition logic on small frame (faster) or large frame (more accurate)?
-                        # Face recognition needs decent resolution. 
-                        # Let's crop from the SMALL frame properly.
-                        
-                        # Ensure valid crop
-                        h, w, _ = small_frame.shape
-                        pad = 5
-                        fx1, fy1 = max(0, sx1-pad), max(0, sy1-pad)
-                        fx2, fy2 = min(w, sx2+pad), min(h, sy2+pad)
-                        
-                        face_crop = np.ascontiguousarray(rgb_small_frame[fy1:fy2, fx1:fx2])
-                        
-                        color = (255, 0, 0)
-                        name = "Unknown"
-                        confidence_str = ""
-                        
-                        if face_crop.size > 0:
-                             # Face recognition
-                            encodings = face_recognition.face_encodings(face_crop)
-                            if encodings:
-                                matches = face_recognition.compare_faces(known_encodings, encodings[0], tolerance=0.55)
-                                dists = face_recognition.face_distance(known_encodings, encodings[0])
-                                if len(dists) > 0:
-                                    best_idx = np.argmin(dists)
-                                    if dists[best_idx] < 0.55:
-                                        name = known_names[best_idx]
-                                        roll = known_roll_nos[best_idx]
-                                        conf = round((1 - dists[best_idx]) * 100, 1)
-                                        confidence_str = f"{conf}%"
-                                        color = (0, 255, 0)
-                                        if roll not in session_present_roll_nos:
-                                            session_present_roll_nos.add(roll)
-                                            print(f"[LIVE] MATCH: {name}")
-
-                        label = f"{name} {confidence_str}" if name != "Unknown" else ""
-                        new_detections.append((x1, y1, x2, y2, color, label))
-                
-                last_detections = new_detections
+            # Processed off the render loop, straight from memory, so the preview keeps running.
+            # Live inference is paused meanwhile: both use the same detector and face models.
+            def run_snapshot(snapshot=frame.copy(), path=s_name):
+                # We wrap this in try-except to not crash the webcam loop
+                try:
+                    with pipeline.paused():
+                        process_group_frame(snapshot, save_image_path=path)
+                except Exception as e:
+                    print(f"Snapshot processing invalid: {e}")
+                print("--- Done ---\n")
 
-            except Exception as e:
-                # print(f"Inference error: {e}")
-                pass
+            snapshot_thread = threading.Thread(target=run_snapshot, daemon=True)
+            snapshot_thread.start()
 
-    cap.release()
+        if time.perf_counter() >= next_stats:
+            print("[LIVE] " + format_stats(pipeline.stats()) + f" | faces encoded/tick {encode_stats['faces'] / max(1, encode_stats['ticks']):.1f}")
+            next_stats = time.perf_counter() + LIVE_STATS_INTERVAL
+
+    pipeline.stop() # the capture thread releases the camera once its last read() returns
     cv2.destroyAllWindows()
+    if snapshot_thread is not None and snapshot_thread.is_alive():
+        print("Waiting for the snapshot to finish...")
+        snapshot_thread.join()
+    print("[LIVE] Pipeline stats: " + format_stats(pipeline.stats()))
     
-    # Save session attendance (backup)
+    # Save session attendance (backup, in case no snapshot was taken)
     if session_present_roll_nos:
-        # We rely on process_group_photo for the main record if they use snapshot,
-        # but if they just relied on Live View, we save this too.
-        # This might duplicate logic but it updates the same Excel file safely.
-        pass # The snapshot handles the saving. Live logs are transient unless we force save.
-        # Let's simple allow live logs to save too in case they forgot to snapshot.
-        # (Rest of existing save logic below...)
-        # Let's simple allow live logs to save too in case they forgot to snapshot.
-        # (Rest of existing save logic below...)
-        print("\nSaving session attendance (Live)...")
-
-        # --- TEXT REPORT GENERATION (Live Session) ---
-        try:
-            # Filename: Attendance_YYYY-MM-DD_HH-MM-SS.txt
-            timestamp_str = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-            txt_filename = f"Attendance_Live_{timestamp_str}.txt"
-            
-            # Formatted time for the table
-            time_display = datetime.now().strftime('%H:%M:%S')
-
-            with open(txt_filename, 'w') as f:
-                # Header
-                f.write(f"Live Session Attendance Report\n")
-                f.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("="*45 + "\n")
-                f.write(f"{'Roll No':<15} | {'Name':<20} | {'Status':<10}\n")
-                f.write("-" * 45 + "\n")
-                
-                # Rows - Iterate ALL registered students
-                for r_no in known_roll_nos:
-                    # Get Name
-                    if str(r_no) in db:
-                        s_name = db[str(r_no)]['name']
-                    else:
-                         try: s_name = db[int(r_no)]['name']
-                         except: s_name = "Unknown"
-                    
-                    # Check Status
-                    if r_no in session_present_roll_nos:
-                         status = time_display
-                    else:
-                         status = "Absent"
-                        
-                    f.write(f"{str(r_no):<15} | {s_name:<20} | {status:<10}\n")
-                    
-                f.write("="*45 + "\n")
-                f.write(f"Total Registered: {len(known_roll_nos)}\n")
-                f.write(f"Present: {len(session_present_roll_nos)}\n")
-                f.write(f"Absent: {len(known_roll_nos) - len(session_present_roll_nos)}\n")
-                
-            print(f"Live session report saved: {txt_filename}")
-            
-        except Exception as e:
-            print(f"Failed to save live text report: {e}")
-        # -------------------------------
+        save_live_session(known_roll_nos, known_names, attendance_events, session_id, session_started)
+
+
+def save_live_session(roll_nos, names, attendance_events, session_id, started_at):
+    # Records a live session's new events and writes its report (every registered student,
+    # present or absent). Can be called again for the same session with further events.
+    # Returns the report path, or None if it could not be written.
+    print("\nSaving session attendance (Live)...")
+
+    # Filename: Attendance_Live_YYYY-MM-DD_HH-MM-SS.txt
+    txt_filename = f"Attendance_Live_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.txt"
+    return write_session_report(session_id, 'live', started_at, roll_nos, names, attendance_events, txt_filename)
+
+
+# Pacing of replay_video:
+#   'realtime' - frames arrive at the video's own fps through the live pipeline, so slow
+#                inference drops frames exactly as it would on a camera
+#   'fast'     - every frame goes through inference, back to back (maximum throughput)
+REPLAY_PACES = ('realtime', 'fast')
+REPLAY_DEFAULT_FPS = 25.0 # when the container does not report one
+
+
+def replay_video(video_path, pace='realtime', output_dir='.', scale=0.5, matcher=None):
+    # Headless webcam session over a recorded video: same detection / tracking / recognition
+    # as process_webcam, no window and no keys. Writes the session report and a CSV with one
+    # row per inferred frame (plus per-stage times when instrumentation is enabled).
+    # Returns (success, msg, summary dict).
+    if pace not in REPLAY_PACES:
+        raise ValueError(f"Unknown pace: {pace} (use one of {', '.join(REPLAY_PACES)})")
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        msg = f"Error: Could not open video {video_path}."
+        print(msg)
+        return False, msg, None
+    fps = cap.get(cv2.CAP_PROP_FPS) or REPLAY_DEFAULT_FPS
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+    try:
+        if matcher is None:
+            matcher = get_matcher()
+    except Exception as e:
+        cap.release()
+        msg = f"Failed to load DB: {e}"
+        print(msg)
+        return False, msg, None
+
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    session_started = datetime.now()
+    stamp = session_started.strftime('%Y-%m-%d_%H-%M-%S')
+    session_id = f"Replay_{stem}_{stamp}"
+    present_roll_nos = set()
+    attendance_events = []
+    tracker = IoUTracker()
+    frame_rows = [] # (frame, video time s, inference ms, faces encoded, tracks, recognized, stages)
+    print(f"Replaying {video_path} ({total_frames or '?'} frames at {fps:.1f} fps, {pace} pacing)...")
+
+    def infer(frame):
+        with pipeline_run('replay_frame') as record:
+            tracks, encoded = infer_live_frame(frame, tracker, matcher, scale=scale)
+        stages = {k: round(v * 1000, 2) for k, v in record.stages.items()} if record is not None else {}
+        return [copy.copy(t) for t in tracks], encoded, stages
+
+    def on_result(seq, result, elapsed):
+        tracks, encoded, stages = result
+        mark_recognized_tracks(tracks, present_roll_nos, attendance_events, session_id, source='replay')
+        frame_rows.append((seq, round((seq - 1) / fps, 3), round(elapsed * 1000, 2), encoded, len(tracks),
+                           sum(1 for t in tracks if t.recognized), stages))
+
+    start = time.perf_counter()
+    if pace == 'realtime':
+        pipeline = LivePipeline(PacedCapture(cap, fps), infer, on_result=on_result, release_capture=True).start()
+        next_stats = time.perf_counter() + LIVE_STATS_INTERVAL
+        while not pipeline.finished:
+            time.sleep(0.05)
+            if time.perf_counter() >= next_stats:
+                print("[REPLAY] " + format_stats(pipeline.stats()))
+                next_stats = time.perf_counter() + LIVE_STATS_INTERVAL
+        pipeline.stop()
+        stats = pipeline.stats()
+        frames_read, skipped = stats['frames_captured'], stats['frames_skipped_inference']
+    else:
+        frames_read = skipped = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames_read += 1
+            infer_start = time.perf_counter()
+            try:
+                result = infer(frame)
+            except Exception as e:
+                print(f"Inference error on frame {frames_read}: {e}")
+                continue
+            on_result(frames_read, result, time.perf_counter() - infer_start)
+        cap.release()
+    wall = time.perf_counter() - start
+
+    os.makedirs(output_dir, exist_ok=True)
+    import pandas as pd # only needed here, kept out of the import-time path
+    stage_names = sorted({name for row in frame_rows for name in row[6]})
+    frames_path = os.path.join(output_dir, f"Replay_{stem}_{stamp}_frames.csv")
+    pd.DataFrame([row[:6] + tuple(row[6].get(name) for name in stage_names) for row in frame_rows],
+                 columns=['frame', 'video_time_s', 'inference_ms', 'faces_encoded', 'tracks', 'recognized']
+                 + [f"{name}_ms" for name in stage_names]).to_csv(frames_path, index=False)
+
+    latencies = sorted(row[2] for row in frame_rows)
+    summary = {
+        'video': video_path, 'pace': pace, 'fps': fps,
+        'frames_read': frames_read, 'frames_inferred': len(frame_rows), 'frames_skipped': skipped,
+        'wall_s': round(wall, 3),
+        'inferred_fps': round(len(frame_rows) / wall, 2) if wall else None,
+        'realtime_factor': round(frames_read / fps / wall, 3) if wall else None, # video seconds per wall second
+        'inference_ms_mean': round(sum(latencies) / len(latencies), 2) if latencies else None,
+        'inference_ms_p95': latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+        'faces_encoded': sum(row[3] for row in frame_rows),
+        'students_present': len(present_roll_nos),
+        'frames_csv': frames_path,
+        'report': None,
+    }
+    if present_roll_nos:
+        txt_filename = os.path.join(output_dir, f"Attendance_Replay_{stem}_{stamp}.txt")
+        summary['report'] = write_session_report(session_id, 'live', session_started, matcher.roll_nos, matcher.names,
+                                                 attendance_events, txt_filename)
 
+    msg = (f"Replayed {frames_read} frames in {wall:.1f}s: {len(frame_rows)} inferred, {skipped} skipped, "
+           f"{summary['inferred_fps']} fps, {len(present_roll_nos)} students present.\nFrame timings: {frames_path}")
+    print(msg)
+    return True, msg, summary
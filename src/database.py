@@ -1,10 +1,38 @@
 import pickle
 import os
-import pandas as pd
+import threading
+import numpy as np
+from src.encoding_store import EncodingStore
+from src.sqlite_store import SQLiteStore
 
 DB_PATH = 'data/db.pkl'
+STORE_DIR = 'data/store'
+SQLITE_PATH = 'data/attendance.db'
 
-def load_db():
+# Storage backend for registered students:
+#   'mmap'   - append-only memory-mapped encoding store (default, see encoding_store.py)
+#   'sqlite' - SQLite registry in WAL mode, safe for GUI + CLI at once (see sqlite_store.py)
+#   'pickle' - legacy single-file pickle (data/db.pkl)
+DB_BACKEND = os.environ.get('ATTENDANCE_DB_BACKEND', 'mmap')
+
+_store = None
+
+def _get_store():
+    global _store
+    if _store is None:
+        if DB_BACKEND == 'sqlite':
+            _store = SQLiteStore(SQLITE_PATH)
+        else:
+            _store = EncodingStore(STORE_DIR)
+        # One-time import of the legacy pickle database
+        if not _store.exists() and os.path.exists(DB_PATH):
+            legacy = _load_pickle()
+            if legacy:
+                _store.rewrite(legacy)
+                print(f"Migrated {len(legacy)} students from {DB_PATH} to {DB_BACKEND} store.")
+    return _store
+
+def _load_pickle():
     if not os.path.exists(DB_PATH):
         return {}
     try:
@@ -14,7 +42,7 @@ def load_db():
         print(f"Error loading database: {e}")
         return {}
 
-def save_db(data):
+def _save_pickle(data):
     # Ensure directory exists
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     try:
@@ -24,72 +52,233 @@ def save_db(data):
     except Exception as e:
         print(f"Error saving database: {e}")
 
-def delete_student_by_roll(roll_no):
-    db = load_db()
-    # Ensure strict string comparison if keys are strings (which they should be)
-    if str(roll_no) in db:
-        name = db[str(roll_no)]['name']
-        del db[str(roll_no)]
-        save_db(db)
+def load_db():
+    # {roll_no: {'name': ..., 'encoding': ..., 'encodings': K x 128 templates}} for every registered student
+    if DB_BACKEND == 'pickle':
+        return _load_pickle()
+    try:
+        return group_gallery(*_get_store().load_gallery())
+    except Exception as e:
+        print(f"Error loading database: {e}")
+        return {}
+
+def save_db(data):
+    # Full rewrite. Prefer add_student / remove_students for single changes.
+    if DB_BACKEND == 'pickle':
+        return _save_pickle(data)
+    try:
+        _get_store().rewrite(data)
+        print("Database saved successfully.")
+    except Exception as e:
+        print(f"Error saving database: {e}")
+
+def load_gallery():
+    # (roll_nos, names, N x 128 float32 matrix) without building per-student dicts.
+    # One row per template: a student enrolled with several photos appears on several rows.
+    if DB_BACKEND == 'pickle':
+        return expand_db(_load_pickle())
+    return _get_store().load_gallery()
+
+def _db_entry(name, encoding):
+    # Legacy dict entry: 'encoding' stays a single vector (centroid) for older readers
+    templates = np.asarray(encoding, dtype=np.float32).reshape(-1, 128)
+    return {'name': name, 'encoding': templates.mean(axis=0), 'encodings': templates}
+
+def add_student(roll_no, name, encoding):
+    # Registers (or overwrites) one student. encoding is a single 128-d vector or a
+    # (K x 128) array of templates. Returns True if the roll number already existed.
+    if DB_BACKEND == 'pickle':
+        db = _load_pickle()
+        existed = roll_no in db
+        db[roll_no] = _db_entry(name, encoding)
+        _save_pickle(db)
+        return existed
+
+    store = _get_store()
+    existed = store.has(roll_no)
+    store.add(roll_no, name, encoding)
+    if existed:
+        # The overwritten row is now dead weight
+        store.maybe_compact()
+    print("Database saved successfully.")
+    return existed
+
+def add_students(students):
+    # Bulk registration: students is a list of (roll_no, name, encoding or templates), written in one go
+    students = list(students)
+    if DB_BACKEND == 'pickle':
+        db = _load_pickle()
+        for roll_no, name, encoding in students:
+            db[roll_no] = _db_entry(name, encoding)
+        _save_pickle(db)
+        return
+    _get_store().add_many(students)
+    print(f"Database saved successfully ({len(students)} students).")
+
+def remove_students(roll_nos):
+    # Bulk delete (exact key match). Returns {roll_no: name} of the students removed.
+    if DB_BACKEND == 'pickle':
+        db = _load_pickle()
+        removed = {r: db.pop(r)['name'] for r in roll_nos if r in db}
+        if removed:
+            _save_pickle(db)
+        return removed
+    return _get_store().delete_many(list(roll_nos))
+
+def db_version():
+    # Cheap fingerprint of the database, used by caches (e.g. the matcher)
+    # to know when they have to be rebuilt.
+    if DB_BACKEND != 'pickle':
+        return _get_store().version()
+    try:
+        st = os.stat(DB_PATH)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def student_templates(data):
+    # All template encodings of one DB entry as a (K x 128) float32 array
+    encodings = data.get('encodings')
+    if encodings is None:
+        encodings = data['encoding']
+    return np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+
+def expand_db(db):
+    # Legacy dict -> (roll_nos, names, matrix) with one row per template
+    roll_nos, names, blocks = [], [], []
+    for roll_no, data in db.items():
+        templates = student_templates(data)
+        roll_nos.extend([roll_no] * len(templates))
+        names.extend([data['name']] * len(templates))
+        blocks.append(templates)
+    if not blocks:
+        return roll_nos, names, np.empty((0, 128), dtype=np.float32)
+    return roll_nos, names, np.ascontiguousarray(np.concatenate(blocks))
+
+def group_gallery(roll_nos, names, matrix):
+    # (roll_nos, names, matrix) rows -> legacy dict, templates grouped per student
+    rows = {}
+    for i, (roll_no, name) in enumerate(zip(roll_nos, names)):
+        rows.setdefault(roll_no, (name, []))[1].append(i)
+    return {roll_no: _db_entry(name, np.array(matrix[idx])) for roll_no, (name, idx) in rows.items()}
+
+def _refresh_ann_index():
+    # Imported lazily: the ANN index module itself depends on this one
+    try:
+        from src.ann_index import refresh_index
+        refresh_index()
+    except Exception as e:
+        print(f"Warning: ANN index update failed ({e}). Matching will use exact search.")
+
+EXCEL_PATH = 'attendance.xlsx'
+# Roll numbers still to be removed from EXCEL_PATH, one per line (append-only)
+PENDING_EXCEL_DELETES_PATH = 'data/pending_excel_deletes.txt'
+
+_excel_lock = threading.Lock()
+
+
+def _normalize_roll(roll_no):
+    # Excel turns numeric roll numbers into floats ("12.0")
+    return str(roll_no).split('.')[0]
+
+
+def _queue_excel_deletes(roll_nos):
+    # Under the Excel lock: compact_excel rewrites this file, an append in between would be lost
+    os.makedirs(os.path.dirname(PENDING_EXCEL_DELETES_PATH), exist_ok=True)
+    with _excel_lock, open(PENDING_EXCEL_DELETES_PATH, 'a', encoding='utf-8') as f:
+        f.writelines(_normalize_roll(r) + '\n' for r in roll_nos)
+
+
+def pending_excel_deletes():
+    try:
+        with open(PENDING_EXCEL_DELETES_PATH, 'r', encoding='utf-8') as f:
+            return {line.strip() for line in f if line.strip()}
+    except OSError:
+        return set()
+
+
+def compact_excel(excel_path=EXCEL_PATH):
+    # Applies every queued delete to the Excel sheet in one read + write.
+    # Returns the number of rows removed, or None if the sheet could not be updated.
+    with _excel_lock:
+        pending = pending_excel_deletes()
+        if not pending:
+            return 0
+        if not os.path.exists(excel_path):
+            os.remove(PENDING_EXCEL_DELETES_PATH)
+            return 0
+        try:
+            import pandas as pd # imported lazily, only Excel compaction needs it
+            df = pd.read_excel(excel_path)
+            rolls = df['Roll No'].apply(lambda x: _normalize_roll(x) if pd.notnull(x) else "")
+            keep = ~rolls.isin(pending)
+            removed = int((~keep).sum())
+            if removed:
+                tmp_path = excel_path + '.tmp.xlsx'
+                df[keep].to_excel(tmp_path, index=False)
+                os.replace(tmp_path, excel_path)
+        except PermissionError:
+            print(f"Warning: {excel_path} is open, deletions will be applied next time.")
+            return None
+        except Exception as e:
+            print(f"Warning: Excel update failed ({e}).")
+            return None
+
+        # Only drop the lines that were applied; deletes queued meanwhile stay pending
+        still_pending = pending_excel_deletes() - pending
+        with open(PENDING_EXCEL_DELETES_PATH, 'w', encoding='utf-8') as f:
+            f.writelines(r + '\n' for r in sorted(still_pending))
+        if removed:
+            print(f"Removed {removed} deleted students from {excel_path}.")
+        return removed
+
+
+def compact_excel_async(excel_path=EXCEL_PATH):
+    # Not a daemon thread: the interpreter waits for a running Excel write before exiting
+    thread = threading.Thread(target=compact_excel, args=(excel_path,), name='excel-compaction')
+    thread.start()
+    return thread
+
+
+def delete_students_by_roll(roll_nos, compact_in_background=True):
+    # Deletes several students in one call: store tombstones, one ANN index refresh, and the
+    # Excel sheet is only touched once (in the background). Roll numbers may be given as
+    # str or int, they are matched against both key types.
+    # Returns (success, msg, {roll_no: name} of the students removed).
+    wanted = [str(r).strip() for r in roll_nos if str(r).strip()]
+    removed = remove_students(wanted)
+
+    # Older databases may have stored numeric roll numbers as int keys
+    int_keys = [int(r) for r in wanted if r not in removed and r.lstrip('-').isdigit()]
+    if int_keys:
+        removed.update(remove_students(int_keys))
+
+    not_found = [r for r in wanted if r not in removed and not (r.lstrip('-').isdigit() and int(r) in removed)]
+    if removed:
+        _refresh_ann_index()
+        _queue_excel_deletes(removed)
+        if os.path.exists(EXCEL_PATH):
+            if compact_in_background:
+                compact_excel_async()
+            else:
+                compact_excel()
+
+    if not removed:
+        if len(wanted) == 1:
+            msg = f"Error: Roll number {wanted[0]} not found in database."
+        else:
+            msg = f"Error: None of the roll numbers were found in database ({', '.join(not_found)})."
+    elif len(removed) == 1:
+        roll_no, name = next(iter(removed.items()))
         msg = f"Successfully deleted student: {name} (Roll No: {roll_no})"
-        
-        # Also remove from Excel Report if exists
-        excel_path = 'attendance.xlsx'
-        if os.path.exists(excel_path):
-            try:
-                df = pd.read_excel(excel_path)
-                
-                # Robust conversion of Roll No to string, removing .0 if present (common in Pandas read_excel)
-                df['Roll No'] = df['Roll No'].apply(lambda x: str(x).split('.')[0] if pd.notnull(x) else "")
-                
-                target_roll = str(roll_no).split('.')[0]
-                
-                # Check if roll exists
-                if target_roll in df['Roll No'].values:
-                    # Filter out
-                    df = df[df['Roll No'] != target_roll]
-                    try:
-                        df.to_excel(excel_path, index=False)
-                        msg += "\nRemoved from attendance.xlsx."
-                    except PermissionError:
-                        msg += "\nERROR: Excel file is OPEN. Close it to update!"
-            except Exception as e:
-                msg += f"\nWarning: Excel update failed ({e})."
-                
-        print(msg)
-        return True, msg
     else:
-        # Check if maybe it's stored as int?
-        try:
-            if int(roll_no) in db:
-                 del db[int(roll_no)]
-                 save_db(db)
-                 
-                 # Also remove from Excel (Int Logic)
-                 excel_path = 'attendance.xlsx'
-                 removed_excel = False
-                 if os.path.exists(excel_path):
-                     try:
-                         df = pd.read_excel(excel_path)
-                         # Robust normalize
-                         df['Roll No'] = df['Roll No'].apply(lambda x: str(x).split('.')[0] if pd.notnull(x) else "")
-                         target_roll = str(roll_no).split('.')[0]
-                         
-                         before = len(df)
-                         df = df[df['Roll No'] != target_roll]
-                         if len(df) < before:
-                             df.to_excel(excel_path, index=False)
-                             removed_excel = True
-                     except: 
-                        pass
-                 
-                 msg = f"Successfully deleted student (Roll No: {roll_no}) [Int Key]"
-                 if removed_excel: msg += "\nRemoved from attendance.xlsx."
-                 print(msg)
-                 return True, msg
-        except:
-            pass
-            
-        msg = f"Error: Roll number {roll_no} not found in database."
-        print(msg)
-        return False, msg
+        msg = f"Successfully deleted {len(removed)} students."
+    if removed and not_found:
+        msg += f"\nNot found: {', '.join(not_found)}"
+    print(msg)
+    return bool(removed), msg, removed
+
+
+def delete_student_by_roll(roll_no):
+    success, msg, _ = delete_students_by_roll([roll_no])
+    return success, msg
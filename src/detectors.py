@@ -0,0 +1,277 @@
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+from src.models import get_yolo_model, YOLO_WEIGHTS
+
+# Person detector backends. All of them return, per image, a list of
+# (x1, y1, x2, y2) int boxes in that image's own pixel coordinates
+# (detect_batch_scored also returns the confidence of every box).
+#
+#   'torch'     - ultralytics / PyTorch YOLO (default)
+#   'onnx'      - the same YOLO exported to ONNX, run with onnxruntime on CPU
+#   'onnx-int8' - dynamically int8-quantized ONNX model (smaller, faster on old CPUs)
+DETECTOR_BACKEND = os.environ.get('ATTENDANCE_DETECTOR', 'torch')
+
+# Person detector input size (images are letterboxed to input_size x input_size)
+YOLO_INPUT_SIZE = 640
+
+ONNX_MODEL_PATH = 'yolov8n.onnx'
+ONNX_INT8_MODEL_PATH = 'yolov8n.int8.onnx'
+# e.g. ['OpenVINOExecutionProvider', 'CPUExecutionProvider'] with onnxruntime-openvino installed
+ONNX_PROVIDERS = ['CPUExecutionProvider']
+
+# Same post-processing thresholds as ultralytics' predict() defaults
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.7
+PERSON_CLASS = 0
+
+
+def letterbox(img, size=YOLO_INPUT_SIZE, color=(114, 114, 114)):
+    # Fit img into a size x size canvas keeping its aspect ratio (same padding colour as YOLO).
+    # Returns (canvas, scale, (pad_x, pad_y)) so boxes can be mapped back.
+    h, w = img.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR) if (new_w, new_h) != (w, h) else img
+    
+    pad_x = (size - new_w) // 2
+    pad_y = (size - new_h) // 2
+    canvas = np.full((size, size, 3), color, dtype=img.dtype)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+    return canvas, scale, (pad_x, pad_y)
+
+
+def unletterbox_boxes(xyxy, img_shape, scale, pad):
+    # Map (N x 4) letterboxed boxes back to original image coordinates
+    h, w = img_shape[:2]
+    pad_x, pad_y = pad
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4).copy()
+    xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad_x) / scale).clip(0, w)
+    xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad_y) / scale).clip(0, h)
+    return [tuple(box) for box in xyxy.astype(int)]
+
+
+class PersonDetector(ABC):
+    # Detectors are shared (get_detector) between the live inference thread, the
+    # snapshot / job threads and tiled detection. Neither the ultralytics model
+    # nor its predictor is thread-safe, so every call is serialized per instance.
+    name = 'base'
+
+    def __init__(self, input_size=YOLO_INPUT_SIZE):
+        self.input_size = input_size
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _detect_batch(self, images):
+        # (boxes, confidences) for each image of the list (called with the lock held)
+        ...
+
+    def detect_batch_scored(self, images):
+        with self._lock:
+            return self._detect_batch(images)
+
+    def detect_batch(self, images):
+        return [boxes for boxes, _ in self.detect_batch_scored(images)]
+
+    def detect(self, img):
+        return self.detect_batch([img])[0]
+
+
+class TorchYoloDetector(PersonDetector):
+    name = 'torch'
+
+    def _detect_batch(self, images):
+        # Letterboxed to the same size so the whole list runs as one batch
+        if not images:
+            return []
+        boxed = [letterbox(img, self.input_size) for img in images]
+        results = get_yolo_model()([canvas for canvas, _, _ in boxed], classes=[PERSON_CLASS],
+                                   imgsz=self.input_size, verbose=False)
+        return [(unletterbox_boxes(r.boxes.xyxy.cpu().numpy(), img.shape, scale, pad), r.boxes.conf.cpu().numpy().tolist())
+                for img, (_, scale, pad), r in zip(images, boxed, results)]
+
+
+class OnnxYoloDetector(PersonDetector):
+    name = 'onnx'
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, input_size=YOLO_INPUT_SIZE, providers=None):
+        super().__init__(input_size)
+        import onnxruntime as ort
+        available = ort.get_available_providers()
+        providers = [p for p in (providers or ONNX_PROVIDERS) if p in available] or ['CPUExecutionProvider']
+        self.session = ort.InferenceSession(model_path, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        # A model exported without dynamic axes only accepts batch size 1
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        self.max_batch = batch_dim if isinstance(batch_dim, int) and batch_dim > 0 else None
+
+    def _preprocess(self, canvases):
+        # BGR uint8 HWC -> RGB float32 NCHW in [0, 1]
+        batch = np.stack(canvases)[..., ::-1].transpose(0, 3, 1, 2)
+        return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+    def _postprocess(self, pred):
+        # pred: (4 + classes, anchors) raw YOLOv8 head output for one image
+        pred = pred.T
+        scores = pred[:, 4 + PERSON_CLASS]
+        keep = scores > CONF_THRESHOLD
+        if not keep.any():
+            return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32)
+        cx, cy, bw, bh = pred[keep, 0], pred[keep, 1], pred[keep, 2], pred[keep, 3]
+        scores = scores[keep]
+        xywh = np.stack([cx - bw / 2, cy - bh / 2, bw, bh], axis=1)
+        idx = cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), CONF_THRESHOLD, IOU_THRESHOLD)
+        idx = np.asarray(idx, dtype=np.int64).reshape(-1)
+        # Highest confidence first, like ultralytics
+        idx = idx[np.argsort(-scores[idx], kind='stable')]
+        xywh = xywh[idx]
+        xyxy = np.stack([xywh[:, 0], xywh[:, 1], xywh[:, 0] + xywh[:, 2], xywh[:, 1] + xywh[:, 3]], axis=1)
+        return xyxy, scores[idx]
+
+    def _detect_batch(self, images):
+        if not images:
+            return []
+        boxed = [letterbox(img, self.input_size) for img in images]
+        step = self.max_batch or len(boxed)
+        outputs = []
+        for start in range(0, len(boxed), step):
+            chunk = [canvas for canvas, _, _ in boxed[start:start + step]]
+            outputs.extend(self.session.run(None, {self.input_name: self._preprocess(chunk)})[0])
+        results = []
+        for img, (_, scale, pad), pred in zip(images, boxed, outputs):
+            xyxy, scores = self._postprocess(pred)
+            results.append((unletterbox_boxes(xyxy, img.shape, scale, pad), scores.tolist()))
+        return results
+
+
+def export_onnx(output_path=ONNX_MODEL_PATH, int8_output_path=None, input_size=YOLO_INPUT_SIZE):
+    # Exports the torch YOLO weights to ONNX (dynamic batch) and optionally an
+    # int8 dynamically-quantized copy. Needs ultralytics + onnx installed.
+    print(f"Exporting {YOLO_WEIGHTS} to ONNX...")
+    exported = get_yolo_model().export(format='onnx', imgsz=input_size, dynamic=True)
+    if os.path.abspath(exported) != os.path.abspath(output_path):
+        shutil.move(exported, output_path)
+    print(f"ONNX model saved: {output_path}")
+
+    if int8_output_path:
+        quantize_onnx(output_path, int8_output_path)
+    return output_path
+
+
+def quantize_onnx(model_path=ONNX_MODEL_PATH, output_path=ONNX_INT8_MODEL_PATH):
+    # Dynamic int8 quantization of the weights (no calibration images needed)
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QUInt8)
+    print(f"Int8 ONNX model saved: {output_path}")
+    return output_path
+
+
+# --- Tiled detection for very large photos ---
+# Letterboxing a 24 MP auditorium shot to 640 px shrinks back-row students to a
+# few pixels. Instead the photo is cut into overlapping tiles that are detected
+# a few at a time (memory grows with the tile size, not the photo size), plus
+# one pass over the whole photo for people larger than a tile. Boxes seen by
+# several tiles / passes are merged afterwards with confidence-ordered NMS. The
+# overlap must exceed the height of the people a tile should see whole.
+TILE_SIZE = 1280
+TILE_OVERLAP = 320
+TILE_BATCH_SIZE = 4 # tiles letterboxed and detected per call
+MERGE_IOU = 0.5 # boxes overlapping more than this are one person
+MERGE_CONTAINMENT = 0.7 # ... as are seam boxes mostly inside another box (people cut at a tile seam)
+SEAM_MARGIN = 2 # px: a box this close to an inner tile edge was cut by the seam
+TILE_SETTINGS = f"tiles:{TILE_SIZE}:{TILE_OVERLAP}:{MERGE_IOU}:{MERGE_CONTAINMENT}:nms"
+
+
+def merge_boxes(boxes, scores=None, at_seam=None, iou_threshold=MERGE_IOU, containment=MERGE_CONTAINMENT):
+    # Greedy NMS over the boxes of all tiles / passes. Boxes cut by a tile seam (at_seam)
+    # come last, the rest by confidence; a box is dropped when it overlaps a kept one by
+    # more than iou_threshold, or, for seam boxes only, lies mostly inside a kept one.
+    scores = [1.0] * len(boxes) if scores is None else scores
+    at_seam = [False] * len(boxes) if at_seam is None else at_seam
+    order = sorted(range(len(boxes)), key=lambda i: (at_seam[i], -scores[i]))
+    kept = []
+    for i in order:
+        x1, y1, x2, y2 = boxes[i]
+        area = max(1, (x2 - x1) * (y2 - y1))
+        duplicate = False
+        for k1, l1, k2, l2 in kept:
+            iw = min(x2, k2) - max(x1, k1)
+            ih = min(y2, l2) - max(y1, l1)
+            if iw <= 0 or ih <= 0:
+                continue
+            inter = iw * ih
+            union = area + (k2 - k1) * (l2 - l1) - inter
+            if inter / union > iou_threshold or (at_seam[i] and inter / area > containment):
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(tuple(boxes[i]))
+    return kept
+
+
+def touches_seam(box, tile_box, height, width, margin=SEAM_MARGIN):
+    # Whether a box (tile coordinates) reaches an edge of the tile that lies inside the image
+    x1, y1, x2, y2 = box
+    y0, x0, ty1, tx1 = tile_box
+    return ((x0 > 0 and x1 <= margin) or (y0 > 0 and y1 <= margin) or
+            (tx1 < width and x2 >= tx1 - x0 - margin) or (ty1 < height and y2 >= ty1 - y0 - margin))
+
+
+def detect_tiled(img, detector=None, tile=TILE_SIZE, overlap=TILE_OVERLAP, batch_size=TILE_BATCH_SIZE):
+    # Person boxes of one large image, detected on overlapping tiles (views, never a full copy)
+    from src.face_worker import tile_grid # light module, shares the tiling with face-first mode
+    detector = detector or get_detector()
+    h, w = img.shape[:2]
+    # Whole photo, letterboxed: people larger than a tile
+    boxes, scores = (list(v) for v in detector.detect_batch_scored([img])[0])
+    at_seam = [False] * len(boxes)
+    grid = tile_grid(h, w, tile, overlap)
+    for start in range(0, len(grid), batch_size):
+        chunk = grid[start:start + batch_size]
+        results = detector.detect_batch_scored([img[y0:y1, x0:x1] for (y0, x0, y1, x1) in chunk])
+        for tile_box, (tile_boxes, tile_scores) in zip(chunk, results):
+            y0, x0 = tile_box[:2]
+            for (bx1, by1, bx2, by2), score in zip(tile_boxes, tile_scores):
+                boxes.append((bx1 + x0, by1 + y0, bx2 + x0, by2 + y0))
+                scores.append(score)
+                at_seam.append(touches_seam((bx1, by1, bx2, by2), tile_box, h, w))
+    return merge_boxes([tuple(int(v) for v in box) for box in boxes], scores, at_seam)
+
+
+_detectors = {}
+_detectors_lock = threading.Lock()
+
+
+def detector_loaded(backend=None):
+    # Whether get_detector(backend) has been built already
+    return (backend or DETECTOR_BACKEND) in _detectors
+
+
+def get_detector(backend=None):
+    # Shared detector instance for a backend (DETECTOR_BACKEND by default).
+    # ONNX models are exported on first use if they do not exist yet.
+    backend = backend or DETECTOR_BACKEND
+    with _detectors_lock:
+        return _build_detector(backend)
+
+
+def _build_detector(backend):
+    if backend not in _detectors:
+        if backend == 'torch':
+            _detectors[backend] = TorchYoloDetector()
+        elif backend == 'onnx':
+            if not os.path.exists(ONNX_MODEL_PATH):
+                export_onnx(ONNX_MODEL_PATH)
+            _detectors[backend] = OnnxYoloDetector(ONNX_MODEL_PATH)
+        elif backend == 'onnx-int8':
+            if not os.path.exists(ONNX_INT8_MODEL_PATH):
+                if not os.path.exists(ONNX_MODEL_PATH):
+                    export_onnx(ONNX_MODEL_PATH)
+                quantize_onnx(ONNX_MODEL_PATH, ONNX_INT8_MODEL_PATH)
+            _detectors[backend] = OnnxYoloDetector(ONNX_INT8_MODEL_PATH)
+        else:
+            raise ValueError(f"Unknown detector backend: {backend}")
+    return _detectors[backend]
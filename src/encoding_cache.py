@@ -0,0 +1,208 @@
+import os
+import time
+import pickle
+import sqlite3
+import hashlib
+import numpy as np
+from src.instrumentation import count
+
+# Content-addressed cache of detection / encoding results (SQLite, WAL mode).
+#
+# Keys are built from the image content (hash of the file or of the decoded
+# frame), the crop box and the settings that influence the result, so a
+# reprocessed snapshot or a re-registered photo skips dlib (and YOLO) entirely
+# while any change to the image or the settings is a miss. Only detection and
+# encoding are cached, never matches: gallery changes always take effect.
+#
+# Entries are evicted least recently used first once the cache outgrows
+# ENCODING_CACHE_MAX_MB (0 disables the cache).
+
+ENCODING_CACHE_PATH = 'data/encoding_cache.db'
+ENCODING_CACHE_MAX_MB = float(os.environ.get('ATTENDANCE_ENCODING_CACHE_MB', 256))
+
+# Bump when the cached values change meaning (e.g. a different face model)
+CACHE_VERSION = 1
+
+# Eviction trims the cache to this share of the cap, so it doesn't run on every insert
+EVICT_TO = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key       TEXT PRIMARY KEY,
+    value     BLOB NOT NULL,
+    size      INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used);
+"""
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def frame_digest(img):
+    # Hash of a decoded image (shape + pixels)
+    img = np.ascontiguousarray(img)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.shape}{img.dtype}".encode())
+    h.update(memoryview(img).cast('B'))
+    return h.hexdigest()
+
+
+def make_key(*parts):
+    # One cache key from the content digest, box, settings, ...
+    text = "|".join(str(p) for p in (CACHE_VERSION,) + parts)
+    return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+
+class EncodingCache:
+    def __init__(self, path=ENCODING_CACHE_PATH, max_mb=ENCODING_CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 2**20)
+        self._schema_ready = False
+
+    def connect(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._schema_ready:
+            conn.executescript(SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    def get_many(self, keys):
+        # {key: value} of the keys that are cached; marks them as recently used
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        found = {}
+        conn = self.connect()
+        try:
+            for i in range(0, len(keys), 500): # SQLite's host parameter limit
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(f"SELECT key, value FROM entries WHERE key IN ({marks})", chunk).fetchall()
+                for key, blob in rows:
+                    try:
+                        found[key] = pickle.loads(blob)
+                    except Exception:
+                        continue # unreadable entry, recomputed and overwritten by the caller
+                if rows:
+                    conn.execute(f"UPDATE entries SET last_used = ? WHERE key IN ({marks})", [time.time()] + chunk)
+        finally:
+            conn.close()
+        return found
+
+    def put_many(self, items):
+        # items: iterable of (key, value)
+        rows = []
+        now = time.time()
+        for key, value in items:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            rows.append((key, blob, len(blob), now))
+        if not rows:
+            return
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)", rows)
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * EVICT_TO)
+        # Entry by entry: a whole put_many shares one last_used, a timestamp cutoff
+        # would drop the batch that was just inserted along with the old entries
+        freed = 0
+        victims = []
+        for rowid, size in conn.execute("SELECT rowid, size FROM entries ORDER BY last_used, rowid"):
+            victims.append((rowid,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM entries WHERE rowid = ?", victims)
+
+    def stats(self):
+        conn = self.connect()
+        try:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        finally:
+            conn.close()
+        return {'entries': entries, 'mb': round(size / 2**20, 2), 'max_mb': round(self.max_bytes / 2**20, 2)}
+
+    def clear(self):
+        conn = self.connect()
+        try:
+            conn.execute("DELETE FROM entries")
+        finally:
+            conn.close()
+
+
+_encoding_cache = None
+_cache_disabled = ENCODING_CACHE_MAX_MB <= 0
+
+
+def get_encoding_cache():
+    # The shared cache, or None when disabled (ATTENDANCE_ENCODING_CACHE_MB=0)
+    global _encoding_cache
+    if _encoding_cache is None and not _cache_disabled:
+        _encoding_cache = EncodingCache()
+    return _encoding_cache
+
+
+def set_encoding_cache(cache):
+    # Replaces the shared cache (None disables caching, e.g. for cold-cache benchmarks)
+    global _encoding_cache, _cache_disabled
+    _encoding_cache = cache
+    _cache_disabled = cache is None
+    return cache
+
+
+def cache_lookup(keys):
+    # {key: value} of the cached keys; {} when the cache is disabled or unreadable
+    keys = [k for k in keys if k]
+    cache = get_encoding_cache()
+    if cache is None or not keys:
+        return {}
+    try:
+        found = cache.get_many(keys)
+    except Exception as e:
+        print(f"Warning: Encoding cache unavailable ({e}).")
+        return {}
+    count('cache.hits', len(found))
+    count('cache.misses', len(set(keys)) - len(found))
+    return found
+
+
+def cache_store(items):
+    # Stores (key, value) pairs; failures only cost the next lookup a miss
+    items = [(k, v) for k, v in items if k]
+    cache = get_encoding_cache()
+    if cache is None or not items:
+        return
+    try:
+        cache.put_many(items)
+    except Exception as e:
+        print(f"Warning: Could not update the encoding cache ({e}).")
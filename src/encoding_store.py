@@ -0,0 +1,216 @@
+import os
+import json
+import threading
+import numpy as np
+
+# Append-only, memory-mapped storage for face encodings.
+#
+#   <root>/encodings.f32  - raw float32 rows (128 values each), only ever appended to
+#   <root>/index.jsonl    - operation log: {"op": "add", "rows": [r, ..], "roll": .., "name": ..}
+#                           or {"op": "del", "roll": ..}
+#
+# A student enrolled with several photos owns several rows (one per template).
+#
+# Registering a student appends one row + one log line, deleting appends a
+# tombstone. Loading replays the log and maps the encodings with a single
+# np.memmap call. The replayed log is kept in memory: while the file only
+# grows, just the appended lines are parsed (also those written by other
+# processes). Dead rows (deleted / overwritten students) are dropped by
+# compact(), which runs automatically once they pile up.
+
+ENCODING_DIM = 128
+ROW_BYTES = ENCODING_DIM * 4
+
+# Compact when at least this fraction of rows is dead (and at least COMPACT_MIN_DEAD rows)
+COMPACT_RATIO = 0.25
+COMPACT_MIN_DEAD = 64
+
+
+class EncodingStore:
+    def __init__(self, root):
+        self.root = root
+        self.encodings_path = os.path.join(root, 'encodings.f32')
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self._index_lock = threading.Lock()
+        self._index_state = None # (file id, size, mtime, bytes parsed, live, total_rows)
+
+    def exists(self):
+        return os.path.exists(self.index_path)
+
+    def version(self):
+        try:
+            st_i = os.stat(self.index_path)
+            st_e = os.stat(self.encodings_path)
+            return (st_i.st_mtime_ns, st_i.st_size, st_e.st_size)
+        except OSError:
+            return None
+
+    # --- Reading ---
+
+    def _replay(self):
+        # Returns ({roll: (rows, name)} in registration order, total rows in the log).
+        # The result is shared with later calls: callers must not modify it.
+        try:
+            st = os.stat(self.index_path)
+        except OSError:
+            with self._index_lock:
+                self._index_state = None
+            return {}, 0
+        file_id = (st.st_dev, st.st_ino)
+
+        with self._index_lock:
+            state = self._index_state
+            if state is not None and state[:3] == (file_id, st.st_size, st.st_mtime_ns):
+                return state[4], state[5]
+            if state is not None and state[0] == file_id and st.st_size >= state[3]:
+                # Same file, appended to: parse only the new lines (on a copy, the old dict may be in use)
+                offset, live, total_rows = state[3], dict(state[4]), state[5]
+            else:
+                # First load, or the log was rewritten (compact / rewrite)
+                offset, live, total_rows = 0, {}, 0
+
+            with open(self.index_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            # Only complete lines are consumed; a line still being written is read next time
+            end = data.rfind(b'\n') + 1
+            total_rows = self._apply_log(data[:end], live, total_rows)
+            self._index_state = (file_id, st.st_size, st.st_mtime_ns, offset + end, live, total_rows)
+            return live, total_rows
+
+    @staticmethod
+    def _apply_log(data, live, total_rows):
+        # Applies log lines (bytes) to live in place, returns the new total row count
+        for line in data.decode('utf-8').splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A torn line from an interrupted write, ignore it
+                continue
+            if entry['op'] == 'add':
+                rows = entry['rows'] if 'rows' in entry else [entry['row']]
+                # Overwrite keeps the original position of the student
+                live[entry['roll']] = (rows, entry['name'])
+                total_rows = max([total_rows] + [r + 1 for r in rows])
+            elif entry['op'] == 'del':
+                live.pop(entry['roll'], None)
+        return total_rows
+
+    def _map_rows(self, n_rows):
+        if n_rows == 0:
+            return np.empty((0, ENCODING_DIM), dtype=np.float32)
+        return np.memmap(self.encodings_path, dtype=np.float32, mode='r', shape=(n_rows, ENCODING_DIM))
+
+    def load_gallery(self):
+        # (roll_nos, names, N x 128 float32 matrix), one entry per template row.
+        # Zero-copy when there are no dead rows.
+        live, total_rows = self._replay()
+        roll_nos, names, row_list = [], [], []
+        for roll_no, (rows, name) in live.items():
+            roll_nos.extend([roll_no] * len(rows))
+            names.extend([name] * len(rows))
+            row_list.extend(rows)
+        rows = np.asarray(row_list, dtype=np.int64)
+
+        mapped = self._map_rows(total_rows)
+        if len(rows) == total_rows and np.array_equal(rows, np.arange(total_rows)):
+            return roll_nos, names, mapped
+        return roll_nos, names, np.ascontiguousarray(mapped[rows])
+
+    def has(self, roll_no):
+        return roll_no in self._replay()[0]
+
+    # --- Writing ---
+
+    def add_many(self, students):
+        # students: iterable of (roll_no, name, encoding or K x 128 templates).
+        # One append for the whole batch.
+        students = [(roll_no, name, np.asarray(enc, dtype=np.float32).reshape(-1, ENCODING_DIM))
+                    for roll_no, name, enc in students]
+        if not students:
+            return
+        os.makedirs(self.root, exist_ok=True)
+
+        matrix = np.ascontiguousarray(np.concatenate([templates for _, _, templates in students]))
+        # Drop a partially written row left behind by an interrupted append
+        if os.path.exists(self.encodings_path):
+            size = os.path.getsize(self.encodings_path)
+            if size % ROW_BYTES:
+                with open(self.encodings_path, 'r+b') as f:
+                    f.truncate(size - size % ROW_BYTES)
+
+        with open(self.encodings_path, 'ab') as f:
+            first_row = f.tell() // ROW_BYTES
+            f.write(matrix.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        # The log is written after the rows, so a crash never references missing data
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            row = first_row
+            for roll_no, name, templates in students:
+                rows = list(range(row, row + len(templates)))
+                row += len(templates)
+                f.write(json.dumps({'op': 'add', 'rows': rows, 'roll': roll_no, 'name': name}) + '\n')
+
+    def add(self, roll_no, name, encoding):
+        self.add_many([(roll_no, name, encoding)])
+
+    def delete_many(self, roll_nos):
+        # Tombstones the given students. Returns {roll: name} of those that existed.
+        live, total_rows = self._replay()
+        removed = {r: live[r][1] for r in roll_nos if r in live}
+        if removed:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                for roll_no in removed:
+                    f.write(json.dumps({'op': 'del', 'roll': roll_no}) + '\n')
+            live_rows = sum(len(rows) for r, (rows, _) in live.items() if r not in removed)
+            self.maybe_compact(total_rows, live_rows)
+        return removed
+
+    def delete(self, roll_no):
+        return self.delete_many([roll_no]).get(roll_no)
+
+    def rewrite(self, db):
+        # Replace the whole store with the contents of a legacy-style dict
+        os.makedirs(self.root, exist_ok=True)
+        students = [(roll, data['name'], data.get('encodings', data['encoding'])) for roll, data in db.items()]
+        self._write_fresh(students)
+
+    def _write_fresh(self, students):
+        tmp_enc = self.encodings_path + '.tmp'
+        tmp_idx = self.index_path + '.tmp'
+        row = 0
+        with open(tmp_enc, 'wb') as f_enc, open(tmp_idx, 'w', encoding='utf-8') as f_idx:
+            for roll_no, name, enc in students:
+                templates = np.asarray(enc, dtype=np.float32).reshape(-1, ENCODING_DIM)
+                f_enc.write(np.ascontiguousarray(templates).tobytes())
+                rows = list(range(row, row + len(templates)))
+                row += len(templates)
+                f_idx.write(json.dumps({'op': 'add', 'rows': rows, 'roll': roll_no, 'name': name}) + '\n')
+        os.replace(tmp_enc, self.encodings_path)
+        os.replace(tmp_idx, self.index_path)
+
+    def maybe_compact(self, total_rows=None, live_rows=None):
+        if total_rows is None or live_rows is None:
+            live, total_rows = self._replay()
+            live_rows = sum(len(rows) for rows, _ in live.values())
+        dead = total_rows - live_rows
+        if dead >= COMPACT_MIN_DEAD and dead >= COMPACT_RATIO * total_rows:
+            self.compact()
+
+    def compact(self):
+        # Rewrite only the live rows and a fresh log (drops tombstones and overwritten rows)
+        live, total_rows = self._replay()
+        mapped = self._map_rows(total_rows)
+        students = [(roll, name, np.array(mapped[rows])) for roll, (rows, name) in live.items()]
+        del mapped
+        try:
+            self._write_fresh(students)
+            print(f"Encoding store compacted ({len(students)} students).")
+        except OSError as e:
+            # e.g. on Windows while another process still maps the old file
+            print(f"Warning: Store compaction skipped ({e}).")
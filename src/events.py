@@ -0,0 +1,281 @@
+import os
+import sqlite3
+
+# Append-only attendance event log (SQLite, WAL mode), used by every storage backend.
+#
+#   sessions        - one row per photo / live session
+#   session_roster  - the students registered when the session ran (for the absent list)
+#   events          - one row per recognition: (roll_no, session, timestamp, distance, source)
+#
+# Rows are only ever inserted. The Attendance_*.txt tables and the Excel sheet
+# are generated from here on demand instead of being the record themselves.
+
+EVENTS_PATH = 'data/events.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session    TEXT PRIMARY KEY,
+    kind       TEXT NOT NULL,
+    started_at TEXT NOT NULL
+);
+
+-- roll_no has no declared type so int and str roll numbers round-trip unchanged
+CREATE TABLE IF NOT EXISTS session_roster (
+    session TEXT NOT NULL,
+    roll_no NOT NULL,
+    name    TEXT NOT NULL,
+    PRIMARY KEY (session, roll_no)
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    roll_no   NOT NULL,
+    session   TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    distance  REAL,
+    source    TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_session ON events(session);
+CREATE INDEX IF NOT EXISTS idx_events_roll ON events(roll_no);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp);
+"""
+
+REPORT_TITLES = {
+    'photo': "Attendance Report",
+    'live': "Live Session Attendance Report",
+}
+
+
+class EventStore:
+    def __init__(self, path=EVENTS_PATH):
+        self.path = path
+        self._schema_ready = False
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def connect(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._schema_ready:
+            conn.executescript(SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    def _write(self, work):
+        # Runs work(conn) in one IMMEDIATE transaction
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return result
+        finally:
+            conn.close()
+
+    def _read(self, sql, params=()):
+        conn = self.connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    # --- Writing ---
+
+    def record_session(self, session, kind, started_at, roster, events):
+        # Registers a session (once) with its roster and appends its events, in one transaction.
+        # roster: iterable of (roll_no, name); events: iterable of (roll_no, session, timestamp, distance, source)
+        roster = list(roster)
+        events = list(events)
+
+        def work(conn):
+            new = conn.execute("INSERT OR IGNORE INTO sessions (session, kind, started_at) VALUES (?, ?, ?)",
+                               (session, kind, started_at)).rowcount
+            if new:
+                conn.executemany("INSERT OR IGNORE INTO session_roster (session, roll_no, name) VALUES (?, ?, ?)",
+                                 [(session, roll_no, name) for roll_no, name in roster])
+            conn.executemany(
+                "INSERT INTO events (roll_no, session, timestamp, distance, source) VALUES (?, ?, ?, ?, ?)",
+                events)
+
+        self._write(work)
+
+    def append(self, events):
+        # Appends events of sessions that are already registered (or have no roster)
+        events = list(events)
+        if events:
+            self._write(lambda conn: conn.executemany(
+                "INSERT INTO events (roll_no, session, timestamp, distance, source) VALUES (?, ?, ?, ?, ?)",
+                events))
+
+    # --- Reading ---
+
+    def sessions(self, since=None, until=None):
+        # [(session, kind, started_at)] in chronological order, optionally within [since, until)
+        sql = "SELECT session, kind, started_at FROM sessions"
+        clauses, params = [], []
+        if since:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("started_at < ?")
+            params.append(until)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return self._read(sql + " ORDER BY started_at, session", params)
+
+    def first_seen(self, session):
+        # {roll_no: (timestamp, distance)} of the first recognition of every student in a session
+        rows = self._read(
+            "SELECT roll_no, MIN(timestamp), distance FROM events WHERE session = ? GROUP BY roll_no", (session,))
+        return {roll_no: (timestamp, distance) for roll_no, timestamp, distance in rows}
+
+    def roster(self, session):
+        return self._read("SELECT roll_no, name FROM session_roster WHERE session = ? ORDER BY rowid", (session,))
+
+    def events(self, since=None, until=None):
+        # [(roll_no, session, timestamp, distance, source)] in time order
+        sql = "SELECT roll_no, session, timestamp, distance, source FROM events"
+        clauses, params = [], []
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return self._read(sql + " ORDER BY timestamp, id", params)
+
+    # --- Reports (generated on demand) ---
+
+    def session_table(self, session):
+        # [(roll_no, name, time first seen 'HH:MM:SS' or 'Absent')] for the session's roster.
+        # Students recognized but missing from the roster are appended at the end.
+        seen = self.first_seen(session)
+        table = []
+        for roll_no, name in self.roster(session):
+            timestamp = seen.pop(roll_no, (None,))[0]
+            table.append((roll_no, name, timestamp[11:19] if timestamp else "Absent"))
+        for roll_no, (timestamp, _) in seen.items():
+            table.append((roll_no, "", timestamp[11:19]))
+        return table
+
+    def write_text_report(self, session, path):
+        # The classic Attendance_*.txt table for one session
+        row = self._read("SELECT kind, started_at FROM sessions WHERE session = ?", (session,))
+        kind, started_at = row[0] if row else ('photo', session)
+        table = self.session_table(session)
+        present = sum(1 for _, _, status in table if status != "Absent")
+
+        with open(path, 'w') as f:
+            # Header
+            f.write(f"{REPORT_TITLES.get(kind, REPORT_TITLES['photo'])}\n")
+            f.write(f"Date: {started_at.replace('T', ' ')}\n")
+            f.write("="*45 + "\n")
+            f.write(f"{'Roll No':<15} | {'Name':<20} | {'Status':<10}\n")
+            f.write("-" * 45 + "\n")
+
+            # Rows - ALL registered students
+            for r_no, s_name, status in table:
+                f.write(f"{str(r_no):<15} | {s_name:<20} | {status:<10}\n")
+
+            f.write("="*45 + "\n")
+            f.write(f"Total Registered: {len(table)}\n")
+            f.write(f"Present: {present}\n")
+            f.write(f"Absent: {len(table) - present}\n")
+        return path
+
+    def export_excel(self, path='attendance.xlsx', since=None, until=None, roll_nos=None):
+        # One row per student, one column per session (first-seen time or 'Absent').
+        # roll_nos: only export these students (e.g. the ones still registered)
+        import pandas as pd # imported lazily, only exports need it
+        keep = None if roll_nos is None else {str(r) for r in roll_nos}
+        sessions = self.sessions(since, until)
+        names = {}
+        columns = {}
+        for session, _, _ in sessions:
+            column = {}
+            for roll_no, name, status in self.session_table(session):
+                key = str(roll_no)
+                if keep is not None and key not in keep:
+                    continue
+                if name:
+                    names[key] = name
+                names.setdefault(key, "")
+                column[key] = status
+            columns[session] = column
+
+        df = pd.DataFrame({'Roll No': list(names), 'Name': list(names.values())})
+        for session, column in columns.items():
+            df[session] = [column.get(roll, "") for roll in names]
+        df.to_excel(path, index=False)
+        return path
+
+
+_event_store = None
+
+
+def get_event_store():
+    global _event_store
+    if _event_store is None:
+        store = EventStore(EVENTS_PATH)
+        if not store.exists():
+            # Carry over the events older SQLite registries kept in their own table
+            from src.database import SQLITE_PATH
+            try:
+                import_sqlite_events(SQLITE_PATH, store)
+            except Exception as e:
+                print(f"Warning: Could not import old attendance events ({e}).")
+        _event_store = store
+    return _event_store
+
+
+def set_event_store(store):
+    # Redirects attendance events to another store (e.g. a scratch log for benchmarks)
+    global _event_store
+    _event_store = store
+    return store
+
+
+def import_sqlite_events(sqlite_path, store=None):
+    # One-shot copy of the attendance_events table older SQLite registries kept
+    store = store or get_event_store()
+    if not os.path.exists(sqlite_path):
+        return 0
+    conn = sqlite3.connect(sqlite_path, timeout=30)
+    try:
+        try:
+            rows = conn.execute("SELECT roll_no, session, timestamp, distance, source FROM attendance_events ORDER BY id").fetchall()
+        except sqlite3.OperationalError:
+            return 0
+    finally:
+        conn.close()
+
+    def work(c):
+        if c.execute("SELECT 1 FROM meta WHERE key = 'imported_sqlite_events'").fetchone():
+            return 0
+        for session in sorted({r[1] for r in rows}):
+            first = min(r[2] for r in rows if r[1] == session)
+            kind = 'live' if any(r[4] == 'live' for r in rows if r[1] == session) else 'photo'
+            c.execute("INSERT OR IGNORE INTO sessions (session, kind, started_at) VALUES (?, ?, ?)", (session, kind, first))
+        c.executemany("INSERT INTO events (roll_no, session, timestamp, distance, source) VALUES (?, ?, ?, ?, ?)", rows)
+        c.execute("INSERT INTO meta (key, value) VALUES ('imported_sqlite_events', ?)", (sqlite_path,))
+        return len(rows)
+
+    imported = store._write(work)
+    if imported:
+        print(f"Imported {imported} attendance events from {sqlite_path}.")
+    return imported
@@ -0,0 +1,181 @@
+import cv2
+import numpy as np
+from src.models import get_face_recognition
+
+# Per-person face detection + encoding. Kept in its own light module (no YOLO /
+# ultralytics import) so worker processes of the face pool start quickly.
+
+# Adaptive upsampling: dlib's HOG detector finds faces down to ~80 px. Every
+# upsample doubles the crop (4x the work), so large, well resolved crops start
+# at 0 and only small crops (or crops where nothing was found) go higher.
+MAX_UPSAMPLE = 2
+LARGE_CROP_PX = 320  # shorter crop side >= this: start without upsampling
+MEDIUM_CROP_PX = 160  # shorter crop side >= this: start at upsample 1
+
+# Everything besides the pixels that changes a crop's result (part of the encoding cache keys)
+CROP_SETTINGS = f"crop:up{MAX_UPSAMPLE}:{LARGE_CROP_PX}:{MEDIUM_CROP_PX}"
+
+
+def initial_upsample(person_crop):
+    return upsample_for_size(person_crop.shape[0], person_crop.shape[1])
+
+
+def upsample_for_size(height, width):
+    short_side = min(height, width)
+    if short_side >= LARGE_CROP_PX:
+        return 0
+    if short_side >= MEDIUM_CROP_PX:
+        return 1
+    return MAX_UPSAMPLE
+
+
+def detect_and_encode(person_crop):
+    # Returns (encoding or None, path) for the face in a person crop.
+    # path records which upsample levels were tried, e.g. "up0", "up0>up1", "up1>up2:none".
+    
+    # Detect face specifically in this crop, starting cheap and escalating
+    # only while nothing is found (back views / occlusions end up as ':none')
+    face_recognition = get_face_recognition()
+    tried = []
+    face_locs = []
+    for upsample in range(initial_upsample(person_crop), MAX_UPSAMPLE + 1):
+        tried.append(f"up{upsample}")
+        face_locs = face_recognition.face_locations(person_crop, number_of_times_to_upsample=upsample)
+        if face_locs:
+            break
+
+    path = ">".join(tried)
+    if not face_locs:
+        # No second detector pass: face_encodings() without locations would just
+        # re-run the same HOG detector at upsample=1, which was already covered.
+        return None, path + ":none"
+
+    # Passing face_locs makes face_encodings skip detection
+    face_encodings = face_recognition.face_encodings(person_crop, face_locs[:1])
+    if not face_encodings:
+        return None, path + ":noenc"
+    return face_encodings[0], path
+
+
+def detect_and_encode_safe(person_crop):
+    # Pool entry point: never raises, returns (encoding or None, error message or None, path)
+    try:
+        encoding, path = detect_and_encode(person_crop)
+        return encoding, None, path
+    except Exception as e:
+        return None, str(e), "error"
+
+
+# --- Face-first mode ---
+# One tiled, multi-scale HOG pass over the whole frame instead of YOLO + a
+# detector run inside every person crop. Tiles keep the upsampled image small
+# and let the pool work on several tiles at once; the overlap must be larger
+# than the biggest face expected in the tiled pass so every face is whole in
+# at least one tile. Faces larger than that are caught by the coarse pass.
+FACE_FIRST_TILE = 800
+FACE_FIRST_OVERLAP = 160
+FACE_FIRST_UPSAMPLE = 1
+FACE_FIRST_COARSE_SIZE = 800 # longest side of the coarse (large faces) pass
+
+
+def tile_starts(length, tile, overlap):
+    if length <= tile:
+        return [0]
+    step = tile - overlap
+    starts = list(range(0, length - tile, step))
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(height, width, tile, overlap):
+    # (y0, x0, y1, x1) of overlapping tiles covering the whole image
+    return [(y0, x0, min(y0 + tile, height), min(x0 + tile, width))
+            for y0 in tile_starts(height, tile, overlap)
+            for x0 in tile_starts(width, tile, overlap)]
+
+
+def detect_faces_job(job):
+    # Pool entry point: job = (rgb tile, upsample). Returns face_locations tuples.
+    tile, upsample = job
+    try:
+        return get_face_recognition().face_locations(tile, number_of_times_to_upsample=upsample)
+    except Exception as e:
+        print(f"Face detection failed on a tile: {e}")
+        return []
+
+
+FACE_CHIP_MARGIN = 0.5 # context kept around a face box for landmark detection
+
+FACE_FIRST_SETTINGS = (f"face-first:{FACE_FIRST_TILE}:{FACE_FIRST_OVERLAP}:up{FACE_FIRST_UPSAMPLE}:"
+                       f"{FACE_FIRST_COARSE_SIZE}:{FACE_CHIP_MARGIN}")
+
+
+def face_chip(rgb_img, location):
+    # Crop around one face box; returns (chip, location relative to the chip)
+    top, right, bottom, left = location
+    h, w = rgb_img.shape[:2]
+    my = int((bottom - top) * FACE_CHIP_MARGIN)
+    mx = int((right - left) * FACE_CHIP_MARGIN)
+    y0, x0 = max(0, top - my), max(0, left - mx)
+    y1, x1 = min(h, bottom + my), min(w, right + mx)
+    chip = np.ascontiguousarray(rgb_img[y0:y1, x0:x1])
+    return chip, (top - y0, right - x0, bottom - y0, left - x0)
+
+
+def encode_face_job(job):
+    # Pool entry point: job = (chip, location in chip). Returns (encoding or None, error or None, path)
+    chip, location = job
+    try:
+        encodings = get_face_recognition().face_encodings(chip, [location])
+        return (encodings[0] if encodings else None), None, "face-first"
+    except Exception as e:
+        return None, str(e), "error"
+
+
+def merge_face_locations(locations, overlap_threshold=0.5):
+    # De-duplicates faces seen by several tiles / passes: a box is dropped when it
+    # mostly lies inside a bigger box already kept (partial faces at tile seams).
+    # locations are (top, right, bottom, left) in full image coordinates.
+    kept = []
+    for loc in sorted(locations, key=lambda l: (l[2] - l[0]) * (l[1] - l[3]), reverse=True):
+        top, right, bottom, left = loc
+        area = max(1, (bottom - top) * (right - left))
+        duplicate = False
+        for k_top, k_right, k_bottom, k_left in kept:
+            ih = min(bottom, k_bottom) - max(top, k_top)
+            iw = min(right, k_right) - max(left, k_left)
+            if ih > 0 and iw > 0 and ih * iw / area > overlap_threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(loc)
+    return kept
+
+
+def detect_faces_tiled(rgb_img, map_fn=map):
+    # Multi-scale face detection over the whole frame.
+    # map_fn lets the caller spread the tile jobs over a process pool.
+    h, w = rgb_img.shape[:2]
+    jobs = []
+    offsets = [] # (dy, dx, scale) to map tile results back to full image coordinates
+
+    # Coarse pass: whole frame, downscaled, no upsampling -> large faces
+    coarse_scale = min(1.0, FACE_FIRST_COARSE_SIZE / max(h, w))
+    if coarse_scale < 1.0:
+        coarse = cv2.resize(rgb_img, (int(w * coarse_scale), int(h * coarse_scale)))
+    else:
+        coarse = rgb_img
+    jobs.append((coarse, 0))
+    offsets.append((0, 0, coarse_scale))
+
+    # Fine pass: full resolution tiles with upsampling -> small, far-away faces
+    for (y0, x0, y1, x1) in tile_grid(h, w, FACE_FIRST_TILE, FACE_FIRST_OVERLAP):
+        jobs.append((rgb_img[y0:y1, x0:x1].copy(), FACE_FIRST_UPSAMPLE))
+        offsets.append((y0, x0, 1.0))
+
+    locations = []
+    for (dy, dx, scale), locs in zip(offsets, map_fn(detect_faces_job, jobs)):
+        for top, right, bottom, left in locs:
+            locations.append((int(top / scale) + dy, int(right / scale) + dx,
+                              int(bottom / scale) + dy, int(left / scale) + dx))
+    return merge_face_locations(locations)
@@ -3,10 +3,17 @@ from tkinter import ttk, messagebox, filedialog
 from PIL import Image, ImageTk
 import os
 import sys
+import importlib.util
 
 # Add the project root to sys.path to ensure imports work
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.models import start_warm_up, models_loaded
+from src.jobs import JobRunner, JobCancelled
+
+# Load the models on a background thread right after the window opens
+WARM_UP_MODELS = True
+
 class OfflineAttendanceApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -51,9 +58,33 @@ class OfflineAttendanceApp(tk.Tk):
         self.current_frame = None
         
         self.create_sidebar()
+        self.create_job_bar()
         self.init_frames()
         self.show_frame("HomeFrame")
 
+        # Registration / photo processing run in the background (see src/jobs.py)
+        self.jobs = JobRunner(self)
+        self.jobs.listeners.append(self.update_job_bar)
+        self.protocol("WM_DELETE_WINDOW", self.request_exit)
+        
+        # Preload YOLO / dlib in the background while the user navigates
+        if WARM_UP_MODELS:
+            self.after(200, self.start_model_warm_up)
+
+    def start_model_warm_up(self):
+        self.frames["HomeFrame"].set_status("System Status: Loading models...", self.colors["warning"])
+        self.warm_up_thread = start_warm_up()
+        self.poll_model_warm_up()
+
+    def poll_model_warm_up(self):
+        # Tk widgets may only be touched from the main thread, so poll instead of calling back
+        if self.warm_up_thread.is_alive():
+            self.after(250, self.poll_model_warm_up)
+        elif models_loaded():
+            self.frames["HomeFrame"].set_status("System Status: Ready", self.colors["success"])
+        else:
+            self.frames["HomeFrame"].set_status("System Status: Ready (models load on first use)", self.colors["warning"])
+
     def setup_style(self):
         style = ttk.Style()
         style.theme_use("clam")
@@ -108,9 +139,55 @@ class OfflineAttendanceApp(tk.Tk):
                              bg=self.colors["sidebar"], fg=self.colors["danger"],
                              font=("Segoe UI", 12, "bold"), borderwidth=0, activebackground=self.colors["frame_bg"], activeforeground=self.colors["danger"],
                              width=20, pady=10, cursor="hand2", anchor="w", padx=20,
-                             command=self.quit)
+                             command=self.request_exit)
         exit_btn.pack(side="bottom", fill="x", pady=20)
 
+    def create_job_bar(self):
+        # Progress of background jobs, shown under the content area
+        bar = tk.Frame(self, bg=self.colors["sidebar"], padx=10, pady=6)
+        bar.grid(row=1, column=0, columnspan=2, sticky="ew")
+        bar.grid_columnconfigure(1, weight=1)
+
+        self.job_label = tk.Label(bar, text="Idle", bg=self.colors["sidebar"], fg=self.colors["text"], font=("Segoe UI", 10), anchor="w", width=45)
+        self.job_label.grid(row=0, column=0, sticky="w")
+
+        self.job_progress = ttk.Progressbar(bar, mode="determinate")
+        self.job_progress.grid(row=0, column=1, sticky="ew", padx=10)
+
+        self.job_cancel_btn = ttk.Button(bar, text="Cancel", width=8, state="disabled", command=self.cancel_jobs)
+        self.job_cancel_btn.grid(row=0, column=2)
+
+    def update_job_bar(self, runner):
+        if runner.busy:
+            current = runner.current.name if runner.current else "Starting..."
+            queued = f" (+{runner.pending} queued)" if runner.pending else ""
+            self.job_label.config(text=f"Working: {current}{queued}", fg=self.colors["warning"])
+            self.job_progress.config(maximum=runner.batch_total, value=runner.batch_done)
+            self.job_cancel_btn.config(state="normal")
+        else:
+            self.job_label.config(text="Idle", fg=self.colors["text"])
+            self.job_progress.config(maximum=1, value=0)
+            self.job_cancel_btn.config(state="disabled")
+            if getattr(self, "exit_when_idle", False):
+                self.quit()
+
+    def cancel_jobs(self):
+        # Queued jobs are dropped, the running one finishes its current write first
+        self.jobs.cancel_all()
+        self.job_label.config(text="Cancelling...", fg=self.colors["danger"])
+
+    def request_exit(self):
+        # Quitting mid-job could leave a half-written database / Excel sheet
+        if self.jobs.busy:
+            if not messagebox.askyesno("Jobs Running", "Attendance is still being processed.\n"
+                                       "Cancel queued jobs and exit once the current one has finished?"):
+                return
+            self.jobs.cancel_all()
+            self.exit_when_idle = True
+            self.job_label.config(text="Exiting after the current job...", fg=self.colors["danger"])
+            return
+        self.quit()
+
     def init_frames(self):
         # We will import these classes or define them in this file. 
         # For now, defining them internally to keep it single-file or easy to split later.
@@ -145,8 +222,11 @@ class HomeFrame(tk.Frame):
         stats_frame = tk.Frame(self, bg=controller.colors["frame_bg"], padx=20, pady=20)
         stats_frame.pack(pady=40, fill="x", padx=40)
         
-        stat_lbl = tk.Label(stats_frame, text="System Status: Ready", bg=controller.colors["frame_bg"], fg=controller.colors["success"], font=("Segoe UI", 14))
-        stat_lbl.pack()
+        self.stat_lbl = tk.Label(stats_frame, text="System Status: Ready", bg=controller.colors["frame_bg"], fg=controller.colors["success"], font=("Segoe UI", 14))
+        self.stat_lbl.pack()
+
+    def set_status(self, text, color):
+        self.stat_lbl.config(text=text, fg=color)
 
 
 from src.registration import register_student
@@ -180,6 +260,7 @@ class RegisterFrame(tk.Frame):
         photo_box.grid(row=5, column=0, sticky="w")
         
         self.photo_path_var = tk.StringVar()
+        self.photo_paths = []
         self.photo_entry = ttk.Entry(photo_box, textvariable=self.photo_path_var, width=22, font=("Segoe UI", 10), state="readonly")
         self.photo_entry.pack(side="left", ipady=5)
         
@@ -195,39 +276,47 @@ class RegisterFrame(tk.Frame):
         self.status_label.pack()
 
     def browse_photo(self):
-        filename = filedialog.askopenfilename(title="Select Student Photo", 
-                                              filetypes=[("Image Files", "*.jpg *.jpeg *.png")])
-        if filename:
-            self.photo_path_var.set(filename)
+        # Several photos of the same student can be selected (stored as multiple templates)
+        filenames = filedialog.askopenfilenames(title="Select Student Photo(s)", 
+                                                filetypes=[("Image Files", "*.jpg *.jpeg *.png")])
+        if filenames:
+            self.photo_paths = list(filenames)
+            self.photo_path_var.set("; ".join(self.photo_paths))
 
     def register_action(self):
         name = self.name_entry.get().strip()
         roll = self.roll_entry.get().strip()
-        path = self.photo_path_var.get().strip()
+        paths = self.photo_paths
         
-        if not name or not roll or not path:
+        if not name or not roll or not paths:
             messagebox.showwarning("Incomplete Data", "Please fill in all fields and select a photo.")
             return
             
         # Update UI state
         self.status_label.config(text="Processing...", fg=self.controller.colors["warning"])
-        self.update_idletasks()
-        
-        success, msg = register_student(name, roll, path)
-        
+        self.controller.jobs.submit(f"Registering {name}", lambda job: register_student(name, roll, list(paths)),
+                                    on_done=self.on_registered)
+
+    def on_registered(self, job, result, error):
+        if isinstance(error, JobCancelled):
+            self.status_label.config(text="Registration cancelled", fg=self.controller.colors["warning"])
+            return
+        success, msg = result if error is None else (False, f"Registration crashed: {error}")
+
         if success:
             messagebox.showinfo("Success", msg)
             self.status_label.config(text="Registration Successful!", fg=self.controller.colors["success"])
             # Clear fields
             self.name_entry.delete(0, tk.END)
             self.roll_entry.delete(0, tk.END)
+            self.photo_paths = []
             self.photo_path_var.set("")
         else:
             messagebox.showerror("Registration Failed", msg)
             self.status_label.config(text="Registration Failed", fg=self.controller.colors["danger"])
 
 
-from src.attendance import process_group_photo, process_webcam
+from src.attendance import process_group_photo
 
 class AttendancePhotoFrame(tk.Frame):
     def __init__(self, parent, controller):
@@ -241,9 +330,10 @@ class AttendancePhotoFrame(tk.Frame):
         ctrl_frame = tk.Frame(self, bg=controller.colors["bg_dark"])
         ctrl_frame.pack(pady=10)
         
-        ttk.Label(ctrl_frame, text="Select Group Photo", style="SubHeader.TLabel", font=("Segoe UI", 12)).grid(row=0, column=0, sticky="w", pady=5)
+        ttk.Label(ctrl_frame, text="Select Group Photo(s)", style="SubHeader.TLabel", font=("Segoe UI", 12)).grid(row=0, column=0, sticky="w", pady=5)
         
         self.photo_path_var = tk.StringVar()
+        self.photo_paths = []
         self.photo_entry = ttk.Entry(ctrl_frame, textvariable=self.photo_path_var, width=40, font=("Segoe UI", 10), state="readonly")
         self.photo_entry.grid(row=1, column=0, ipady=5)
         
@@ -262,29 +352,43 @@ class AttendancePhotoFrame(tk.Frame):
         self.status_label.pack()
 
     def browse_photo(self):
-        filename = filedialog.askopenfilename(title="Select Group Photo", 
-                                              filetypes=[("Image Files", "*.jpg *.jpeg *.png")])
-        if filename:
-            self.photo_path_var.set(filename)
+        # Several photos can be selected, they are queued and processed one after another
+        filenames = filedialog.askopenfilenames(title="Select Group Photo(s)", 
+                                                filetypes=[("Image Files", "*.jpg *.jpeg *.png")])
+        if filenames:
+            self.photo_paths = list(filenames)
+            self.photo_path_var.set("; ".join(self.photo_paths))
 
     def process_photo(self):
-        path = self.photo_path_var.get()
-        if not path:
+        paths = self.photo_paths
+        if not paths:
              messagebox.showwarning("No File", "Please select a photo first.")
              return
-             
-        self.status_label.config(text="Processing... Please Wait", fg=self.controller.colors["warning"])
-        self.update_idletasks()
-        
-        # Process
-        success, msg, output_path = process_group_photo(path)
-        
+
+        for path in paths:
+            self.controller.jobs.submit(os.path.basename(path), lambda job, p=path: process_group_photo(p, job=job),
+                                        on_done=self.on_photo_processed, on_progress=self.on_photo_progress)
+        self.status_label.config(text=f"Queued {len(paths)} photo(s)...", fg=self.controller.colors["warning"])
+        self.photo_paths = []
+        self.photo_path_var.set("")
+
+    def on_photo_progress(self, job, done, total, text):
+        self.status_label.config(text=f"{job.name}: {text} ({done}/{total})...", fg=self.controller.colors["warning"])
+
+    def on_photo_processed(self, job, result, error):
+        if isinstance(error, JobCancelled):
+            self.status_label.config(text=f"Cancelled: {job.name}", fg=self.controller.colors["warning"])
+            return
+        success, msg, output_path = result if error is None else (False, f"Processing crashed: {error}", None)
+
         if success:
-            self.status_label.config(text=msg.split('\n')[0], fg=self.controller.colors["success"])
-            messagebox.showinfo("Attendance Marked", msg)
+            self.status_label.config(text=f"{job.name}: " + msg.split('\n')[0], fg=self.controller.colors["success"])
+            # Only pop up for the last photo of a queue, the reports hold the rest
+            if not self.controller.jobs.pending:
+                messagebox.showinfo("Attendance Marked", msg)
         else:
-            self.status_label.config(text=msg, fg=self.controller.colors["danger"])
-            messagebox.showerror("Error", msg)
+            self.status_label.config(text=f"{job.name}: {msg}", fg=self.controller.colors["danger"])
+            messagebox.showerror("Error", f"{job.name}\n{msg}")
             
         # Display Image
         if output_path and os.path.exists(output_path):
@@ -314,9 +418,21 @@ class AttendancePhotoFrame(tk.Frame):
 
 
 import cv2
-import numpy as np
+import copy
+import time
 from datetime import datetime
-from src.database import load_db, delete_student_by_roll
+from src.database import delete_students_by_roll
+from src.matcher import get_matcher
+from src.attendance import (infer_live_frame, save_live_session, process_group_frame,
+                            snapshot_path, SAVE_SNAPSHOTS)
+from src.live_pipeline import LivePipeline, format_stats
+from src.tracking import IoUTracker
+
+# Live overlay: inference runs off the Tk thread at most this many times per second,
+# boxes are carried between inference frames by the tracker (src/tracking.py)
+LIVE_INFERENCE_FPS = 4
+LIVE_INFERENCE_SCALE = 0.5 # inference runs on a downscaled frame
+PREVIEW_HEIGHT = 500
 
 class AttendanceWebcamFrame(tk.Frame):
     def __init__(self, parent, controller):
@@ -324,6 +440,7 @@ class AttendanceWebcamFrame(tk.Frame):
         self.controller = controller
         self.cap = None
         self.is_running = False
+        self.pipeline = None
         
         # UI Layout
         top_frame = tk.Frame(self, bg=controller.colors["bg_dark"])
@@ -342,41 +459,52 @@ class AttendanceWebcamFrame(tk.Frame):
         
         self.btn_snap = ttk.Button(btn_frame, text="Snapshot", command=self.take_snapshot, state="disabled")
         self.btn_snap.pack(side="left", padx=5)
+
+        self.btn_save = ttk.Button(btn_frame, text="Save Attendance", command=self.save_session, state="disabled")
+        self.btn_save.pack(side="left", padx=5)
+
+        # Status
+        self.status_label = tk.Label(self, text="Ready", bg=controller.colors["bg_dark"], font=("Segoe UI", 10))
+        self.status_label.pack(side="bottom", pady=5)
+
+        # Present list (right) next to the video feed
+        present_frame = tk.Frame(self, bg=controller.colors["frame_bg"], padx=10, pady=10)
+        present_frame.pack(side="right", fill="y", padx=(0, 20), pady=10)
+
+        self.present_title = tk.Label(present_frame, text="Present (0)", bg=controller.colors["frame_bg"], fg=controller.colors["success"], font=("Segoe UI", 12, "bold"))
+        self.present_title.pack(anchor="w")
+        self.present_list = tk.Listbox(present_frame, width=28, bg=controller.colors["bg_dark"], fg=controller.colors["text"],
+                                       borderwidth=0, highlightthickness=0, font=("Segoe UI", 10))
+        self.present_list.pack(fill="y", expand=True, pady=(5, 0))
         
         # Video Feed
         self.video_label = tk.Label(self, bg="black", text="Camera Off", fg="white")
         self.video_label.pack(expand=True, fill="both", padx=20, pady=10)
-        
-        # Status
-        self.status_label = tk.Label(self, text="Ready", bg=controller.colors["bg_dark"], font=("Segoe UI", 10))
-        self.status_label.pack(pady=5)
 
         # Inference State
-        self.db = None
-        self.known_encodings = []
-        self.known_names = []
-        self.known_roll_nos = []
-        
-        # Check imports for inference
-        try:
-            from src.attendance import yolo_model
-            # face_recognition is imported at top of file usually, but ensure it's here
-            import face_recognition
-            self.yolo_model = yolo_model
-            self.face_recognition = face_recognition
-            self.can_run_inference = True
-        except ImportError:
-            self.can_run_inference = False
+        self.matcher = None
+        self.tracker = IoUTracker()
+        self.last_seq = 0
+        self.last_result_seq = 0
+        self.tracks = [] # copies of the tracker's tracks, owned by the Tk thread
+
+        # Session State
+        self.session_present = {} # roll -> (name, time)
+        self.attendance_events = [] # not yet recorded
+        self.unsaved_events = False
+        self.session_id = None
+        self.session_started = None
+        self.next_stats = 0.0
+        
+        # Check imports for inference (without importing them: models load lazily, see src/models.py)
+        self.can_run_inference = all(importlib.util.find_spec(m) is not None for m in ("ultralytics", "face_recognition"))
+        if not self.can_run_inference:
             self.status_label.config(text="Warning: Inference libraries not loaded.", fg=controller.colors["danger"])
 
     def load_resources(self):
         try:
-            self.db = load_db()
-            if self.db:
-                self.known_encodings = [d['encoding'] for d in self.db.values()]
-                self.known_names = [d['name'] for d in self.db.values()]
-                self.known_roll_nos = list(self.db.keys())
-            else:
+            self.matcher = get_matcher()
+            if len(self.matcher) == 0:
                 self.status_label.config(text="No students registered.", fg=self.controller.colors["warning"])
         except Exception as e:
             print(f"DB Load Error: {e}")
@@ -393,72 +521,159 @@ class AttendanceWebcamFrame(tk.Frame):
         self.btn_start.config(state="disabled")
         self.btn_stop.config(state="normal")
         self.btn_snap.config(state="normal")
+        self.btn_save.config(state="normal")
         
         self.load_resources()
+        if self.session_id is None:
+            self.session_started = datetime.now()
+            self.session_id = f"Live_{self.session_started.strftime('%Y-%m-%d_%H-%M-%S')}"
+
+        # Capture + inference on background threads, this frame only draws (see src/live_pipeline.py)
+        self.tracker.reset()
+        self.tracks = []
+        self.last_seq = self.last_result_seq = 0
+        infer = self.run_inference if self.can_run_inference and self.matcher is not None else (lambda frame: [])
+        self.pipeline = LivePipeline(self.cap, infer, min_interval=1.0 / LIVE_INFERENCE_FPS, release_capture=True).start()
+        self.next_stats = time.perf_counter() + 2
         self.update_frame()
         
     def stop_camera(self):
         self.is_running = False
-        if self.cap:
+        if self.pipeline:
+            self.pipeline.stop()
+            print("[LIVE] Pipeline stats: " + format_stats(self.pipeline.stats()))
+        elif self.cap:
             self.cap.release()
-        self.cap = None
+        self.pipeline = None
+        self.cap = None # with a pipeline, released by its capture thread after the last read()
         
         self.video_label.config(image="", text="Camera Off")
         self.btn_start.config(state="normal")
         self.btn_stop.config(state="disabled")
         self.btn_snap.config(state="disabled")
+
+        # Don't lose live-only attendance when the camera is stopped
+        if self.unsaved_events:
+            self.save_session()
+
+    def run_inference(self, frame):
+        # Runs on the inference thread: detect, track, recognize new tracks only
+        tracks, _ = infer_live_frame(frame, self.tracker, self.matcher, scale=LIVE_INFERENCE_SCALE)
+        # Hand copies to the Tk thread, the tracker keeps mutating its own
+        return [copy.copy(t) for t in tracks]
         
     def update_frame(self):
-        if not self.is_running or not self.cap:
+        if not self.is_running or not self.pipeline:
             return
-            
-        ret, frame = self.cap.read()
-        if ret:
-            # Inference (Lightweight version for GUI)
-            # We can skip frames or just detect but not recognize every frame to save speed
-            # For now, let's just show video. If we want boxes:
-            
-            # Simple YOLO detection visualization (optional)
-            # frame = self.run_inference(frame)
+
+        seq, frame = self.pipeline.latest()
+        if self.pipeline.finished:
+            self.stop_camera()
+            self.status_label.config(text="Camera disconnected.", fg=self.controller.colors["danger"])
+            return
+
+        result_seq, tracks = self.pipeline.result()
+        if result_seq != self.last_result_seq and tracks is not None:
+            self.last_result_seq = result_seq
+            self.tracks = tracks
+            self.mark_present(tracks)
+
+        if frame is not None and seq != self.last_seq:
+            self.last_seq = seq
+            start = time.perf_counter()
+            vis_frame = frame.copy()
+
+            # Boxes are moved along their velocity so they keep up between inference frames
+            now = time.perf_counter()
+            for track in self.tracks:
+                x1, y1, x2, y2 = track.predicted_box(now)
+                color = (0, 255, 0) if track.recognized else (255, 0, 0)
+                cv2.rectangle(vis_frame, (x1, y1), (x2, y2), color, 2)
+                if track.recognized:
+                    conf = round((1 - track.distance) * 100, 1)
+                    cv2.putText(vis_frame, f"{track.name} {conf}%", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
             
             # Convert to RGB for Tkinter
-            cv_img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            cv_img = cv2.cvtColor(vis_frame, cv2.COLOR_BGR2RGB)
             
-            # Resize to fit view if needed
+            # Resize to fit view: fixed height, maintain aspect
             h, w, _ = cv_img.shape
-            # Fixed height 500, maintain aspect
-            target_h = 500
-            scale = target_h / h
-            target_w = int(w * scale)
-            
-            cv_img = cv2.resize(cv_img, (target_w, target_h))
+            scale = PREVIEW_HEIGHT / h
+            cv_img = cv2.resize(cv_img, (int(w * scale), PREVIEW_HEIGHT))
             
             img = Image.fromarray(cv_img)
             imgtk = ImageTk.PhotoImage(image=img)
             
             self.video_label.imgtk = imgtk # keep ref
             self.video_label.config(image=imgtk, text="")
+            self.pipeline.render_timer.add(time.perf_counter() - start)
+
+        if time.perf_counter() >= self.next_stats:
+            inference = self.pipeline.stats()['inference']
+            if inference['count']:
+                self.status_label.config(text=f"Live: {len(self.tracks)} in view | inference {inference['avg_ms']:.0f} ms",
+                                         fg=self.controller.colors["text"])
+            self.next_stats = time.perf_counter() + 2
         
         # Schedule next update
-        self.after(10, self.update_frame)
+        self.after(15, self.update_frame)
+
+    def mark_present(self, tracks):
+        for track in tracks:
+            if track.recognized and track.roll_no not in self.session_present:
+                now = datetime.now()
+                self.session_present[track.roll_no] = (track.name, now.strftime('%H:%M:%S'))
+                self.attendance_events.append((track.roll_no, self.session_id, now.isoformat(timespec='seconds'), track.distance, 'live'))
+                self.unsaved_events = True
+                self.present_list.insert(tk.END, f"{now.strftime('%H:%M')}  {track.name} ({track.roll_no})")
+                self.present_title.config(text=f"Present ({len(self.session_present)})")
+                print(f"[LIVE] MATCH: {track.name}")
+
+    def save_session(self):
+        # Writes the live session report straight from the present-set (no re-processing)
+        if not self.session_present:
+            messagebox.showinfo("Nothing to Save", "No students have been recognized in this session yet.")
+            return
+        matcher = self.matcher or get_matcher()
+        report = save_live_session(matcher.roll_nos, matcher.names, self.attendance_events, self.session_id, self.session_started)
+        if report:
+            # Events are recorded once; later saves only rewrite the report
+            self.attendance_events = []
+            self.unsaved_events = False
+            self.status_label.config(text=f"Saved {report}", fg=self.controller.colors["success"])
+        else:
+            self.status_label.config(text="Could not save the live report.", fg=self.controller.colors["danger"])
 
     def take_snapshot(self):
-        if not self.cap: return
-        ret, frame = self.cap.read()
-        if ret:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            s_name = f"snapshot_{timestamp}.jpg"
-            cv2.imwrite(s_name, frame)
-            
-            # Stop camera to show result? Or just show popup?
-            # Let's process it
-            success, msg, out_path = process_group_photo(s_name)
-            
-            if success:
-                messagebox.showinfo("Snapshot Processed", msg)
-                # Ideally, show the annotated image in a popup or verify tab
-            else:
-                messagebox.showerror("Processing Failed", msg)
+        if not self.pipeline: return
+        _, frame = self.pipeline.latest()
+        if frame is not None:
+            # Processed in the background straight from memory, the preview keeps running
+            frame = frame.copy()
+            s_name = snapshot_path() if SAVE_SNAPSHOTS else None
+            self.status_label.config(text="Processing snapshot...", fg=self.controller.colors["warning"])
+            self.controller.jobs.submit("Snapshot", self.run_snapshot, self.pipeline, frame, s_name,
+                                        on_done=self.on_snapshot_processed)
+
+    def run_snapshot(self, job, pipeline, frame, save_image_path):
+        # Runs on the job thread. Live inference shares the person detector (and, without
+        # face workers, dlib) with the snapshot, so it is paused until the snapshot is done.
+        with pipeline.paused():
+            return process_group_frame(frame, save_image_path=save_image_path, job=job)
+
+    def on_snapshot_processed(self, job, result, error):
+        if isinstance(error, JobCancelled):
+            self.status_label.config(text="Snapshot cancelled", fg=self.controller.colors["warning"])
+            return
+        success, msg, out_path = result if error is None else (False, f"Processing crashed: {error}", None)
+
+        if success:
+            self.status_label.config(text=msg.split('\n')[0], fg=self.controller.colors["success"])
+            messagebox.showinfo("Snapshot Processed", msg)
+            # Ideally, show the annotated image in a popup or verify tab
+        else:
+            self.status_label.config(text=msg, fg=self.controller.colors["danger"])
+            messagebox.showerror("Processing Failed", msg)
 
     def on_show(self):
         # Called when frame is shown
@@ -478,9 +693,10 @@ class DeleteFrame(tk.Frame):
         form = tk.Frame(self, bg=controller.colors["bg_dark"])
         form.pack()
         
-        ttk.Label(form, text="Enter Roll Number to Delete:", style="SubHeader.TLabel").pack(pady=10)
+        ttk.Label(form, text="Enter Roll Number(s) to Delete:", style="SubHeader.TLabel").pack(pady=10)
         self.roll_entry = ttk.Entry(form, width=30, font=("Segoe UI", 12))
         self.roll_entry.pack(pady=5, ipady=5)
+        tk.Label(form, text="Separate several roll numbers with commas", bg=controller.colors["bg_dark"], fg=controller.colors["text"], font=("Segoe UI", 9)).pack()
         
         btn_del = tk.Button(self, text="DELETE STUDENT", 
                             bg=controller.colors["danger"], fg="white",
@@ -491,27 +707,28 @@ class DeleteFrame(tk.Frame):
         btn_del.pack(pady=30)
 
     def delete_action(self):
-        roll = self.roll_entry.get().strip()
-        if not roll:
+        rolls = [r.strip() for r in self.roll_entry.get().split(',') if r.strip()]
+        if not rolls:
             messagebox.showwarning("Input Required", "Please enter a roll number.")
             return
             
-        confirm = messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete student with Roll No: {roll}?\nThis cannot be undone.")
+        confirm = messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {len(rolls)} student(s) with Roll No: {', '.join(rolls)}?\nThis cannot be undone.")
         if confirm:
-            try:
-                # We need to import delete_student_by_roll or implement it
-                # It was imported at top of file? No.
-                # Let's import it inside or fix top imports
-                success, msg = delete_student_by_roll(roll)
-                
-                if success:
-                    messagebox.showinfo("Success", msg)
-                    self.roll_entry.delete(0, tk.END)
-                else:
-                    messagebox.showerror("Deletion Failed", msg)
-                    
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete: {e}")
+            # A job like every other write: it never runs alongside a registration, and the
+            # Excel sheet is compacted on the job thread instead of freezing the window
+            self.controller.jobs.submit(f"Deleting {', '.join(rolls)}",
+                                        lambda job: delete_students_by_roll(rolls, compact_in_background=False),
+                                        on_done=self.on_deleted)
+
+    def on_deleted(self, job, result, error):
+        if isinstance(error, JobCancelled):
+            return
+        success, msg, _ = result if error is None else (False, f"Failed to delete: {error}", None)
+        if success:
+            messagebox.showinfo("Success", msg)
+            self.roll_entry.delete(0, tk.END)
+        else:
+            messagebox.showerror("Deletion Failed", msg)
 
 
 
@@ -0,0 +1,365 @@
+import os
+import json
+import time
+import atexit
+import cProfile
+import functools
+import threading
+from datetime import datetime
+
+# Pipeline instrumentation: spans, counters and histograms.
+#
+#   with run('group_photo', image=path):     # one pipeline run (photo, webcam frame, ...)
+#       with span('detect_persons'):         # one stage, timed
+#           ...
+#       count('faces.encoded', 3)
+#       observe('match.distance', 0.41)
+#
+# Everything recorded during a run is collected into one record that is handed
+# to the sinks when the run ends:
+#   StatsSink   - in-process aggregates (counters, latency / distance histograms)
+#   JsonlSink   - one JSON line per run
+#   ProfileSink - a cProfile dump per run (calling thread only)
+#
+# Disabled by default. When disabled, span() / run() return a shared no-op
+# context manager and count() / observe() return after one flag check.
+#
+# Enable from the environment (comma separated sinks):
+#   ATTENDANCE_INSTRUMENT=stats,jsonl:data/metrics.jsonl,profile:profiles
+# or from code with configure([...]).
+
+LATENCY_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+DISTANCE_BOUNDS = tuple(round(0.05 * i, 2) for i in range(1, 21))
+
+_enabled = False
+_sinks = []
+_local = threading.local()
+
+
+class _NullContext:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullContext()
+
+
+class RunRecord:
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+        self.started_at = datetime.now().isoformat(timespec='milliseconds')
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = [] # (name, offset s, duration s)
+        self.stages = {} # span name -> total seconds (stage spans only, they don't nest)
+        self.counters = {}
+        self.observations = {} # histogram name -> [values]
+
+    def add_span(self, name, start, duration, stage=True):
+        self.spans.append((name, start - self.start, duration))
+        if stage:
+            self.stages[name] = self.stages.get(name, 0.0) + duration
+            self.observations.setdefault(f"latency_ms.{name}", []).append(duration * 1000)
+
+    def to_dict(self):
+        return {
+            'run': self.name, 'tags': self.tags, 'started_at': self.started_at,
+            'duration_ms': None if self.duration is None else self.duration * 1000,
+            'stages_ms': {k: v * 1000 for k, v in self.stages.items()},
+            'spans': [{'name': n, 'offset_ms': o * 1000, 'duration_ms': d * 1000} for n, o, d in self.spans],
+            'counters': self.counters,
+            'observations': self.observations,
+        }
+
+
+class _Span:
+    __slots__ = ('name', 'record', 'start', 'stage')
+
+    def __init__(self, name, record, stage=True):
+        self.name = name
+        self.record = record
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record.add_span(self.name, self.start, time.perf_counter() - self.start, self.stage)
+        return False
+
+
+class _Run:
+    def __init__(self, name, tags):
+        self.record = RunRecord(name, tags)
+        self.profiler = None
+
+    def __enter__(self):
+        _local.record = self.record
+        if any(isinstance(s, ProfileSink) for s in _sinks):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self.profiler = profiler
+            except ValueError:
+                pass # another thread's run is being profiled already
+        return self.record
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+        record = self.record
+        record.duration = time.perf_counter() - record.start
+        _local.record = None
+        for sink in _sinks:
+            try:
+                sink.on_run(record, self.profiler)
+            except Exception as e:
+                print(f"Warning: Instrumentation sink failed ({e}).")
+        return False
+
+
+def _current():
+    return getattr(_local, 'record', None)
+
+
+def enabled():
+    return _enabled
+
+
+def run(name, **tags):
+    # One pipeline run. Nested inside another run it only shows up in that run's span
+    # timeline: it wraps stages that are counted already, so it is not a stage itself.
+    if not _enabled:
+        return _NULL
+    record = _current()
+    if record is not None:
+        return _Span(name, record, stage=False)
+    return _Run(name, tags)
+
+
+def span(name):
+    # A timed stage of the current run (a one-span run if there is none)
+    if not _enabled:
+        return _NULL
+    record = _current()
+    if record is None:
+        return _Run(name, {})
+    return _Span(name, record)
+
+
+def timed(name=None):
+    # Decorator form of span(); the flag is checked per call
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return wrap
+
+
+def count(name, n=1):
+    if not _enabled:
+        return
+    record = _current()
+    if record is None:
+        _emit_loose(name, counter=n)
+    else:
+        record.counters[name] = record.counters.get(name, 0) + n
+
+
+def observe(name, value):
+    # Adds a value to histogram `name`
+    if not _enabled:
+        return
+    record = _current()
+    if record is None:
+        _emit_loose(name, value=value)
+    else:
+        record.observations.setdefault(name, []).append(float(value))
+
+
+def _emit_loose(name, counter=None, value=None):
+    # Metrics recorded outside any run go to the aggregating sinks only
+    for sink in _sinks:
+        if isinstance(sink, StatsSink):
+            if counter is not None:
+                sink.add_counter(name, counter)
+            else:
+                sink.add_observation(name, float(value))
+
+
+# --- Sinks ---
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        # Upper bound of the bucket holding the q-th percentile
+        if not self.count:
+            return None
+        target = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'mean': self.total / self.count if self.count else None,
+                'min': self.min, 'max': self.max, 'p50': self.percentile(50), 'p95': self.percentile(95)}
+
+
+def _bounds_for(name):
+    if name.startswith('latency_ms.'):
+        return LATENCY_BOUNDS_MS
+    if 'distance' in name:
+        return DISTANCE_BOUNDS
+    return LATENCY_BOUNDS_MS
+
+
+class StatsSink:
+    # Aggregates every run in memory: counters, histograms, runs per name
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.runs = {}
+        self.counters = {}
+        self.histograms = {}
+
+    def add_counter(self, name, n):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_observation(self, name, value):
+        with self.lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram(_bounds_for(name))
+            hist.add(value)
+
+    def on_run(self, record, profiler=None):
+        with self.lock:
+            self.runs[record.name] = self.runs.get(record.name, 0) + 1
+        self.add_observation(f"latency_ms.run.{record.name}", record.duration * 1000)
+        for name, n in record.counters.items():
+            self.add_counter(name, n)
+        for name, values in record.observations.items():
+            for value in values:
+                self.add_observation(name, value)
+
+    def snapshot(self):
+        with self.lock:
+            return {'runs': dict(self.runs), 'counters': dict(self.counters),
+                    'histograms': {name: h.summary() for name, h in self.histograms.items()}}
+
+    def format(self):
+        snap = self.snapshot()
+        lines = ["Runs: " + ", ".join(f"{k}={v}" for k, v in sorted(snap['runs'].items()))]
+        for name, value in sorted(snap['counters'].items()):
+            lines.append(f"  {name:<32} {value}")
+        for name, h in sorted(snap['histograms'].items()):
+            lines.append(f"  {name:<32} n={h['count']:<6} mean={h['mean']:.3f} p50<={h['p50']} p95<={h['p95']} max={h['max']:.3f}")
+        return "\n".join(lines)
+
+
+class JsonlSink:
+    # Appends one JSON line per run
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def on_run(self, record, profiler=None):
+        line = json.dumps(record.to_dict(), default=str)
+        with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+class ProfileSink:
+    # Dumps a cProfile of every run into `directory` (open with pstats / snakeviz)
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def on_run(self, record, profiler=None):
+        if profiler is None:
+            return
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        profiler.dump_stats(os.path.join(self.directory, f"{record.name}_{stamp}.prof"))
+
+
+# --- Configuration ---
+
+def configure(sinks):
+    # Replaces the sinks; an empty list disables instrumentation
+    global _enabled, _sinks
+    _sinks = list(sinks)
+    _enabled = bool(_sinks)
+    return _sinks
+
+
+def add_sink(sink):
+    configure(_sinks + [sink])
+    return sink
+
+
+def get_sink(kind):
+    for sink in _sinks:
+        if isinstance(sink, kind):
+            return sink
+    return None
+
+
+def configure_from_env(spec=None):
+    spec = os.environ.get('ATTENDANCE_INSTRUMENT', '') if spec is None else spec
+    sinks = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        kind, _, arg = item.partition(':')
+        if kind == 'stats':
+            sinks.append(StatsSink())
+        elif kind == 'jsonl':
+            sinks.append(JsonlSink(arg or 'data/metrics.jsonl'))
+        elif kind == 'profile':
+            sinks.append(ProfileSink(arg or 'profiles'))
+        else:
+            print(f"Warning: Unknown instrumentation sink '{kind}'.")
+    configure(sinks)
+    return sinks
+
+
+def _print_stats_at_exit():
+    sink = get_sink(StatsSink)
+    if sink is not None and sink.runs:
+        print("\n--- Pipeline statistics ---")
+        print(sink.format())
+
+
+configure_from_env()
+atexit.register(_print_stats_at_exit)
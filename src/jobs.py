@@ -0,0 +1,144 @@
+import queue
+import threading
+
+# Background jobs for the Tkinter GUI.
+#
+# Heavy work (registration, group photos) runs on one worker thread, in the
+# order it was submitted, so two jobs never write the database / Excel at the
+# same time. Tk widgets may only be touched from the main thread: the worker
+# posts its events to a queue that the runner drains with after() and turns
+# into on_progress / on_done callbacks on the main thread.
+#
+# Cancelling is cooperative: a queued job is dropped before it starts, a
+# running one only stops where its function checks job.cancelled (never in
+# the middle of a write).
+
+POLL_MS = 100
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, runner, name, fn, args, on_done, on_progress):
+        self.runner = runner
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check_cancelled(self):
+        # For job functions: raise at a safe point if the user cancelled
+        if self.cancelled:
+            raise JobCancelled()
+
+    def report(self, done, total, text=""):
+        # For job functions: progress within this job (called on the worker thread)
+        self.runner._events.put(('progress', self, (done, total, text)))
+
+
+class JobRunner:
+    def __init__(self, root, poll_ms=POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._jobs = queue.Queue()
+        self._events = queue.Queue()
+        self._pending = []
+        self._lock = threading.Lock()
+        self.current = None
+        # Jobs finished since the runner was last idle (drives an overall progress bar)
+        self.batch_done = 0
+        self.batch_total = 0
+        self.listeners = [] # fn(runner) called on the main thread whenever the queue changes
+
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+        self.root.after(self.poll_ms, self._poll)
+
+    # --- Main thread API ---
+
+    def submit(self, name, fn, *args, on_done=None, on_progress=None):
+        # fn(job, *args) runs on the worker thread.
+        # on_done(job, result, error) and on_progress(job, done, total, text) run on the main thread.
+        job = Job(self, name, fn, args, on_done, on_progress)
+        with self._lock:
+            if not self.busy:
+                self.batch_done = self.batch_total = 0
+            self._pending.append(job)
+            self.batch_total += 1
+        self._jobs.put(job)
+        self._notify()
+        return job
+
+    @property
+    def busy(self):
+        return self.current is not None or bool(self._pending)
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def cancel_all(self):
+        with self._lock:
+            jobs = list(self._pending)
+            if self.current is not None:
+                jobs.append(self.current)
+        for job in jobs:
+            job.cancel()
+
+    # --- Worker thread ---
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            with self._lock:
+                self._pending.remove(job)
+                self.current = job
+            self._events.put(('started', job, None))
+
+            result, error = None, None
+            if job.cancelled:
+                error = JobCancelled()
+            else:
+                try:
+                    result = job.fn(job, *job.args)
+                except Exception as e:
+                    error = e
+
+            with self._lock:
+                self.current = None
+                self.batch_done += 1
+            self._events.put(('done', job, (result, error)))
+
+    # --- Marshalling back to Tk ---
+
+    def _poll(self):
+        try:
+            while True:
+                kind, job, payload = self._events.get_nowait()
+                if kind == 'progress' and job.on_progress:
+                    job.on_progress(job, *payload)
+                elif kind == 'done' and job.on_done:
+                    try:
+                        job.on_done(job, *payload)
+                    except Exception as e:
+                        print(f"Error in callback of job '{job.name}': {e}")
+                if kind in ('started', 'done'):
+                    self._notify()
+        except queue.Empty:
+            pass
+        self.root.after(self.poll_ms, self._poll)
+
+    def _notify(self):
+        for listener in self.listeners:
+            listener(self)
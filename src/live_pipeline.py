@@ -0,0 +1,287 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Producer / consumer pipeline for live video.
+#
+#   capture thread   - reads the source as fast as it delivers and keeps only the
+#                      newest frame, so the camera / RTSP buffer never backs up
+#   inference thread - takes the newest frame it has not seen yet (older frames
+#                      are dropped) and runs the heavy infer(frame) callable
+#   render loop      - the caller's loop: latest() + result() never block
+#
+# Every stage records its latency; stats() / format_stats() summarise them.
+# Inference can be paused (e.g. while a snapshot uses the same detector and
+# face models) without stopping the capture thread or the preview.
+# Recorded videos can be fed in through PacedCapture to replay them at the
+# speed a camera would deliver them (see attendance.replay_video).
+
+STATS_WINDOW = 120 # latencies kept per stage for the rolling averages
+
+
+class StageTimer:
+    def __init__(self, window=STATS_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def summary(self):
+        avg = sum(self.samples) / len(self.samples) if self.samples else 0.0
+        return {'count': self.count, 'avg_ms': avg * 1000, 'max_ms': self.max * 1000}
+
+
+class PacedCapture:
+    # Wraps a recorded video so read() delivers frames at `fps`, like a live camera
+    def __init__(self, cap, fps):
+        self.cap = cap
+        self.interval = 1.0 / fps if fps and fps > 0 else 0.0
+        self.frames = 0
+        self._start = None
+
+    def read(self):
+        if self._start is None:
+            self._start = time.perf_counter()
+        # Frame n is due at start + n / fps, so slow decodes don't accumulate drift
+        delay = self._start + self.frames * self.interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self.frames += 1
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+class LatestFrameGrabber(threading.Thread):
+    # Capture thread: always holds the most recent frame of `cap`.
+    # release_on_exit: release cap from this thread once it stops, so it is never
+    # released while a read() is still in flight (stop() may time out on a slow camera).
+    def __init__(self, cap, release_on_exit=False):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.release_on_exit = release_on_exit
+        self.timer = StageTimer()
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._stopped = False
+        self.dropped = 0 # frames overwritten before anyone read them
+        self._taken_seq = 0
+
+    def run(self):
+        try:
+            self._capture()
+        finally:
+            if self.release_on_exit:
+                self.cap.release()
+
+    def _capture(self):
+        while not self._stopped:
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            self.timer.add(time.perf_counter() - start)
+            with self._cond:
+                if not ret:
+                    self._stopped = True
+                    self._cond.notify_all()
+                    break
+                if self._seq > self._taken_seq:
+                    self.dropped += 1
+                self._frame = frame
+                self._seq += 1
+                self._cond.notify_all()
+
+    def latest(self):
+        # (seq, frame) of the newest frame, (0, None) before the first one. Never blocks.
+        with self._cond:
+            if self._seq > self._taken_seq:
+                self._taken_seq = self._seq
+            return self._seq, self._frame
+
+    def wait_newer(self, seq, timeout=0.5):
+        # Blocks until a frame newer than `seq` arrives (or the source ends)
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > seq or self._stopped, timeout=timeout)
+            return self._seq, self._frame
+
+    def pending(self):
+        # Unread frames waiting in the slot (0 or 1)
+        with self._cond:
+            return 1 if self._seq > self._taken_seq else 0
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    def stop(self):
+        self._stopped = True
+        with self._cond:
+            self._cond.notify_all()
+
+
+class InferenceWorker(threading.Thread):
+    # Inference thread: runs infer(frame) on the newest frame, skipping stale ones.
+    # on_result(seq, result, seconds) is called on this thread after every inference.
+    def __init__(self, grabber, infer, min_interval=0.0, on_result=None):
+        super().__init__(daemon=True)
+        self.grabber = grabber
+        self.infer = infer
+        self.min_interval = min_interval
+        self.on_result = on_result
+        self.timer = StageTimer()
+        self.skipped = 0 # captured frames never passed to infer()
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._result = None
+        self._result_seq = 0
+        self._result_time = 0.0
+        self._stopped = False
+        self._running = threading.Event() # cleared while paused
+        self._running.set()
+        self._busy = threading.Lock() # held while infer() runs
+
+    def run(self):
+        last_seq = 0
+        while not self._stopped:
+            if not self._running.wait(0.5):
+                continue
+            seq, frame = self.grabber.wait_newer(last_seq)
+            if seq <= last_seq:
+                if self.grabber.stopped:
+                    break
+                continue
+
+            with self._busy:
+                if not self._running.is_set():
+                    continue # paused while waiting for the frame
+                if last_seq:
+                    self.skipped += seq - last_seq - 1
+                last_seq = seq
+
+                start = time.perf_counter()
+                try:
+                    result = self.infer(frame)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Inference error: {e}")
+                    continue
+                finally:
+                    elapsed = time.perf_counter() - start
+                    self.timer.add(elapsed)
+
+            with self._lock:
+                self._result = result
+                self._result_seq = seq
+                self._result_time = time.perf_counter()
+            if self.on_result is not None:
+                try:
+                    self.on_result(seq, result, elapsed)
+                except Exception as e:
+                    print(f"Result handler error: {e}")
+
+            if self.min_interval > elapsed:
+                time.sleep(self.min_interval - elapsed)
+
+    def result(self):
+        # (seq of the frame it came from, result), (0, None) before the first one. Never blocks.
+        with self._lock:
+            return self._result_seq, self._result
+
+    def result_age(self):
+        # Seconds since the current result was produced
+        with self._lock:
+            return time.perf_counter() - self._result_time if self._result_seq else 0.0
+
+    def pause(self):
+        # Stops scheduling infer() and waits for a running call to finish
+        self._running.clear()
+        with self._busy:
+            pass
+
+    def resume(self):
+        self._running.set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def stop(self):
+        self._stopped = True
+        self._running.set()
+
+
+class LivePipeline:
+    # Wires a capture thread and an inference thread together around `cap`.
+    # release_capture: the capture thread releases cap when it exits; the caller must
+    # not release it itself.
+    def __init__(self, cap, infer, min_interval=0.0, on_result=None, release_capture=False):
+        self.grabber = LatestFrameGrabber(cap, release_on_exit=release_capture)
+        self.worker = InferenceWorker(self.grabber, infer, min_interval=min_interval, on_result=on_result)
+        self.render_timer = StageTimer()
+
+    def start(self):
+        self.grabber.start()
+        self.worker.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self.worker.stop()
+        self.grabber.stop()
+        self.worker.join(timeout)
+        self.grabber.join(timeout)
+
+    @contextmanager
+    def paused(self):
+        # with pipeline.paused(): ... - no inference runs inside the block, capture goes on
+        self.worker.pause()
+        try:
+            yield self
+        finally:
+            self.worker.resume()
+
+    @property
+    def source_ended(self):
+        return self.grabber.stopped
+
+    @property
+    def finished(self):
+        # Source ended and its last frame has been through inference
+        return self.grabber.stopped and not self.worker.is_alive()
+
+    def latest(self):
+        return self.grabber.latest()
+
+    def result(self):
+        return self.worker.result()
+
+    def stats(self):
+        result_seq, _ = self.worker.result()
+        return {
+            'capture': self.grabber.timer.summary(),
+            'inference': self.worker.timer.summary(),
+            'render': self.render_timer.summary(),
+            'capture_queue': self.grabber.pending(),
+            'frames_captured': self.grabber._seq,
+            'frames_dropped_render': self.grabber.dropped,
+            'frames_skipped_inference': self.worker.skipped,
+            'frames_behind': max(0, self.grabber._seq - result_seq) if result_seq else 0,
+            'result_age_ms': self.worker.result_age() * 1000,
+            'inference_errors': self.worker.errors,
+        }
+
+
+def format_stats(stats):
+    parts = []
+    for stage in ('capture', 'inference', 'render'):
+        s = stats[stage]
+        parts.append(f"{stage} {s['avg_ms']:.1f}/{s['max_ms']:.1f}ms (n={s['count']})")
+    parts.append(f"queue {stats['capture_queue']}")
+    parts.append(f"dropped {stats['frames_dropped_render']} (render) / {stats['frames_skipped_inference']} (inference)")
+    parts.append(f"result lag {stats['frames_behind']} frames, {stats['result_age_ms']:.0f}ms")
+    return " | ".join(parts)
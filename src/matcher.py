@@ -0,0 +1,85 @@
+import numpy as np
+from src.database import load_gallery, db_version, expand_db
+from src.ann_index import load_index_for, index_version, ANN_NPROBE
+
+ENCODING_DIM = 128
+DEFAULT_TOLERANCE = 0.55
+
+
+class GalleryMatcher:
+    # Holds every registered encoding in one contiguous float32 (N x 128) matrix
+    # with parallel roll/name lists, so all faces of a frame can be matched
+    # against the whole gallery with a single matrix product.
+    #
+    # Students enrolled with several photos own several rows (templates);
+    # their distance is the minimum over their templates.
+
+    def __init__(self, roll_nos, names, encodings, use_index=True):
+        # roll_nos / names are per row; collapse them to one entry per student
+        self.roll_nos = []
+        self.names = []
+        student_of = {}
+        row_owner = []
+        for roll_no, name in zip(roll_nos, names):
+            idx = student_of.get(roll_no)
+            if idx is None:
+                idx = student_of[roll_no] = len(self.roll_nos)
+                self.roll_nos.append(roll_no)
+                self.names.append(name)
+            row_owner.append(idx)
+        self.row_owner = np.asarray(row_owner, dtype=np.intp)
+        self.encodings = encodings
+
+        # Pre-computed squared norms for ||a - b||^2 = ||a||^2 + ||b||^2 - 2ab
+        self.sq_norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+
+        # Optional ANN index for large galleries (None -> exact scan)
+        self.index = load_index_for(self.encodings) if use_index else None
+
+    @classmethod
+    def from_db(cls, db, use_index=True):
+        return cls(*expand_db(db), use_index=use_index)
+
+    def __len__(self):
+        return len(self.roll_nos)
+
+    def distances(self, probes):
+        # Returns the (M x rows) euclidean distance matrix between probes and every template
+        probes = np.asarray(probes, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        probe_sq = np.einsum('ij,ij->i', probes, probes)
+        d2 = probe_sq[:, None] + self.sq_norms[None, :] - 2.0 * (probes @ self.encodings.T)
+        np.maximum(d2, 0.0, out=d2)
+        return np.sqrt(d2)
+
+    def match(self, probes, exact=False, nprobe=ANN_NPROBE):
+        # Best student index (into roll_nos / names) and distance for every probe encoding.
+        # Returns two arrays of length M; the caller applies its own tolerance.
+        probes = np.asarray(probes, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if len(self) == 0 or len(probes) == 0:
+            return np.full(len(probes), -1, dtype=np.intp), np.full(len(probes), np.inf, dtype=np.float32)
+
+        if self.index is not None and not exact:
+            best_row, best_dist = self.index.search(self.encodings, self.sq_norms, probes, nprobe=nprobe)
+        else:
+            dists = self.distances(probes)
+            best_row = np.argmin(dists, axis=1)
+            best_dist = dists[np.arange(len(probes)), best_row]
+
+        # The closest template overall is the closest template of the closest student
+        best_idx = np.where(best_row >= 0, self.row_owner[best_row], -1)
+        return best_idx, best_dist
+
+
+_cached_matcher = None
+_cached_version = None
+
+
+def get_matcher():
+    # Returns a shared matcher, rebuilt only when the database (or its ANN index) changes
+    global _cached_matcher, _cached_version
+
+    version = (db_version(), index_version())
+    if _cached_matcher is None or version != _cached_version:
+        _cached_matcher = GalleryMatcher(*load_gallery())
+        _cached_version = version
+    return _cached_matcher
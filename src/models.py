@@ -0,0 +1,67 @@
+import threading
+import numpy as np
+
+# Lazily loaded models. Importing ultralytics (torch) and face_recognition (dlib)
+# takes seconds, so nothing heavy is imported until a model is first needed.
+# The GUI preloads them on a background thread with start_warm_up().
+
+YOLO_WEIGHTS = 'yolov8n.pt'
+
+_lock = threading.Lock()
+_yolo_model = None
+_face_recognition = None
+
+
+def get_yolo_model():
+    # Load YOLO model (standard COCO model, we will use class 0: person)
+    # It will auto-download on first run
+    global _yolo_model
+    if _yolo_model is None:
+        with _lock:
+            if _yolo_model is None:
+                from ultralytics import YOLO
+                _yolo_model = YOLO(YOLO_WEIGHTS)
+    return _yolo_model
+
+
+def get_face_recognition():
+    global _face_recognition
+    if _face_recognition is None:
+        with _lock:
+            if _face_recognition is None:
+                import face_recognition
+                _face_recognition = face_recognition
+    return _face_recognition
+
+
+def models_loaded():
+    # Person detector of the configured backend (see src/detectors.py) and dlib
+    from src.detectors import detector_loaded # detectors imports this module
+    return detector_loaded() and _face_recognition is not None
+
+
+def warm_up():
+    # Loads both models and runs one tiny inference each, so the first real
+    # photo does not pay for predictor / dlib model set-up either.
+    # The person detector is the configured backend's, called through its lock
+    # (live inference or a snapshot may already be using it).
+    from src.detectors import get_detector
+    fr = get_face_recognition()
+    dummy = np.zeros((64, 64, 3), dtype=np.uint8)
+    get_detector().detect(dummy)
+    fr.face_locations(dummy)
+
+
+def start_warm_up(on_error=None):
+    # Runs warm_up() on a daemon thread and returns the thread
+    def run():
+        try:
+            warm_up()
+        except Exception as e:
+            print(f"Model warm-up failed: {e}")
+            if on_error:
+                on_error(e)
+
+    thread = threading.Thread(target=run, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -1,56 +1,127 @@
-import face_recognition
 import cv2
+import numpy as np
 import os
+import csv
 import shutil
-from src.database import load_db, save_db
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from src.database import add_student, add_students
+from src.ann_index import refresh_index
+from src.models import get_face_recognition
+from src.encoding_cache import get_encoding_cache, file_digest, make_key, cache_lookup, cache_store
 
 REGISTERED_FACES_DIR = 'data/registered_faces'
 
+# How several enrolment photos of one student are stored:
+#   'templates' - keep up to MAX_TEMPLATES individual encodings (matching uses the closest one)
+#   'centroid'  - keep only their mean encoding
+TEMPLATE_MODE = 'templates'
+MAX_TEMPLATES = 5
+
+def build_templates(encodings, mode=TEMPLATE_MODE, max_templates=MAX_TEMPLATES):
+    # Reduce the encodings of all enrolment photos to the (K x 128) templates to store
+    encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+    centroid = encodings.mean(axis=0)
+    if mode == 'centroid' or len(encodings) == 1:
+        return centroid[None, :]
+    if len(encodings) <= max_templates:
+        return encodings
+
+    # Greedy farthest-point selection: start from the most typical photo, then keep
+    # adding the one that differs most from those already chosen (pose / lighting spread)
+    chosen = [int(np.argmin(np.linalg.norm(encodings - centroid, axis=1)))]
+    min_dist = np.linalg.norm(encodings - encodings[chosen[0]], axis=1)
+    while len(chosen) < max_templates:
+        nxt = int(np.argmax(min_dist))
+        chosen.append(nxt)
+        min_dist = np.minimum(min_dist, np.linalg.norm(encodings - encodings[nxt], axis=1))
+    return encodings[chosen]
+
+# Part of the encoding cache keys of enrolment photos (face_locations defaults: HOG, upsample 1)
+REGISTRATION_SETTINGS = "register:hog:up1"
+
+def _registration_cache_key(image_path):
+    # Cache key of an enrolment photo's file content, None when the cache is off or the file unreadable
+    if get_encoding_cache() is None:
+        return None
+    try:
+        return make_key(file_digest(image_path), REGISTRATION_SETTINGS)
+    except OSError:
+        return None
+
+def _encode_single_face(face_recognition, image):
+    # (faces found, encoding of the face when there is exactly one)
+    face_locations = face_recognition.face_locations(image)
+    if len(face_locations) != 1:
+        return len(face_locations), None
+    return 1, face_recognition.face_encodings(image, face_locations)[0]
+
 def register_student(name, roll_no, image_path):
-    print(f"Registering student: {name} ({roll_no}) from {image_path}")
+    # image_path can be a single photo or a list of photos of the same student
+    image_paths = [image_path] if isinstance(image_path, str) else list(image_path)
+    print(f"Registering student: {name} ({roll_no}) from {', '.join(image_paths)}")
     
     try:
-        # Load image
-        image = face_recognition.load_image_file(image_path)
+        face_recognition = get_face_recognition()
+        face_encodings = []
+        reference_image = None
+        # Photos enrolled before (e.g. a retry after an error) skip detection + encoding
+        cache_keys = [_registration_cache_key(path) for path in image_paths]
+        cached = cache_lookup(cache_keys)
+        for path, cache_key in zip(image_paths, cache_keys):
+            # Name the photo in error messages when several were given
+            which = f" ({os.path.basename(path)})" if len(image_paths) > 1 else ""
+            
+            if cache_key in cached:
+                faces, encoding = cached[cache_key]
+            else:
+                # Load image, detect faces and encode the face
+                image = face_recognition.load_image_file(path)
+                faces, encoding = _encode_single_face(face_recognition, image)
+                cache_store([(cache_key, (faces, encoding))])
+                if path == image_paths[0]:
+                    reference_image = image
+            
+            if faces == 0:
+                msg = f"Error: No face detected in the image{which}."
+                print(msg)
+                return False, msg
+            
+            if faces > 1:
+                msg = f"Error: Multiple faces detected{which}. Please provide an image with a single student."
+                print(msg)
+                return False, msg
+                
+            face_encodings.append(encoding)
         
-        # Detect faces
-        face_locations = face_recognition.face_locations(image)
-        if not face_locations:
-            msg = "Error: No face detected in the image."
-            print(msg)
-            return False, msg
+        if reference_image is None:
+            # First photo came from the cache, it is only decoded for the reference copy
+            reference_image = face_recognition.load_image_file(image_paths[0])
         
-        if len(face_locations) > 1:
-            msg = "Error: Multiple faces detected. Please provide an image with a single student."
-            print(msg)
-            return False, msg
-            
-        # Get encoding
-        # we take the first face found
-        db = load_db()
+        templates = build_templates(face_encodings)
         
-        # Check if roll_no already exists
-        if roll_no in db:
-            print(f"Warning: Roll number {roll_no} already exists. Overwriting.")
-            
-        face_encoding = face_recognition.face_encodings(image, face_locations)[0]
+        # Save to DB (appended to the store, no full rewrite)
+        existed = add_student(roll_no, name, templates)
+        if existed:
+            print(f"Warning: Roll number {roll_no} already exists. Overwritten.")
         
-        # Save to DB
-        db[roll_no] = {
-            'name': name,
-            'encoding': face_encoding
-        }
-        save_db(db)
+        # Keep the ANN index (large galleries only) in sync with the new student
+        try:
+            refresh_index()
+        except Exception as e:
+            print(f"Warning: ANN index update failed ({e}). Matching will use exact search.")
         
         # Save a reference image (optional, but good for UI)
         os.makedirs(REGISTERED_FACES_DIR, exist_ok=True)
         # Convert RGB (face_recognition) to BGR (opencv) for saving
-        image_bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        image_bgr = cv2.cvtColor(reference_image, cv2.COLOR_RGB2BGR)
         
         target_path = os.path.join(REGISTERED_FACES_DIR, f"{roll_no}_{name}.jpg")
         cv2.imwrite(target_path, image_bgr)
         
         msg = f"Successfully registered {name} ({roll_no})."
+        if len(image_paths) > 1:
+            msg += f" Stored {len(templates)} template(s) from {len(image_paths)} photos."
         print(msg)
         return True, msg
         
@@ -59,3 +130,163 @@ def register_student(name, roll_no, image_path):
         print(msg)
         return False, msg
 
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+def _read_batch_source(source):
+    # Returns a list of (roll_no, name, image_path).
+    # source is either a folder of '<roll>_<name>.jpg' files (same naming as
+    # data/registered_faces) or a CSV manifest with roll_no,name,image_path columns.
+    # Repeating a roll number (several rows / files) enrols several photos of that student.
+    rows = []
+    if os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            stem, ext = os.path.splitext(filename)
+            if ext.lower() not in IMAGE_EXTENSIONS:
+                continue
+            roll_no, sep, name = stem.partition('_')
+            # Rows with missing parts are kept so they show up in the report
+            rows.append((roll_no.strip() if sep else "", name.strip(), os.path.join(source, filename)))
+    else:
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, newline='', encoding='utf-8-sig') as f:
+            for record in csv.DictReader(f):
+                image_path = (record.get('image_path') or "").strip()
+                if image_path and not os.path.isabs(image_path):
+                    image_path = os.path.join(base_dir, image_path)
+                rows.append(((record.get('roll_no') or "").strip(), (record.get('name') or "").strip(), image_path))
+    return rows
+
+def _encode_registration_image(image_path):
+    # Worker (runs in a separate process): (faces found, encoding or None, error message or None)
+    try:
+        face_recognition = get_face_recognition()
+        image = face_recognition.load_image_file(image_path)
+        faces, encoding = _encode_single_face(face_recognition, image)
+        return faces, encoding, None
+    except Exception as e:
+        return 0, None, str(e)
+
+def _face_count_error(faces):
+    if faces == 0:
+        return "No face detected in the image."
+    if faces > 1:
+        return "Multiple faces detected."
+    return None
+
+def register_students_batch(source, workers=None, report_path=None, job=None):
+    # Bulk registration: faces are encoded in parallel on a process pool and the
+    # whole batch is committed with one database write.
+    # Returns (success, msg, report) where report has one dict per input row.
+    # job: a GUI job; progress is reported per photo and it can be cancelled until the write.
+    try:
+        rows = _read_batch_source(source)
+    except Exception as e:
+        msg = f"Could not read batch source: {e}"
+        print(msg)
+        return False, msg, []
+
+    if not rows:
+        msg = "No images found to register."
+        print(msg)
+        return False, msg, []
+
+    print(f"Batch registering {len(rows)} students from {source}...")
+
+    report = [{'roll_no': roll_no, 'name': name, 'image_path': path, 'status': 'FAILED', 'message': ''}
+              for roll_no, name, path in rows]
+
+    # Validate rows before spending any CPU on them
+    todo = []
+    for i, (roll_no, name, path) in enumerate(rows):
+        if not roll_no or not name:
+            report[i]['message'] = "Missing roll number or name."
+        elif not path or not os.path.exists(path):
+            report[i]['message'] = "Image file not found."
+        else:
+            todo.append(i)
+
+    # Photos already in the encoding cache are not sent to the pool
+    cache_keys = {i: _registration_cache_key(rows[i][2]) for i in todo}
+    cached = cache_lookup(cache_keys.values())
+    results = {i: cached[cache_keys[i]] + (None,) for i in todo if cache_keys[i] in cached}
+    misses = [i for i in todo if i not in results]
+    if results:
+        print(f"Encoding cache: {len(results)} of {len(todo)} photos cached.")
+
+    if misses:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(misses) // ((workers or os.cpu_count() or 1) * 4))
+            fresh = []
+            for result in pool.map(_encode_registration_image, [rows[i][2] for i in misses], chunksize=chunksize):
+                fresh.append(result)
+                if job is not None:
+                    if job.cancelled:
+                        pool.shutdown(cancel_futures=True)
+                        job.check_cancelled()
+                    job.report(len(fresh), len(misses), "Encoding photos")
+        results.update(zip(misses, fresh))
+        cache_store([(cache_keys[i], (faces, encoding)) for i, (faces, encoding, error) in zip(misses, fresh)
+                     if error is None])
+
+    encoded = {} # roll_no -> row indices with a usable encoding
+    for i in todo:
+        faces, encoding, error = results[i]
+        error = error or _face_count_error(faces)
+        if error:
+            report[i]['message'] = error
+        else:
+            # Several rows with the same roll number are several photos of one student
+            encoded.setdefault(rows[i][0], []).append(i)
+            report[i]['encoding'] = encoding
+
+    students = []
+    for roll_no, indices in encoded.items():
+        templates = build_templates([report[i]['encoding'] for i in indices])
+        # The name of the first photo is used for the student
+        students.append((roll_no, rows[indices[0]][1], templates))
+    for entry in report:
+        entry.pop('encoding', None)
+
+    if students:
+        try:
+            add_students(students)
+            refresh_index()
+        except Exception as e:
+            msg = f"Batch registration failed while saving: {e}"
+            print(msg)
+            return False, msg, report
+
+        os.makedirs(REGISTERED_FACES_DIR, exist_ok=True)
+        for roll_no, indices in encoded.items():
+            for i in indices:
+                report[i]['status'] = 'OK'
+                report[i]['message'] = "Registered." if len(indices) == 1 else f"Registered ({len(indices)} photos)."
+
+            # The first photo becomes the reference image
+            _, name, path = rows[indices[0]]
+            target_path = os.path.join(REGISTERED_FACES_DIR, f"{roll_no}_{name}{os.path.splitext(path)[1].lower()}")
+            try:
+                if os.path.abspath(path) != os.path.abspath(target_path):
+                    shutil.copyfile(path, target_path)
+            except OSError as e:
+                print(f"Warning: Could not copy reference image for {roll_no}: {e}")
+
+    # Per-row report
+    if report_path is None:
+        report_path = f"Registration_Report_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.csv"
+    try:
+        with open(report_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['roll_no', 'name', 'image_path', 'status', 'message'])
+            writer.writeheader()
+            writer.writerows(report)
+    except Exception as e:
+        print(f"Warning: Could not write registration report: {e}")
+        report_path = None
+
+    ok = sum(1 for entry in report if entry['status'] == 'OK')
+    msg = f"Registered {len(students)} students from {ok} of {len(rows)} photos."
+    if report_path:
+        msg += f"\nReport: {report_path}"
+    print(msg)
+    return len(students) > 0, msg, report
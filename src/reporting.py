@@ -0,0 +1,277 @@
+import os
+import glob
+import pickle
+import numpy as np
+import pandas as pd
+from src.events import get_event_store
+
+# Consolidated attendance reporting (monthly / semester).
+#
+# Sources:
+#   - the event log (data/events.db, see events.py)
+#   - legacy Attendance_*.txt reports from before the event log existed; parsed
+#     files are cached by (mtime, size) so only new or changed files are read again
+#
+# Everything is turned into one long table (one row per student per session)
+# and aggregated with pandas / NumPy: per-student rates and streaks, a
+# student x day matrix and monthly rates. Exports to CSV, XLSX or Parquet.
+
+REPORT_CACHE_PATH = 'data/report_cache.pkl'
+REPORT_GLOB = 'Attendance_*.txt'
+
+RECORD_COLUMNS = ['session', 'kind', 'started_at', 'roll_no', 'name', 'present', 'first_seen']
+
+
+# --- Ingestion ---
+
+def parse_report(path):
+    # One Attendance_*.txt -> (kind, started_at 'YYYY-MM-DD HH:MM:SS' or None, [(roll, name, status)])
+    kind = 'live' if os.path.basename(path).startswith('Attendance_Live_') else 'photo'
+    started_at = None
+    rows = []
+    in_table = False
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line.startswith('Date:'):
+                started_at = line[5:].strip()
+            elif line.startswith('---'):
+                in_table = True
+            elif line.startswith('==='):
+                if in_table:
+                    break
+            elif in_table:
+                parts = [p.strip() for p in line.split('|')]
+                if len(parts) == 3:
+                    rows.append(tuple(parts))
+    return kind, started_at, rows
+
+
+def _load_cache(path):
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+
+
+def _save_cache(cache, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def find_reports(roots=('.',)):
+    # Attendance_*.txt in the roots and one level below (photo folder batches)
+    paths = set()
+    for root in roots:
+        paths.update(glob.glob(os.path.join(root, REPORT_GLOB)))
+        paths.update(glob.glob(os.path.join(root, '*', REPORT_GLOB)))
+    return sorted(paths)
+
+
+def load_text_reports(roots=('.',), cache_path=REPORT_CACHE_PATH):
+    # Long-form records from the text reports, re-parsing only files whose (mtime, size) changed
+    cache = _load_cache(cache_path) if cache_path else {}
+    fresh = {}
+    changed = False
+    for path in find_reports(roots):
+        key = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = cache.get(key)
+        if entry is None or entry[0] != stamp:
+            try:
+                entry = (stamp, parse_report(path))
+            except OSError as e:
+                print(f"Warning: Could not read {path} ({e}).")
+                continue
+            changed = True
+        fresh[key] = entry
+    if cache_path and (changed or len(fresh) != len(cache)):
+        _save_cache(fresh, cache_path)
+
+    columns = {c: [] for c in RECORD_COLUMNS}
+    for key, (_, (kind, started_at, rows)) in fresh.items():
+        if not started_at or not rows:
+            continue
+        session = os.path.splitext(os.path.relpath(key))[0]
+        for roll_no, name, status in rows:
+            present = status != 'Absent'
+            columns['session'].append(session)
+            columns['kind'].append(kind)
+            columns['started_at'].append(started_at)
+            columns['roll_no'].append(roll_no)
+            columns['name'].append(name)
+            columns['present'].append(present)
+            columns['first_seen'].append(f"{started_at[:10]} {status}" if present else None)
+    return _records_frame(columns)
+
+
+def load_event_log(store=None):
+    # Long-form records from the event log: the roster of every session, marked present / absent
+    store = store or get_event_store()
+    if not store.exists():
+        return _records_frame({c: [] for c in RECORD_COLUMNS})
+    conn = store.connect()
+    try:
+        rows = conn.execute(
+            "SELECT s.session, s.kind, s.started_at, r.roll_no, r.name, MIN(e.timestamp) "
+            "FROM sessions s JOIN session_roster r ON r.session = s.session "
+            "LEFT JOIN events e ON e.session = r.session AND e.roll_no = r.roll_no "
+            "GROUP BY s.session, r.roll_no "
+            "UNION ALL "
+            # Recognized students missing from the roster (e.g. imported sessions)
+            "SELECT s.session, s.kind, s.started_at, e.roll_no, '', MIN(e.timestamp) "
+            "FROM sessions s JOIN events e ON e.session = s.session "
+            "WHERE NOT EXISTS (SELECT 1 FROM session_roster r WHERE r.session = e.session AND r.roll_no = e.roll_no) "
+            "GROUP BY s.session, e.roll_no").fetchall()
+    finally:
+        conn.close()
+
+    df = pd.DataFrame(rows, columns=['session', 'kind', 'started_at', 'roll_no', 'name', 'first_seen'])
+    df['present'] = df['first_seen'].notna()
+    df['roll_no'] = df['roll_no'].astype(str)
+    df['started_at'] = df['started_at'].str.replace('T', ' ', regex=False)
+    df['first_seen'] = df['first_seen'].str.replace('T', ' ', regex=False)
+    return _records_frame(df)
+
+
+def _records_frame(data):
+    df = pd.DataFrame(data, columns=RECORD_COLUMNS)
+    df['started_at'] = pd.to_datetime(df['started_at'], errors='coerce')
+    df['first_seen'] = pd.to_datetime(df['first_seen'], errors='coerce')
+    df['present'] = df['present'].astype(bool)
+    df['roll_no'] = df['roll_no'].astype(str)
+    return df.dropna(subset=['started_at'])
+
+
+def load_records(roots=('.',), since=None, until=None, cache_path=REPORT_CACHE_PATH):
+    # All sessions as one long table. Text reports only fill in the time before the event log
+    # started, so sessions recorded in both are not counted twice.
+    log = load_event_log()
+    text = load_text_reports(roots, cache_path)
+    if len(log) and len(text):
+        text = text[text['started_at'] < log['started_at'].min()]
+    records = pd.concat([df for df in (text, log) if len(df)], ignore_index=True) if len(log) or len(text) else log
+
+    if since is not None:
+        records = records[records['started_at'] >= pd.Timestamp(since)]
+    if until is not None:
+        records = records[records['started_at'] < pd.Timestamp(until)]
+    return records.reset_index(drop=True)
+
+
+# --- Analytics ---
+
+def daily_matrix(records):
+    # Student x day: 1 present at any session that day, 0 absent from all of them,
+    # NaN when the student was not on the roster (or no session was held) that day
+    if records.empty:
+        return pd.DataFrame()
+    day = records['started_at'].dt.normalize()
+    matrix = (records.assign(day=day, present=records['present'].astype(np.int8))
+              .pivot_table(index='roll_no', columns='day', values='present', aggfunc='max'))
+    return matrix.sort_index(axis=1)
+
+
+def streaks(matrix):
+    # (longest, current) runs of present days per student, vectorized over the day matrix.
+    # Days a student was not on the roster neither extend nor break a run.
+    values = matrix.to_numpy(dtype=np.float64)
+    attended = np.nan_to_num(values, nan=0.0)
+    counts = np.cumsum(attended, axis=1)
+    resets = np.maximum.accumulate(np.where(values == 0, counts, 0.0), axis=1)
+    runs = counts - resets
+    longest = runs.max(axis=1) if runs.size else np.zeros(len(matrix))
+    current = runs[:, -1] if runs.size else np.zeros(len(matrix))
+    return longest.astype(int), current.astype(int)
+
+
+def student_summary(records, matrix=None):
+    # One row per student: sessions held / attended, rate, days held / present, streaks
+    if records.empty:
+        return pd.DataFrame(columns=['roll_no', 'name', 'sessions_held', 'sessions_present', 'session_rate',
+                                     'days_held', 'days_present', 'day_rate', 'longest_streak', 'current_streak',
+                                     'last_seen'])
+    if matrix is None:
+        matrix = daily_matrix(records)
+
+    grouped = records.groupby('roll_no')
+    summary = pd.DataFrame({
+        'sessions_held': grouped['present'].size(),
+        'sessions_present': grouped['present'].sum(),
+        'last_seen': grouped['first_seen'].max(),
+    })
+    # Latest non-empty name per roll number
+    named = records[records['name'] != ''].sort_values('started_at')
+    summary['name'] = named.groupby('roll_no')['name'].last().reindex(summary.index).fillna('')
+    summary['session_rate'] = (summary['sessions_present'] / summary['sessions_held']).round(4)
+
+    matrix = matrix.reindex(summary.index)
+    summary['days_held'] = matrix.notna().sum(axis=1)
+    summary['days_present'] = (matrix == 1).sum(axis=1)
+    summary['day_rate'] = (summary['days_present'] / summary['days_held'].where(summary['days_held'] > 0)).round(4)
+    summary['longest_streak'], summary['current_streak'] = streaks(matrix)
+
+    summary = summary.reset_index()
+    return summary[['roll_no', 'name', 'sessions_held', 'sessions_present', 'session_rate',
+                    'days_held', 'days_present', 'day_rate', 'longest_streak', 'current_streak', 'last_seen']]
+
+
+def monthly_rates(matrix):
+    # Student x month: share of that month's school days the student was present
+    if matrix.empty:
+        return pd.DataFrame()
+    months = matrix.columns.to_period('M')
+    held = matrix.notna().T.groupby(months).sum().T
+    present = (matrix == 1).T.groupby(months).sum().T
+    rates = (present / held.where(held > 0)).round(4)
+    rates.columns = rates.columns.astype(str)
+    return rates
+
+
+# --- Export ---
+
+EXPORT_FORMATS = ('csv', 'xlsx', 'parquet')
+
+
+def export_table(df, path, index=False):
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext == 'csv':
+        df.to_csv(path, index=index)
+    elif ext == 'xlsx':
+        df.to_excel(path, index=index)
+    elif ext == 'parquet':
+        # Needs pyarrow or fastparquet; column labels must be strings
+        out = df.copy()
+        out.columns = [str(c) for c in out.columns]
+        out.to_parquet(path, index=index)
+    else:
+        raise ValueError(f"Unsupported export format: {ext} (use one of {', '.join(EXPORT_FORMATS)})")
+    return path
+
+
+def build_reports(output_dir, fmt='xlsx', since=None, until=None, roots=('.',)):
+    # Writes student summary, daily matrix and monthly rates for the period. Returns the paths.
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt} (use one of {', '.join(EXPORT_FORMATS)})")
+    records = load_records(roots, since=since, until=until)
+    if records.empty:
+        print("No attendance sessions found for this period.")
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+
+    matrix = daily_matrix(records)
+    summary = student_summary(records, matrix)
+    day_table = matrix.copy()
+    day_table.columns = [d.strftime('%Y-%m-%d') for d in day_table.columns]
+
+    paths = [
+        export_table(summary, os.path.join(output_dir, f"student_summary.{fmt}")),
+        export_table(day_table, os.path.join(output_dir, f"daily_matrix.{fmt}"), index=True),
+        export_table(monthly_rates(matrix), os.path.join(output_dir, f"monthly_rates.{fmt}"), index=True),
+    ]
+    print(f"Reports for {records['session'].nunique()} sessions, {len(summary)} students written to {os.path.abspath(output_dir)}")
+    return paths
@@ -0,0 +1,179 @@
+import os
+import sqlite3
+import numpy as np
+from datetime import datetime
+
+# SQLite student registry (WAL mode). Same interface as EncodingStore.
+# Safe to use from the GUI and the CLI at the same time: every write is one
+# IMMEDIATE transaction and readers never block writers.
+# (Attendance events live in their own log for every backend, see events.py.)
+
+ENCODING_DIM = 128
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0);
+
+-- roll_no has no declared type so int and str roll numbers round-trip unchanged
+CREATE TABLE IF NOT EXISTS students (
+    roll_no       PRIMARY KEY,
+    name          TEXT NOT NULL,
+    registered_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS encodings (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    roll_no  NOT NULL REFERENCES students(roll_no) ON DELETE CASCADE,
+    encoding BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_encodings_roll ON encodings(roll_no);
+"""
+
+
+def _to_blobs(encoding):
+    # One BLOB per template (a single vector or a K x 128 array)
+    templates = np.asarray(encoding, dtype=np.float32).reshape(-1, ENCODING_DIM)
+    return [row.tobytes() for row in templates]
+
+
+class SQLiteStore:
+    def __init__(self, path):
+        self.path = path
+        self._schema_ready = False
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def connect(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        if not self._schema_ready:
+            conn.executescript(SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    def _write(self, work):
+        # Runs work(conn) in one IMMEDIATE transaction and bumps the revision counter
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return result
+        finally:
+            conn.close()
+
+    def version(self):
+        if not self.exists():
+            return None
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+        finally:
+            conn.close()
+
+    # --- Reading ---
+
+    def load_gallery(self):
+        # (roll_nos, names, matrix), one entry per template row
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                "SELECT s.roll_no, s.name, e.encoding FROM students s "
+                "JOIN encodings e ON e.roll_no = s.roll_no ORDER BY s.rowid, e.id"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        roll_nos = [r[0] for r in rows]
+        names = [r[1] for r in rows]
+        if not rows:
+            return roll_nos, names, np.empty((0, ENCODING_DIM), dtype=np.float32)
+        matrix = np.frombuffer(b''.join(r[2] for r in rows), dtype=np.float32).reshape(len(rows), ENCODING_DIM)
+        return roll_nos, names, matrix
+
+    def has(self, roll_no):
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT 1 FROM students WHERE roll_no = ?", (roll_no,)).fetchone() is not None
+        finally:
+            conn.close()
+
+    # --- Writing ---
+
+    def add_many(self, students):
+        # students: iterable of (roll_no, name, encoding or K x 128 templates), inserted in a single transaction
+        students = list(students)
+        now = datetime.now().isoformat(timespec='seconds')
+
+        def work(conn):
+            for roll_no, name, encoding in students:
+                conn.execute(
+                    "INSERT INTO students (roll_no, name, registered_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(roll_no) DO UPDATE SET name = excluded.name",
+                    (roll_no, name, now))
+                conn.execute("DELETE FROM encodings WHERE roll_no = ?", (roll_no,))
+                conn.executemany("INSERT INTO encodings (roll_no, encoding) VALUES (?, ?)",
+                                 [(roll_no, blob) for blob in _to_blobs(encoding)])
+
+        if students:
+            self._write(work)
+
+    def add(self, roll_no, name, encoding):
+        self.add_many([(roll_no, name, encoding)])
+
+    def delete_many(self, roll_nos):
+        # Deletes the given students in one transaction. Returns {roll: name} of those that existed.
+        def work(conn):
+            removed = {}
+            for roll_no in roll_nos:
+                row = conn.execute("SELECT name FROM students WHERE roll_no = ?", (roll_no,)).fetchone()
+                if row is not None:
+                    conn.execute("DELETE FROM students WHERE roll_no = ?", (roll_no,))
+                    removed[roll_no] = row[0]
+            return removed
+
+        return self._write(work)
+
+    def delete(self, roll_no):
+        return self.delete_many([roll_no]).get(roll_no)
+
+    def rewrite(self, db):
+        now = datetime.now().isoformat(timespec='seconds')
+
+        def work(conn):
+            conn.execute("DELETE FROM encodings")
+            conn.execute("DELETE FROM students")
+            for roll_no, data in db.items():
+                conn.execute("INSERT INTO students (roll_no, name, registered_at) VALUES (?, ?, ?)",
+                             (roll_no, data['name'], now))
+                conn.executemany("INSERT INTO encodings (roll_no, encoding) VALUES (?, ?)",
+                                 [(roll_no, blob) for blob in _to_blobs(data.get('encodings', data['encoding']))])
+
+        self._write(work)
+
+    def maybe_compact(self, *args):
+        # SQLite reuses freed pages itself, nothing to do
+        pass
+
+def migrate_from_pickle(pickle_path, sqlite_path):
+    # One-shot import of the legacy db.pkl into a SQLite registry
+    import pickle
+    with open(pickle_path, 'rb') as f:
+        legacy = pickle.load(f)
+    store = SQLiteStore(sqlite_path)
+    store.rewrite(legacy)
+    print(f"Migrated {len(legacy)} students from {pickle_path} to {sqlite_path}.")
+    return store
@@ -0,0 +1,144 @@
+import time
+import numpy as np
+
+# Lightweight IoU tracker for live video.
+#
+# Person boxes from consecutive inference frames are linked by greedy IoU
+# matching, so a person keeps the same track id while they stay in view.
+# Recognition results are cached on the track: a person is identified once,
+# then only re-verified every REVERIFY_INTERVAL seconds, or sooner when the
+# match was weak or the box jumped (a possible identity swap between two
+# tracks). Between inference frames the boxes are extrapolated with the
+# track's velocity so the overlay keeps up.
+
+IOU_THRESHOLD = 0.3
+MAX_MISSED = 5 # inference frames a track survives without a matching box
+MAX_EXTRAPOLATION = 0.5 # seconds a box is moved along its velocity
+RECOGNITION_ATTEMPTS = 3 # tries before an unmatched track is left as Unknown
+
+REVERIFY_INTERVAL = 10.0 # seconds between re-checks of a recognized track
+WEAK_REVERIFY_INTERVAL = 3.0 # ... when its match distance was above WEAK_MATCH_DISTANCE
+WEAK_MATCH_DISTANCE = 0.45
+JUMP_IOU = 0.5 # a matched box overlapping its previous position less than this is re-checked at once
+
+
+def iou_matrix(a, b):
+    # Pairwise IoU of two box arrays (x1, y1, x2, y2)
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class Track:
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = tuple(int(v) for v in box)
+        self.velocity = (0.0, 0.0) # px / second of the box centre
+        self.updated_at = now
+        self.hits = 1
+        self.missed = 0
+
+        # Identity (filled in by recognition)
+        self.roll_no = None
+        self.name = None
+        self.distance = None
+        self.attempts = 0
+        self.verified_at = None
+        self.suspect = False # box jumped since the last verification
+
+    @property
+    def recognized(self):
+        return self.roll_no is not None
+
+    def needs_recognition(self, now=None):
+        if not self.recognized:
+            return self.attempts < RECOGNITION_ATTEMPTS
+        if self.suspect:
+            return True
+        now = time.perf_counter() if now is None else now
+        interval = WEAK_REVERIFY_INTERVAL if self.distance > WEAK_MATCH_DISTANCE else REVERIFY_INTERVAL
+        return now - self.verified_at >= interval
+
+    def set_identity(self, roll_no, name, distance, now=None):
+        self.roll_no, self.name, self.distance = roll_no, name, distance
+        self.verified_at = time.perf_counter() if now is None else now
+        self.suspect = False
+
+    def mark_checked(self, now=None):
+        # A re-check was attempted (e.g. no face visible): keep the identity, the next
+        # check is due after the usual interval, also for a box that had jumped
+        self.verified_at = time.perf_counter() if now is None else now
+        self.suspect = False
+
+    def clear_identity(self):
+        # The cached identity did not hold up, recognize the track from scratch
+        self.roll_no = self.name = self.distance = self.verified_at = None
+        self.attempts = 0
+        self.suspect = False
+
+    def update(self, box, now):
+        if self.recognized and iou_matrix(self.box, box)[0, 0] < JUMP_IOU:
+            self.suspect = True
+        dt = now - self.updated_at
+        if dt > 0:
+            (ox1, oy1, ox2, oy2), (x1, y1, x2, y2) = self.box, box
+            self.velocity = (((x1 + x2) - (ox1 + ox2)) / (2 * dt), ((y1 + y2) - (oy1 + oy2)) / (2 * dt))
+        self.box = tuple(int(v) for v in box)
+        self.updated_at = now
+        self.hits += 1
+        self.missed = 0
+
+    def predicted_box(self, now):
+        dt = min(max(now - self.updated_at, 0.0), MAX_EXTRAPOLATION)
+        dx, dy = int(self.velocity[0] * dt), int(self.velocity[1] * dt)
+        x1, y1, x2, y2 = self.box
+        return (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+
+
+class IoUTracker:
+    def __init__(self, iou_threshold=IOU_THRESHOLD, max_missed=MAX_MISSED):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks = []
+        self._next_id = 1
+
+    def update(self, boxes, now=None):
+        # boxes: list of (x1, y1, x2, y2) from one inference frame. Returns the live tracks.
+        now = time.perf_counter() if now is None else now
+        boxes = [tuple(b[:4]) for b in boxes]
+
+        unmatched_boxes = set(range(len(boxes)))
+        matched_tracks = set() # indices into self.tracks
+        if self.tracks and boxes:
+            ious = iou_matrix([t.box for t in self.tracks], boxes)
+            # Greedy: best overlapping pairs first
+            for flat in np.argsort(-ious, axis=None):
+                ti, bi = np.unravel_index(flat, ious.shape)
+                if ious[ti, bi] < self.iou_threshold:
+                    break
+                if bi not in unmatched_boxes or ti in matched_tracks:
+                    continue
+                self.tracks[ti].update(boxes[bi], now)
+                matched_tracks.add(ti)
+                unmatched_boxes.discard(bi)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.missed += 1
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+
+        for bi in sorted(unmatched_boxes):
+            self.tracks.append(Track(self._next_id, boxes[bi], now))
+            self._next_id += 1
+        return list(self.tracks)
+
+    def reset(self):
+        self.tracks = []
@@ -0,0 +1,66 @@
+import numpy as np
+
+from src.detectors import PersonDetector, merge_boxes, touches_seam, detect_tiled
+
+
+class FixedDetector(PersonDetector):
+    # Returns the same (boxes, scores) for every image it is given
+    def __init__(self, boxes, scores):
+        super().__init__()
+        self.boxes = boxes
+        self.scores = scores
+        self.calls = 0
+
+    def _detect_batch(self, images):
+        self.calls += 1
+        return [(list(self.boxes), list(self.scores)) for _ in images]
+
+
+def test_duplicates_keep_the_most_confident_box():
+    kept = merge_boxes([(0, 0, 100, 200), (5, 5, 105, 205)], [0.6, 0.9])
+    assert kept == [(5, 5, 105, 205)]
+
+
+def test_loose_box_does_not_suppress_tight_boxes():
+    # A low-confidence whole-photo box around two people the tiles found separately
+    kept = merge_boxes([(0, 0, 200, 200), (10, 10, 60, 100), (100, 10, 160, 100)], [0.3, 0.9, 0.8])
+    assert (10, 10, 60, 100) in kept
+    assert (100, 10, 160, 100) in kept
+
+
+def test_containment_only_drops_seam_boxes():
+    whole, part = (0, 0, 100, 200), (0, 0, 100, 80) # IoU 0.4, fully inside
+    assert merge_boxes([whole, part], [0.5, 0.9], [False, True]) == [whole]
+    assert sorted(merge_boxes([whole, part], [0.5, 0.9], [False, False])) == sorted([whole, part])
+
+
+def test_seam_boxes_come_after_uncut_ones():
+    # The seam box is more confident, but the uncut person must win
+    kept = merge_boxes([(0, 0, 100, 120), (0, 0, 100, 200)], [0.95, 0.5], [True, False])
+    assert kept == [(0, 0, 100, 200)]
+
+
+def test_touches_seam_ignores_image_borders():
+    h, w = 2000, 3000
+    # Top-left tile: its left / top edges are the image border
+    assert not touches_seam((0, 0, 50, 50), (0, 0, 1280, 1280), h, w)
+    assert touches_seam((1200, 100, 1280, 200), (0, 0, 1280, 1280), h, w)
+    # Tile starting inside the image: its left edge is a seam
+    assert touches_seam((0, 100, 50, 200), (0, 960, 1280, 2240), h, w)
+    assert not touches_seam((100, 100, 150, 200), (0, 960, 1280, 2240), h, w)
+
+
+def test_detect_tiled_maps_tile_boxes_to_photo_coordinates():
+    detector = FixedDetector([(10, 10, 50, 90)], [0.9])
+    boxes = detect_tiled(np.zeros((2000, 3000, 3), dtype=np.uint8), detector, batch_size=4)
+    # Same box from the whole-photo pass and every tile, offset by the tile origin
+    assert (10, 10, 50, 90) in boxes
+    assert (970, 10, 1010, 90) in boxes
+    assert len(boxes) == len(set(boxes))
+    assert detector.calls > 1
+
+
+def test_detect_batch_drops_scores():
+    detector = FixedDetector([(1, 2, 3, 4)], [0.5])
+    assert detector.detect_batch([None, None]) == [[(1, 2, 3, 4)], [(1, 2, 3, 4)]]
+    assert detector.detect(None) == [(1, 2, 3, 4)]
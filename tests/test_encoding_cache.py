@@ -0,0 +1,34 @@
+import os
+
+from src.encoding_cache import EncodingCache, EVICT_TO
+
+
+def make_cache(tmp_path, max_mb):
+    return EncodingCache(path=os.path.join(str(tmp_path), 'cache.db'), max_mb=max_mb)
+
+
+def test_hits_and_misses(tmp_path):
+    cache = make_cache(tmp_path, 1)
+    cache.put_many([('a', (1, 'x')), ('b', None)])
+    assert cache.get_many(['a', 'b', 'c']) == {'a': (1, 'x'), 'b': None}
+
+
+def test_batch_over_the_limit_is_partly_kept(tmp_path):
+    cache = make_cache(tmp_path, 0.01) # ~10 KB
+    cache.put_many([(f"k{i}", b'x' * 1000) for i in range(30)])
+    stats = cache.stats()
+    assert 0 < stats['entries'] < 30
+    assert stats['mb'] <= 0.01 * EVICT_TO + 0.001
+    # The oldest rows of the batch go first
+    assert 'k29' in cache.get_many(['k29'])
+    assert cache.get_many(['k0']) == {}
+
+
+def test_least_recently_used_is_evicted_first(tmp_path):
+    cache = make_cache(tmp_path, 0.01)
+    cache.put_many([(f"old{i}", b'x' * 1000) for i in range(5)])
+    cache.put_many([(f"new{i}", b'x' * 1000) for i in range(5)])
+    cache.get_many(['old0']) # touched: now the most recently used
+    cache.put_many([(f"more{i}", b'x' * 1000) for i in range(3)])
+    assert 'old0' in cache.get_many(['old0'])
+    assert cache.get_many(['old1']) == {}
@@ -0,0 +1,57 @@
+import numpy as np
+
+from src.encoding_store import EncodingStore, COMPACT_MIN_DEAD
+
+
+def encodings(n):
+    return np.random.default_rng(n).random((n, 128), dtype=np.float32)
+
+
+def test_gallery_follows_appends_from_another_writer(tmp_path):
+    store = EncodingStore(str(tmp_path))
+    store.add_many([(str(i), f"Student {i}", enc) for i, enc in enumerate(encodings(3))])
+    assert store.load_gallery()[0] == ['0', '1', '2']
+
+    # A second store on the same files, like another process
+    EncodingStore(str(tmp_path)).add('9', 'Late', encodings(2)) # two templates
+    roll_nos, names, matrix = store.load_gallery()
+    assert roll_nos == ['0', '1', '2', '9', '9']
+    assert matrix.shape == (5, 128)
+    assert store.has('9')
+
+
+def test_overwrite_keeps_position_and_delete_tombstones(tmp_path):
+    store = EncodingStore(str(tmp_path))
+    store.add_many([('a', 'A', encodings(1)), ('b', 'B', encodings(1))])
+    store.add('a', 'A2', encodings(1))
+    roll_nos, names, _ = store.load_gallery()
+    assert roll_nos == ['a', 'b'] and names == ['A2', 'B']
+
+    assert store.delete_many(['b', 'missing']) == {'b': 'B'}
+    assert not store.has('b')
+    assert store.load_gallery()[0] == ['a']
+
+
+def test_torn_line_is_read_once_complete(tmp_path):
+    store = EncodingStore(str(tmp_path))
+    store.add('a', 'A', encodings(1))
+    assert store.has('a')
+    with open(store.index_path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "del", "ro')
+    assert store.has('a')
+    with open(store.index_path, 'a', encoding='utf-8') as f:
+        f.write('ll": "a"}\n')
+    assert not store.has('a')
+
+
+def test_compaction_rewrites_the_index(tmp_path):
+    store = EncodingStore(str(tmp_path))
+    n = COMPACT_MIN_DEAD * 2
+    store.add_many([(str(i), str(i), enc) for i, enc in enumerate(encodings(n))])
+    keep = store.load_gallery()[2][-1].copy()
+    store.delete_many([str(i) for i in range(n - 1)])
+    roll_nos, _, matrix = store.load_gallery()
+    assert roll_nos == [str(n - 1)]
+    assert np.array_equal(matrix[0], keep)
+    # Compacted: only the live row is left on disk
+    assert EncodingStore(str(tmp_path)).load_gallery()[2].shape == (1, 128)
@@ -0,0 +1,30 @@
+import time
+
+from src import instrumentation
+
+
+def test_nested_runs_are_not_counted_as_stages():
+    sink = instrumentation.StatsSink()
+    instrumentation.configure([sink])
+    try:
+        with instrumentation.run('photo') as record:
+            with instrumentation.span('decode'):
+                time.sleep(0.01)
+            with instrumentation.run('recognize'): # a wrapper, e.g. recognize_group_photo
+                with instrumentation.span('match'):
+                    time.sleep(0.01)
+    finally:
+        instrumentation.configure([])
+
+    assert set(record.stages) == {'decode', 'match'}
+    assert sum(record.stages.values()) <= record.duration
+    assert 'recognize' in [name for name, _, _ in record.spans]
+    assert sink.snapshot()['runs'] == {'photo': 1}
+
+
+def test_disabled_instrumentation_records_nothing():
+    instrumentation.configure([])
+    with instrumentation.run('photo') as record:
+        with instrumentation.span('decode'):
+            instrumentation.count('faces', 2)
+    assert record is None
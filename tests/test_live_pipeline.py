@@ -0,0 +1,60 @@
+import time
+
+from src.live_pipeline import LivePipeline
+
+
+class FakeCapture:
+    # Endless source of numbered frames, one every `delay` seconds
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.n = 0
+        self.reading = False
+        self.released = False
+
+    def read(self):
+        self.reading = True
+        time.sleep(self.delay)
+        self.reading = False
+        self.n += 1
+        return not self.released, self.n
+
+    def release(self):
+        assert not self.reading, "released during read()"
+        self.released = True
+
+
+def wait_until(condition, timeout=2.0):
+    end = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_no_inference_while_paused():
+    calls = []
+
+    def infer(frame):
+        calls.append(frame)
+        time.sleep(0.02)
+        return frame
+
+    pipeline = LivePipeline(FakeCapture(), infer).start()
+    try:
+        assert wait_until(lambda: len(calls) >= 2)
+        with pipeline.paused():
+            seen = len(calls)
+            time.sleep(0.2)
+            assert len(calls) == seen
+        assert wait_until(lambda: len(calls) > seen)
+    finally:
+        pipeline.stop()
+
+
+def test_capture_released_by_its_thread_after_the_last_read():
+    cap = FakeCapture(delay=0.3)
+    pipeline = LivePipeline(cap, lambda frame: frame, release_capture=True).start()
+    assert wait_until(lambda: cap.reading)
+    pipeline.stop(timeout=0.01) # returns while read() is still running
+    assert not cap.released
+    assert wait_until(lambda: cap.released)
+    assert wait_until(lambda: not pipeline.grabber.is_alive())
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from src.reporting import streaks
+
+
+def day_matrix(rows):
+    # rows: {roll_no: [1 / 0 / None per day]} -> students x days matrix like daily_matrix()
+    days = pd.date_range('2025-01-06', periods=len(next(iter(rows.values()))), freq='D')
+    return pd.DataFrame({roll: values for roll, values in rows.items()}, index=days, dtype=float).T
+
+
+def test_longest_and_current_run():
+    longest, current = streaks(day_matrix({'1': [1, 1, 0, 1, 1, 1, 0, 1]}))
+    assert longest.tolist() == [3]
+    assert current.tolist() == [1]
+
+
+def test_absent_last_day_ends_current_run():
+    longest, current = streaks(day_matrix({'1': [1, 1, 1, 0]}))
+    assert longest.tolist() == [3]
+    assert current.tolist() == [0]
+
+
+def test_days_off_roster_neither_extend_nor_break_a_run():
+    longest, current = streaks(day_matrix({'1': [1, None, 1, None, 1]}))
+    assert longest.tolist() == [3]
+    assert current.tolist() == [3]
+
+
+def test_students_are_independent():
+    longest, current = streaks(day_matrix({
+        '1': [0, 0, 0, 0],
+        '2': [1, 1, 1, 1],
+        '3': [None, None, 1, 0],
+    }))
+    assert longest.tolist() == [0, 4, 1]
+    assert current.tolist() == [0, 4, 0]
+
+
+def test_empty_matrix():
+    longest, current = streaks(pd.DataFrame(np.empty((0, 0))))
+    assert len(longest) == 0
+    assert len(current) == 0
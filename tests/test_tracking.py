@@ -0,0 +1,74 @@
+import numpy as np
+
+import src.attendance as attendance
+from src.tracking import IoUTracker, MAX_MISSED
+
+
+def test_box_keeps_its_track_id():
+    tracker = IoUTracker()
+    first = tracker.update([(0, 0, 100, 200)], now=1.0)
+    second = tracker.update([(5, 0, 105, 200)], now=2.0)
+    assert [t.id for t in second] == [t.id for t in first]
+    assert second[0].hits == 2
+
+
+def test_new_box_gets_a_new_track():
+    tracker = IoUTracker()
+    tracker.update([(0, 0, 100, 200)], now=1.0)
+    tracks = tracker.update([(0, 0, 100, 200), (500, 0, 600, 200)], now=2.0)
+    assert len({t.id for t in tracks}) == 2
+
+
+def test_one_box_matches_one_track():
+    tracker = IoUTracker()
+    tracker.update([(0, 0, 100, 200), (10, 0, 110, 200)], now=1.0)
+    tracks = tracker.update([(5, 0, 105, 200)], now=2.0)
+    assert sorted(t.missed for t in tracks) == [0, 1]
+
+
+def test_unmatched_track_ages_even_with_repeated_timestamps():
+    # Two frames with the same timestamp: the second must still count as a miss
+    tracker = IoUTracker()
+    tracker.update([(0, 0, 100, 200)], now=1.0)
+    tracks = tracker.update([], now=1.0)
+    assert tracks[0].missed == 1
+    # A track created in this frame can still be matched in the next one with the same time
+    tracker = IoUTracker()
+    tracker.update([(0, 0, 100, 200)], now=1.0)
+    tracks = tracker.update([(0, 0, 100, 200)], now=1.0)
+    assert len(tracks) == 1 and tracks[0].missed == 0
+
+
+def test_lost_track_is_dropped_after_max_missed():
+    tracker = IoUTracker()
+    tracker.update([(0, 0, 100, 200)], now=0.0)
+    for i in range(MAX_MISSED):
+        assert len(tracker.update([], now=1.0 + i)) == 1
+    assert tracker.update([], now=100.0) == []
+
+
+class NoFaces:
+    # Stands in for face_recognition: nobody faces the camera
+    def __init__(self):
+        self.calls = 0
+
+    def face_encodings(self, crop):
+        self.calls += 1
+        return []
+
+
+def test_suspect_track_without_a_face_is_not_rechecked_every_frame(monkeypatch):
+    faces = NoFaces()
+    monkeypatch.setattr(attendance, 'get_face_recognition', lambda: faces)
+    tracker = IoUTracker()
+    track = tracker.update([(0, 0, 100, 200)], now=1.0)[0]
+    track.set_identity('1', 'Alice', 0.3, now=1.0)
+    track.update((60, 0, 160, 200), now=1.1) # the box jumped: re-check at once
+    assert track.suspect and track.needs_recognition(1.1)
+
+    frame = np.zeros((300, 300, 3), dtype=np.uint8)
+    matcher = type('Matcher', (), {'match': lambda self, probes: ([], [])})()
+    for _ in range(3):
+        attendance.recognize_tracks(frame, [track], matcher)
+    assert faces.calls == 1
+    assert track.recognized and not track.suspect